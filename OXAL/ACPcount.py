@@ -1,6 +1,16 @@
 import random
+import sys
+from pathlib import Path
 from time import sleep
 
+ROOT = Path(__file__).resolve().parents[1]  # YOLOv5 root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from utils.signals import SignalEngine
+
+ENGINE = SignalEngine()  # shared PCU weight table, see utils/signals.py PCU_WEIGHTS
+
 def generate_traffic():
     """Generate random counts of vehicles and people for each lane"""
     lanes = {}
@@ -14,32 +24,13 @@ def generate_traffic():
 
 def calculate_total_units(lane_data):
     """Calculate total traffic units giving different weights to different types"""
-    # Weights: truck = 2, car = 1, person = 0.5
-    return (lane_data['trucks'] * 2) + lane_data['cars'] + (lane_data['people'] * 0.5)
+    # Weights from the shared PCU table, missing types count as zero
+    return float(ENGINE.density([[lane_data.get(k, 0) for k in ENGINE.categories]])[0])
 
 def determine_signals(lanes):
     """Determine signal colors based on traffic density"""
-    # Calculate total units for each lane
-    traffic_density = {}
-    for lane, data in lanes.items():
-        traffic_density[lane] = calculate_total_units(data)
-    
-    # Sort lanes by traffic density
-    sorted_lanes = dict(sorted(traffic_density.items(), key=lambda x: x[1], reverse=True))
-    
-    # Assign colors
-    signals = {lane: 'red' for lane in lanes.keys()}
-    
-    # Highest traffic lane gets green
-    highest_lane = list(sorted_lanes.keys())[0]
-    signals[highest_lane] = 'green'
-    
-    # Second highest gets orange
-    if len(sorted_lanes) > 1:
-        second_lane = list(sorted_lanes.keys())[1]
-        signals[second_lane] = 'orange'
-    
-    return signals, traffic_density
+    # Densest lane gets green, second densest orange, all others red
+    return ENGINE.lanes(lanes)
 
 def display_traffic_status(lanes, signals, traffic_density):
     """Display the current traffic status and signals"""
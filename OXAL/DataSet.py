@@ -1,90 +1,75 @@
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
+from datetime import datetime
 
-def generate_random_filename():
+def generate_random_filenames(rng, n):
     # Generate realistic image filenames
-    prefixes = ['IMG_', 'DSC_', 'DCIM_', 'CAM_']
-    return f"{random.choice(prefixes)}{random.randint(1000, 9999)}.jpg"
+    prefixes = np.array(['IMG_', 'DSC_', 'DCIM_', 'CAM_'])
+    return np.char.add(rng.choice(prefixes, n), np.char.add(rng.integers(1000, 10000, n).astype(str), '.jpg'))
 
-def generate_random_bbox():
+def generate_random_bboxes(rng, n):
     # Generate random bounding box coordinates in YOLO format (normalized)
-    x = round(random.uniform(0.1, 0.9), 3)
-    y = round(random.uniform(0.1, 0.9), 3)
-    w = round(random.uniform(0.1, 0.3), 3)
-    h = round(random.uniform(0.1, 0.3), 3)
-    return x, y, w, h
+    xy = rng.uniform(0.1, 0.9, (n, 2)).round(3)
+    wh = rng.uniform(0.1, 0.3, (n, 2)).round(3)
+    return xy[:, 0], xy[:, 1], wh[:, 0], wh[:, 1]
 
-def generate_random_metadata():
+def generate_random_metadata(rng, n):
     # Generate random metadata for each image
-    resolutions = [(1920, 1080), (3840, 2160), (2560, 1440), (1280, 720)]
-    file_sizes = [round(random.uniform(2, 10), 2) for _ in range(4)]  # MB
-    return random.choice(resolutions), random.choice(file_sizes)
+    resolutions = np.array([(1920, 1080), (3840, 2160), (2560, 1440), (1280, 720)])
+    file_sizes = rng.uniform(2, 10, n).round(2)  # MB
+    return resolutions[rng.integers(0, len(resolutions), n)], file_sizes
 
-def create_object_detection_dataset():
+def create_object_detection_dataset(num_images=50, seed=None, output_file='object_detection_dataset.xlsx'):
     # Common objects in detection datasets
-    object_classes = ['person', 'car', 'truck', 'bicycle', 'motorcycle', 'dog', 'cat', 
-                     'bus', 'traffic_light', 'stop_sign']
-    
-    # Initialize lists to store data
-    data = []
-    
-    # Generate 50 random entries
-    for i in range(50):
-        # Basic image information
-        image_file = generate_random_filename()
-        resolution, file_size = generate_random_metadata()
-        
-        # Generate 1-4 objects per image
-        num_objects = random.randint(1, 4)
-        
-        # Generate detection information for each object
-        for j in range(num_objects):
-            object_class = random.choice(object_classes)
-            confidence = round(random.uniform(0.75, 0.99), 3)
-            x, y, w, h = generate_random_bbox()
-            
-            # Calculate timestamp within last month
-            timestamp = datetime.now() - timedelta(
-                days=random.randint(0, 30),
-                hours=random.randint(0, 23),
-                minutes=random.randint(0, 59)
-            )
-            
-            # Compile row data
-            row_data = {
-                'image_id': i + 1,
-                'filename': image_file,
-                'timestamp': timestamp,
-                'resolution_width': resolution[0],
-                'resolution_height': resolution[1],
-                'file_size_mb': file_size,
-                'object_class': object_class,
-                'confidence': confidence,
-                'bbox_x': x,
-                'bbox_y': y,
-                'bbox_width': w,
-                'bbox_height': h,
-                'annotation_verified': random.choice([True, False]),
-                'lighting_condition': random.choice(['daylight', 'night', 'evening', 'morning']),
-                'weather': random.choice(['clear', 'cloudy', 'rainy', 'sunny']),
-                'scene_type': random.choice(['urban', 'rural', 'indoor', 'highway'])
-            }
-            data.append(row_data)
-    
-    # Create DataFrame
-    df = pd.DataFrame(data)
-    
+    object_classes = np.array(['person', 'car', 'truck', 'bicycle', 'motorcycle', 'dog', 'cat',
+                               'bus', 'traffic_light', 'stop_sign'])
+    rng = np.random.default_rng(seed)  # seeded generator, same seed gives the same dataset
+
+    # Basic image information, one entry per image
+    image_files = generate_random_filenames(rng, num_images)
+    resolutions, file_sizes = generate_random_metadata(rng, num_images)
+
+    # Generate 1-4 objects per image, all objects at once
+    num_objects = rng.integers(1, 5, num_images)
+    image_idx = np.repeat(np.arange(num_images), num_objects)
+    n = len(image_idx)
+    x, y, w, h = generate_random_bboxes(rng, n)
+
+    # Calculate timestamps within last month
+    offsets = (pd.to_timedelta(rng.integers(0, 31, n), unit='D') +
+               pd.to_timedelta(rng.integers(0, 24, n), unit='h') +
+               pd.to_timedelta(rng.integers(0, 60, n), unit='min'))
+
+    # Compile row data
+    df = pd.DataFrame({
+        'image_id': image_idx + 1,
+        'filename': image_files[image_idx],
+        'timestamp': pd.Timestamp(datetime.now()) - offsets,
+        'resolution_width': resolutions[image_idx, 0],
+        'resolution_height': resolutions[image_idx, 1],
+        'file_size_mb': file_sizes[image_idx],
+        'object_class': rng.choice(object_classes, n),
+        'confidence': rng.uniform(0.75, 0.99, n).round(3),
+        'bbox_x': x,
+        'bbox_y': y,
+        'bbox_width': w,
+        'bbox_height': h,
+        'annotation_verified': rng.integers(0, 2, n).astype(bool),
+        'lighting_condition': rng.choice(['daylight', 'night', 'evening', 'morning'], n),
+        'weather': rng.choice(['clear', 'cloudy', 'rainy', 'sunny'], n),
+        'scene_type': rng.choice(['urban', 'rural', 'indoor', 'highway'], n)
+    })
+
     # Sort by image_id and timestamp
     df = df.sort_values(['image_id', 'timestamp'])
-    
-    # Export to Excel
-    output_file = 'object_detection_dataset.xlsx'
-    df.to_excel(output_file, index=False)
-    print(f"Dataset has been generated and saved to {output_file}")
-    
+
+    # Export to Excel, large datasets should use utils/synthetic.py which streams to disk in chunks
+    if output_file:
+        df.to_excel(output_file, index=False)
+        print(f"Dataset has been generated and saved to {output_file}")
+
     return df
 
-# Generate the dataset
-dataset = create_object_detection_dataset()
\ No newline at end of file
+if __name__ == "__main__":
+    # Generate the dataset
+    dataset = create_object_detection_dataset()
@@ -0,0 +1,276 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""
+Run resumable YOLOv5 detection over large archives of videos and images with a pool of worker processes.
+
+Input files are listed in a persistent SQLite manifest (`<project>/<name>/manifest.db`, see utils.jobs) with their
+status and last processed frame. Each worker process loads and warms the model once, then claims files one at a time
+and runs detect.run on them, checkpointing its progress. Re-running the same command after a crash or Ctrl+C skips
+finished files and resumes interrupted videos from their last checkpoint, frames after it are processed again.
+Several runners may share one manifest, a runner only resumes running files whose worker died or did not checkpoint
+for `--stale` seconds.
+
+Usage:
+    $ python batch_detect.py --weights yolov5s.pt --source archive/ --workers 4 --save-results parquet
+    $ python batch_detect.py --weights yolov5s.pt --source archive/ --workers 4 --save-results parquet  # resume
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from multiprocessing import get_context
+from pathlib import Path
+
+import torch
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  # YOLOv5 root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
+
+from detect import run as detect_run
+from models.common import DetectMultiBackend
+from utils.callbacks import Callbacks
+from utils.dataloaders import IMG_FORMATS, VID_FORMATS
+from utils.general import LOGGER, check_requirements, colorstr, print_args
+from utils.jobs import JobManifest
+from utils.sinks import SINKS
+from utils.torch_utils import select_device
+
+PREFIX = colorstr("batch: ")
+
+
+def list_sources(sources):
+    """Returns image and video files of `sources`, a list of files, directories (recursive), globs or *.txt lists."""
+    files = []
+    for p in sources:
+        p = str(p)
+        if p.endswith(".txt") and os.path.isfile(p):
+            files.extend(list_sources(Path(p).read_text().split()))
+        elif os.path.isdir(p):
+            files.extend(sorted(glob.glob(os.path.join(p, "**", "*.*"), recursive=True)))
+        elif "*" in p:
+            files.extend(sorted(glob.glob(p, recursive=True)))
+        else:
+            files.append(p)
+    return [str(Path(x).resolve()) for x in files if x.split(".")[-1].lower() in IMG_FORMATS + VID_FORMATS]
+
+
+def work(rank, threads, save_dir, checkpoint, kwargs):
+    """Worker process, loads the model once and processes claimed jobs until none is pending or the runner exits."""
+    ppid = os.getppid()
+    torch.set_num_threads(threads)
+    LOGGER.setLevel(logging.WARNING)  # per-frame logs of detect.run
+    jobs = JobManifest(save_dir / "manifest.db")
+    device = select_device(kwargs.pop("device"))
+    dnn = kwargs.pop("dnn")
+    model = DetectMultiBackend(kwargs["weights"], device=device, dnn=dnn, data=kwargs["data"], fp16=kwargs["half"])
+    model.warmup(imgsz=(1, 3, *kwargs["imgsz"]))
+    vid_stride = kwargs["vid_stride"]
+
+    while (job := jobs.claim(rank)) is not None:
+        id, source, start = job
+        state = {"frame": start, "saved": start, "t": time.time()}
+
+        def on_batch_end(path, im0s, pred, s):
+            """Counts processed frames and checkpoints them every `checkpoint` seconds."""
+            if os.getppid() != ppid:  # runner killed, leave the job 'running' to be resumed
+                raise SystemExit(1)
+            state["frame"] += len(pred)
+            t = time.time()
+            if t - state["t"] > checkpoint:
+                # Save the frame reached at the previous checkpoint, rows of later frames may still be buffered
+                jobs.checkpoint(id, state["saved"])
+                state["saved"], state["t"] = state["frame"], t
+
+        callbacks = Callbacks()
+        callbacks.register_action("on_predict_batch_end", callback=on_batch_end)
+        t0 = time.time()
+        try:
+            detect_run(
+                source=source,
+                vid_range=(start * vid_stride, None) if start else None,  # resume
+                project=save_dir,
+                name=f"{id}_{Path(source).stem}" + (f"_{start}" if start else ""),  # outputs of every attempt
+                exist_ok=True,
+                model=model,
+                callbacks=callbacks,
+                **kwargs,
+            )
+            if state["frame"] == start:  # i.e. unreadable file, capture did not open
+                raise RuntimeError("no frames read")
+            jobs.done(id, state["frame"], time.time() - t0)
+        except Exception as e:
+            LOGGER.warning(f"{PREFIX}WARNING ⚠️ {source} failed: {e}")
+            jobs.fail(id, e)
+    jobs.close()
+
+
+def run(
+    weights=ROOT / "yolov5s.pt",  # model path or triton URL
+    source=(ROOT / "data/images",),  # files, directories, globs or *.txt lists of images and videos
+    data=ROOT / "data/coco128.yaml",  # dataset.yaml path
+    imgsz=(640, 640),  # inference size (height, width)
+    conf_thres=0.25,  # confidence threshold
+    iou_thres=0.45,  # NMS IOU threshold
+    max_det=1000,  # maximum detections per image
+    device="",  # cuda device, i.e. 0 or 0,1,2,3 or cpu
+    save_txt=False,  # save results to *.txt
+    save_conf=False,  # save confidences in --save-txt labels
+    save_csv=False,  # save results in CSV format
+    save_results=(),  # save per-detection rows to results.* files, any of 'csv', 'jsonl', 'parquet', 'sqlite'
+    save_video=False,  # save annotated images and videos
+    classes=None,  # filter by class: --class 0, or --class 0 2 3
+    agnostic_nms=False,  # class-agnostic NMS
+    half=False,  # use FP16 half-precision inference
+    dnn=False,  # use OpenCV DNN for ONNX inference
+    vid_stride=1,  # video frame-rate stride
+    batch_size=1,  # images/video frames per forward
+    track=False,  # track detections across frames
+    project=ROOT / "runs/batch",  # save manifest and results to project/name
+    name="exp",  # save manifest and results to project/name, re-use to resume
+    workers=1,  # worker processes, each holding one model
+    retry_failed=False,  # also retry files that failed before
+    checkpoint=10.0,  # seconds between progress checkpoints
+    stale=300.0,  # seconds without a checkpoint after which a running file of another runner is resumed
+    reset_running=False,  # resume all running files, also those of live runners
+    interval=30.0,  # seconds between progress logs
+):
+    """
+    Runs detection over all `source` files with `workers` processes, resuming the job manifest of project/name.
+
+    Outputs of every file are saved to project/name/<job id>_<stem>, those of a resumed file from its checkpoint on to
+    project/name/<job id>_<stem>_<frame>.
+
+    Args:
+        weights (str | Path): Model weights path or Triton URL. Default is 'yolov5s.pt'.
+        source (list[str]): Image and video files, directories (searched recursively), globs or *.txt lists of them,
+            added to the manifest as pending jobs unless already known. Default is ('data/images',).
+        save_results (tuple[str]): Result file formats written per input file (utils.sinks). Default is ().
+        save_video (bool): Save annotated images and videos. Default is False.
+        workers (int): Worker processes, every worker loads the model once and gets cpu_count // workers threads.
+            Default is 1.
+        retry_failed (bool): Make failed jobs pending again, they resume from their last checkpoint. Default is False.
+        checkpoint (float): Seconds between progress checkpoints of a worker. Default is 10.0.
+        stale (float): Seconds without a checkpoint after which a 'running' file is resumed by this runner, files of
+            dead workers on this host are resumed at once. Default is 300.0.
+        reset_running (bool): Resume all 'running' files, also those of live runners sharing the manifest, i.e.
+            after moving the manifest from another host. Default is False.
+        interval (float): Seconds between aggregate progress and throughput logs. Default is 30.0.
+
+        Other arguments are those of detect.run.
+
+    Returns:
+        (dict): Job counts per status.
+    """
+    save_dir = Path(project) / name  # fixed, not incremented, so the same command resumes
+    jobs = JobManifest(save_dir / "manifest.db")
+    added = jobs.add(list_sources(source))
+    reset = jobs.reset(failed=retry_failed, stale=max(stale, 2 * checkpoint), running=reset_running)
+    counts = jobs.counts()
+    LOGGER.info(f"{PREFIX}{sum(counts.values())} files in {jobs.file}, {added} new, {reset} resumed, {counts}")
+    if not counts["pending"]:
+        jobs.close()
+        LOGGER.info(f"{PREFIX}no pending files, results in {colorstr('bold', save_dir)}")
+        return counts
+
+    kwargs = dict(
+        weights=weights,
+        data=data,
+        imgsz=imgsz,
+        conf_thres=conf_thres,
+        iou_thres=iou_thres,
+        max_det=max_det,
+        device=device,
+        save_txt=save_txt,
+        save_conf=save_conf,
+        save_csv=save_csv,
+        save_results=save_results,
+        nosave=not save_video,
+        classes=classes,
+        agnostic_nms=agnostic_nms,
+        half=half,
+        dnn=dnn,
+        vid_stride=vid_stride,
+        batch_size=batch_size,
+        track=track,
+    )
+    workers = min(workers, counts["pending"])
+    threads = max(os.cpu_count() // workers, 1)
+    ctx = get_context("spawn")
+    procs = [ctx.Process(target=work, args=(i, threads, save_dir, checkpoint, dict(kwargs))) for i in range(workers)]
+    for p in procs:
+        p.start()
+
+    # Aggregate progress
+    f0, t0 = jobs.frames(), time.time()
+    try:
+        while any(p.is_alive() for p in procs):
+            for p in procs:
+                p.join(timeout=interval / len(procs))
+            counts, fps = jobs.counts(), (jobs.frames() - f0) / (time.time() - t0)
+            LOGGER.info(f"{PREFIX}{counts['done']}/{sum(counts.values())} files done, {fps:.1f} frames/s, {counts}")
+    except KeyboardInterrupt:
+        LOGGER.info(f"{PREFIX}stopped by user, re-run the same command to resume")
+        for p in procs:
+            p.terminate()
+            p.join()
+    finally:
+        counts, frames, t = jobs.counts(), jobs.frames() - f0, time.time() - t0
+        jobs.close()
+    LOGGER.info(
+        f"{PREFIX}{frames} frames in {t:.1f}s ({frames / t:.1f} frames/s) by {workers} workers, {counts}\n"
+        f"Results saved to {colorstr('bold', save_dir)}"
+    )
+    return counts
+
+
+def parse_opt():
+    """Parses command-line arguments for resumable batch detection."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", nargs="+", type=str, default=ROOT / "yolov5s.pt", help="model path or triton URL")
+    parser.add_argument("--source", nargs="+", type=str, default=[ROOT / "data/images"], help="files/dirs/globs/*.txt")
+    parser.add_argument("--data", type=str, default=ROOT / "data/coco128.yaml", help="(optional) dataset.yaml path")
+    parser.add_argument("--imgsz", "--img", "--img-size", nargs="+", type=int, default=[640], help="inference size h,w")
+    parser.add_argument("--conf-thres", type=float, default=0.25, help="confidence threshold")
+    parser.add_argument("--iou-thres", type=float, default=0.45, help="NMS IoU threshold")
+    parser.add_argument("--max-det", type=int, default=1000, help="maximum detections per image")
+    parser.add_argument("--device", default="", help="cuda device, i.e. 0 or 0,1,2,3 or cpu")
+    parser.add_argument("--save-txt", action="store_true", help="save results to *.txt")
+    parser.add_argument("--save-conf", action="store_true", help="save confidences in --save-txt labels")
+    parser.add_argument("--save-csv", action="store_true", help="save results in CSV format")
+    parser.add_argument("--save-results", nargs="+", default=[], choices=list(SINKS), help="per-detection files")
+    parser.add_argument("--save-video", action="store_true", help="save annotated images and videos")
+    parser.add_argument("--classes", nargs="+", type=int, help="filter by class: --classes 0, or --classes 0 2 3")
+    parser.add_argument("--agnostic-nms", action="store_true", help="class-agnostic NMS")
+    parser.add_argument("--half", action="store_true", help="use FP16 half-precision inference")
+    parser.add_argument("--dnn", action="store_true", help="use OpenCV DNN for ONNX inference")
+    parser.add_argument("--vid-stride", type=int, default=1, help="video frame-rate stride")
+    parser.add_argument("--batch-size", type=int, default=1, help="images/video frames per forward")
+    parser.add_argument("--track", action="store_true", help="track detections across frames")
+    parser.add_argument("--project", default=ROOT / "runs/batch", help="save manifest and results to project/name")
+    parser.add_argument("--name", default="exp", help="save manifest and results to project/name, re-use to resume")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, each holding one model")
+    parser.add_argument("--retry-failed", action="store_true", help="also retry files that failed before")
+    parser.add_argument("--checkpoint", type=float, default=10.0, help="seconds between progress checkpoints")
+    parser.add_argument("--stale", type=float, default=300.0, help="seconds until silent running files are resumed")
+    parser.add_argument("--reset-running", action="store_true", help="resume all running files, also of live runners")
+    parser.add_argument("--interval", type=float, default=30.0, help="seconds between progress logs")
+    opt = parser.parse_args()
+    opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
+    print_args(vars(opt))
+    return opt
+
+
+def main(opt):
+    """Checks requirements and runs resumable batch detection with command-line options."""
+    check_requirements(ROOT / "requirements.txt", exclude=("tensorboard", "thop"))
+    run(**vars(opt))
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    main(opt)
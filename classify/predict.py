@@ -29,6 +29,7 @@ Usage - formats:
 """
 
 import argparse
+import contextlib
 import os
 import platform
 import sys
@@ -61,6 +62,7 @@ from utils.general import (
     print_args,
     strip_optimizer,
 )
+from utils.sinks import SINKS, TxtSink, open_sinks
 from utils.torch_utils import select_device, smart_inference_mode
 
 
@@ -73,6 +75,7 @@ def run(
     device="",  # cuda device, i.e. 0 or 0,1,2,3 or cpu
     view_img=False,  # show results
     save_txt=False,  # save results to *.txt
+    save_results=(),  # save top-5 rows to results.* files, any of 'csv', 'jsonl', 'parquet', 'sqlite'
     nosave=False,  # do not save images/videos
     augment=False,  # augmented inference
     visualize=False,  # visualize features
@@ -97,102 +100,121 @@ def run(
     # Directories
     save_dir = increment_path(Path(project) / name, exist_ok=exist_ok)  # increment run
     (save_dir / "labels" if save_txt else save_dir).mkdir(parents=True, exist_ok=True)  # make dir
+    with contextlib.ExitStack() as stack:  # sinks are closed also if run() raises
+        txt_sink = stack.enter_context(TxtSink(save_dir / "labels")) if save_txt else None
+        sinks = open_sinks(save_results, save_dir / "results")  # structured top-5 rows
+        for sink in sinks:
+            stack.enter_context(sink)
 
-    # Load model
-    device = select_device(device)
-    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
-    stride, names, pt = model.stride, model.names, model.pt
-    imgsz = check_img_size(imgsz, s=stride)  # check image size
-
-    # Dataloader
-    bs = 1  # batch_size
-    if webcam:
-        view_img = check_imshow(warn=True)
-        dataset = LoadStreams(source, img_size=imgsz, transforms=classify_transforms(imgsz[0]), vid_stride=vid_stride)
-        bs = len(dataset)
-    elif screenshot:
-        dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt)
-    else:
-        dataset = LoadImages(source, img_size=imgsz, transforms=classify_transforms(imgsz[0]), vid_stride=vid_stride)
-    vid_path, vid_writer = [None] * bs, [None] * bs
-
-    # Run inference
-    model.warmup(imgsz=(1 if pt else bs, 3, *imgsz))  # warmup
-    seen, windows, dt = 0, [], (Profile(device=device), Profile(device=device), Profile(device=device))
-    for path, im, im0s, vid_cap, s in dataset:
-        with dt[0]:
-            im = torch.Tensor(im).to(model.device)
-            im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
-            if len(im.shape) == 3:
-                im = im[None]  # expand for batch dim
-
-        # Inference
-        with dt[1]:
-            results = model(im)
-
-        # Post-process
-        with dt[2]:
-            pred = F.softmax(results, dim=1)  # probabilities
-
-        # Process predictions
-        for i, prob in enumerate(pred):  # per image
-            seen += 1
-            if webcam:  # batch_size >= 1
-                p, im0, frame = path[i], im0s[i].copy(), dataset.count
-                s += f"{i}: "
-            else:
-                p, im0, frame = path, im0s.copy(), getattr(dataset, "frame", 0)
-
-            p = Path(p)  # to Path
-            save_path = str(save_dir / p.name)  # im.jpg
-            txt_path = str(save_dir / "labels" / p.stem) + ("" if dataset.mode == "image" else f"_{frame}")  # im.txt
-
-            s += "{:g}x{:g} ".format(*im.shape[2:])  # print string
-            annotator = Annotator(im0, example=str(names), pil=True)
-
-            # Print results
-            top5i = prob.argsort(0, descending=True)[:5].tolist()  # top 5 indices
-            s += f"{', '.join(f'{names[j]} {prob[j]:.2f}' for j in top5i)}, "
-
-            # Write results
-            text = "\n".join(f"{prob[j]:.2f} {names[j]}" for j in top5i)
-            if save_img or view_img:  # Add bbox to image
-                annotator.text([32, 32], text, txt_color=(255, 255, 255))
-            if save_txt:  # Write to file
-                with open(f"{txt_path}.txt", "a") as f:
-                    f.write(text + "\n")
-
-            # Stream results
-            im0 = annotator.result()
-            if view_img:
-                if platform.system() == "Linux" and p not in windows:
-                    windows.append(p)
-                    cv2.namedWindow(str(p), cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO)  # allow window resize (Linux)
-                    cv2.resizeWindow(str(p), im0.shape[1], im0.shape[0])
-                cv2.imshow(str(p), im0)
-                cv2.waitKey(1)  # 1 millisecond
-
-            # Save results (image with detections)
-            if save_img:
-                if dataset.mode == "image":
-                    cv2.imwrite(save_path, im0)
-                else:  # 'video' or 'stream'
-                    if vid_path[i] != save_path:  # new video
-                        vid_path[i] = save_path
-                        if isinstance(vid_writer[i], cv2.VideoWriter):
-                            vid_writer[i].release()  # release previous video writer
-                        if vid_cap:  # video
-                            fps = vid_cap.get(cv2.CAP_PROP_FPS)
-                            w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                            h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                        else:  # stream
-                            fps, w, h = 30, im0.shape[1], im0.shape[0]
-                        save_path = str(Path(save_path).with_suffix(".mp4"))  # force *.mp4 suffix on results videos
-                        vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
-                    vid_writer[i].write(im0)
-
-        # Print time (inference-only)
-        LOGGER.info(f"{s}{dt[1].dt * 1E3:.1f}ms")
+        # Load model
+        device = select_device(device)
+        model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+        stride, names, pt = model.stride, model.names, model.pt
+        imgsz = check_img_size(imgsz, s=stride)  # check image size
+
+        # Dataloader
+        bs = 1  # batch_size
+        if webcam:
+            view_img = check_imshow(warn=True)
+            dataset = LoadStreams(
+                source, img_size=imgsz, transforms=classify_transforms(imgsz[0]), vid_stride=vid_stride
+            )
+            bs = len(dataset)
+        elif screenshot:
+            dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt)
+        else:
+            dataset = LoadImages(
+                source, img_size=imgsz, transforms=classify_transforms(imgsz[0]), vid_stride=vid_stride
+            )
+        vid_path, vid_writer = [None] * bs, [None] * bs
+
+        # Run inference
+        model.warmup(imgsz=(1 if pt else bs, 3, *imgsz))  # warmup
+        seen, windows, dt = 0, [], (Profile(device=device), Profile(device=device), Profile(device=device))
+        for path, im, im0s, vid_cap, s in dataset:
+            with dt[0]:
+                im = torch.Tensor(im).to(model.device)
+                im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
+                if len(im.shape) == 3:
+                    im = im[None]  # expand for batch dim
+
+            # Inference
+            with dt[1]:
+                results = model(im)
+
+            # Post-process
+            with dt[2]:
+                pred = F.softmax(results, dim=1)  # probabilities
+
+            # Process predictions
+            for i, prob in enumerate(pred):  # per image
+                if webcam and not dataset.new[i]:
+                    continue  # stream without a new frame
+                seen += 1
+                if webcam:  # batch_size >= 1
+                    p, im0, frame = path[i], im0s[i].copy(), dataset.count
+                    s += f"{i}: "
+                else:
+                    p, im0, frame = path, im0s.copy(), getattr(dataset, "frame", 0)
+
+                p = Path(p)  # to Path
+                save_path = str(save_dir / p.name)  # im.jpg
+                txt_path = str(save_dir / "labels" / p.stem)
+                txt_path += "" if dataset.mode == "image" else f"_{frame}"  # im.txt
+
+                s += "{:g}x{:g} ".format(*im.shape[2:])  # print string
+                annotator = Annotator(im0, example=str(names), pil=True)
+
+                # Print results
+                top5i = prob.argsort(0, descending=True)[:5].tolist()  # top 5 indices
+                s += f"{', '.join(f'{names[j]} {prob[j]:.2f}' for j in top5i)}, "
+
+                # Write results
+                text = "\n".join(f"{prob[j]:.2f} {names[j]}" for j in top5i)
+                if save_img or view_img:  # Add bbox to image
+                    annotator.text([32, 32], text, txt_color=(255, 255, 255))
+                if save_txt:  # Write to file
+                    txt_sink.write([{"file": f"{txt_path}.txt", "text": text + "\n"}])
+                if sinks:
+                    conf = prob[top5i].tolist()
+                    rows = [
+                        {"image": p.name, "frame": frame, "rank": r, "class": j, "name": names[j], "conf": round(x, 4)}
+                        for r, (j, x) in enumerate(zip(top5i, conf))
+                    ]
+                    for sink in sinks:
+                        sink.write(rows)
+
+                # Stream results
+                im0 = annotator.result()
+                if view_img:
+                    if platform.system() == "Linux" and p not in windows:
+                        windows.append(p)
+                        cv2.namedWindow(str(p), cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO)  # allow window resize (Linux)
+                        cv2.resizeWindow(str(p), im0.shape[1], im0.shape[0])
+                    cv2.imshow(str(p), im0)
+                    cv2.waitKey(1)  # 1 millisecond
+
+                # Save results (image with detections)
+                if save_img:
+                    if dataset.mode == "image":
+                        cv2.imwrite(save_path, im0)
+                    else:  # 'video' or 'stream'
+                        if vid_path[i] != save_path:  # new video
+                            vid_path[i] = save_path
+                            if isinstance(vid_writer[i], cv2.VideoWriter):
+                                vid_writer[i].release()  # release previous video writer
+                            if vid_cap:  # video
+                                fps = vid_cap.get(cv2.CAP_PROP_FPS)
+                                w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                                h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                            else:  # stream
+                                fps, w, h = 30, im0.shape[1], im0.shape[0]
+                            save_path = str(Path(save_path).with_suffix(".mp4"))  # force *.mp4 suffix on results videos
+                            vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+                        vid_writer[i].write(im0)
+
+            # Print time (inference-only)
+            LOGGER.info(f"{s}{dt[1].dt * 1E3:.1f}ms")
 
     # Print results
     t = tuple(x.t / seen * 1e3 for x in dt)  # speeds per image
@@ -214,6 +236,7 @@ def parse_opt():
     parser.add_argument("--device", default="", help="cuda device, i.e. 0 or 0,1,2,3 or cpu")
     parser.add_argument("--view-img", action="store_true", help="show results")
     parser.add_argument("--save-txt", action="store_true", help="save results to *.txt")
+    parser.add_argument("--save-results", nargs="+", default=[], choices=list(SINKS), help="top-5 result files")
     parser.add_argument("--nosave", action="store_true", help="do not save images/videos")
     parser.add_argument("--augment", action="store_true", help="augmented inference")
     parser.add_argument("--visualize", action="store_true", help="visualize features")
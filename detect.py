@@ -29,10 +29,11 @@ Usage - formats:
 """
 
 import argparse
-import csv
+import contextlib
 import os
 import platform
 import sys
+import time
 from pathlib import Path
 
 import torch
@@ -46,7 +47,11 @@ ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
 from ultralytics.utils.plotting import Annotator, colors, save_one_box
 
 from models.common import DetectMultiBackend
-from utils.dataloaders import IMG_FORMATS, VID_FORMATS, LoadImages, LoadScreenshots, LoadStreams
+from OXAL.ACPcount import determine_signals
+from utils import prefetch
+from utils.callbacks import Callbacks
+from utils.chunks import run_chunks
+from utils.dataloaders import IMG_FORMATS, VID_FORMATS, LoadImages, LoadImagesBatched, LoadScreenshots, LoadStreams
 from utils.general import (
     LOGGER,
     Profile,
@@ -54,6 +59,7 @@ from utils.general import (
     check_img_size,
     check_imshow,
     check_requirements,
+    clip_boxes,
     colorstr,
     cv2,
     increment_path,
@@ -63,7 +69,13 @@ from utils.general import (
     strip_optimizer,
     xyxy2xywh,
 )
+from utils.lanes import load_lane_counters
+from utils.motion import MotionGate
+from utils.shedding import LoadShedder, scaled_sizes
+from utils.sinks import SINKS, CSVSink, TxtSink, open_sinks
 from utils.torch_utils import select_device, smart_inference_mode
+from utils.tracker import Tracker
+from utils.writers import POLICIES, VideoWriterPool
 
 
 @smart_inference_mode()
@@ -80,6 +92,7 @@ def run(
     save_txt=False,  # save results to *.txt
     save_format=0,  # save boxes coordinates in YOLO format or Pascal-VOC format (0 for YOLO and 1 for Pascal-VOC)
     save_csv=False,  # save results in CSV format
+    save_results=(),  # save per-detection rows to results.* files, any of 'csv', 'jsonl', 'parquet', 'sqlite'
     save_conf=False,  # save confidences in --save-txt labels
     save_crop=False,  # save cropped prediction boxes
     nosave=False,  # do not save images/videos
@@ -97,6 +110,28 @@ def run(
     half=False,  # use FP16 half-precision inference
     dnn=False,  # use OpenCV DNN for ONNX inference
     vid_stride=1,  # video frame-rate stride
+    stream_processes=False,  # decode every stream in its own process into shared memory instead of a thread
+    stream_rates=None,  # max inferred FPS per stream, 0 for every frame
+    stream_priorities=None,  # per-stream priority, higher streams are inferred first
+    stream_batch=0,  # max streams inferred per batch, 0 for all
+    stream_wait=0.0,  # seconds a new stream frame may wait for a fuller batch
+    slo=0.0,  # end-to-end stream frame latency SLO in seconds, shed load by imgsz and vid_stride above it, 0 off
+    slo_sizes=None,  # inference sizes (long side) to step through for the SLO, default 100, 80 and 65% of imgsz
+    slo_max_stride=4,  # max video frame-rate stride for the SLO
+    vid_range=None,  # (start, end) frames of videos to process, i.e. one chunk of a long video
+    chunks=0,  # process one video file in this many frame ranges in parallel processes, 0 for one process
+    batch_size=1,  # images/video frames per forward for file and directory sources
+    pipeline=0,  # run decode, inference and output stages concurrently with queues of this size, 0 for sequential
+    writer_queue=32,  # frames queued per output video for its encoder thread
+    writer_policy="block",  # on a full writer queue 'block', 'drop' the oldest frame or 'downscale' queued frames
+    lanes=None,  # lane polygons yaml path for per-lane counts and signals
+    track=False,  # track detections across frames, label and count vehicles by track ID
+    motion_thres=0.0,  # changed-pixel fraction below which frames reuse the last detections, 0 to infer all frames
+    motion_interval=30,  # with motion gating, force inference every N frames per stream
+    keyframe=0,  # infer at most every N frames per stream and propagate tracks in between, 0 to infer all frames
+    keyframe_thres=0.25,  # track position uncertainty (relative to box size) that triggers an early keyframe
+    model=None,  # preloaded DetectMultiBackend, i.e. from a resident worker
+    callbacks=None,
 ):
     """
     Runs YOLOv5 detection inference on various sources like images, videos, directories, streams, etc.
@@ -115,6 +150,9 @@ def run(
         view_img (bool): If True, display inference results using OpenCV. Default is False.
         save_txt (bool): If True, save results in a text file. Default is False.
         save_csv (bool): If True, save results in a CSV file. Default is False.
+        save_results (tuple[str]): Formats of `save_dir/results.*` files with one row per detection (image, frame, name,
+            x1, y1, x2, y2, conf, class and track when tracking), any of 'csv', 'jsonl', 'parquet' and 'sqlite' (see
+            utils.sinks). Default is ().
         save_conf (bool): If True, include confidence scores in the saved results. Default is False.
         save_crop (bool): If True, save cropped prediction boxes. Default is False.
         nosave (bool): If True, do not save inference images or videos. Default is False.
@@ -133,6 +171,50 @@ def run(
         half (bool): If True, use FP16 half-precision inference. Default is False.
         dnn (bool): If True, use OpenCV DNN backend for ONNX inference. Default is False.
         vid_stride (int): Stride for processing video frames, to skip frames between processing. Default is 1.
+        stream_processes (bool): If True, every stream is decoded by its own capture process into shared memory
+            (utils.dataloaders.LoadStreams), so decoding many cameras does not contend for the GIL. Default is False.
+        stream_rates (list[float], optional): Max inferred frames per second of each stream, 0 for every frame.
+            Default is None (every frame of all streams).
+        stream_priorities (list[int], optional): Priority of each stream, when more streams are ready than
+            `stream_batch` the higher ones are inferred first, then those with the oldest frames. Default is None.
+        stream_batch (int): Max streams inferred per batch. Default is 0 (all streams with a new frame).
+        stream_wait (float): Seconds a new stream frame may wait for more streams to fill a `stream_batch` batch,
+            trading latency for larger batches. Default is 0.0.
+        slo (float): Stream frame latency SLO in seconds, from capture to outputs. If > 0, a load shedder
+            (utils.shedding.LoadShedder) steps the inference size down through `slo_sizes` and then the video stride
+            up to `slo_max_stride` while the latency exceeds it, and back up once latency is well below it. Default is
+            0.0 (off).
+        slo_sizes (list[int], optional): Long sides of the inference sizes to step through, all warmed at start.
+            Fixed input size backends only shed by stride. Default is None (100, 80 and 65% of `imgsz`).
+        slo_max_stride (int): Max video frame-rate stride the load shedder may set. Default is 4.
+        vid_range (tuple[int, int], optional): Only process video frames [start, end). Default is None (all frames).
+        chunks (int): If > 1, the video file `source` is split into this many frame ranges processed by parallel
+            processes, each with its own model and share of the CPU threads, and their outputs are merged in frame
+            order (utils.chunks.run_chunks). Default is 0 (one process).
+        batch_size (int): Batch size for image, directory and video sources, frames of equal letterboxed shape are
+            inferred together (utils.dataloaders.LoadImagesBatched). Default is 1.
+        pipeline (int): If > 0, decode/pre-process, inference and NMS/annotation/output run as three concurrent stages
+            connected by bounded queues of this many batches (utils.prefetch), so throughput approaches that of the
+            slowest stage. Default is 0 (stages run in sequence).
+        writer_queue (int): Output videos are encoded by one thread per stream (utils.writers.VideoWriterPool), each
+            fed by a queue of up to this many frames. Default is 32.
+        writer_policy (str): What happens to a frame when its writer queue is full, 'block' waits for the encoder,
+            'drop' discards the oldest queued frame and 'downscale' queues it at half resolution. Default is 'block'.
+        lanes (str | Path, optional): Lane polygons YAML file (see data/lanes.yaml). If provided, detections are counted
+            per lane and fed to `determine_signals`, cameras matched to streams in order. Default is None.
+        track (bool): If True, detections of each stream are tracked (utils.tracker.Tracker), labeled with their track
+            ID and lanes count confirmed tracks once each. Default is False.
+        motion_thres (float): Motion gating threshold (utils.motion.MotionGate), frames of a stream whose fraction of
+            changed pixels since its last inferred frame stays below it reuse the last detections. Default is 0.0
+            (disabled).
+        motion_interval (int): With motion gating, frames after which a stream is inferred regardless. Default is 30.
+        keyframe (int): Keyframe mode, streams are inferred at least every `keyframe` frames and boxes of the frames in
+            between are propagated by the Kalman prediction of their tracks (implies `track`). Default is 0 (disabled).
+        keyframe_thres (float): In keyframe mode, a stream is inferred early once a track's position standard
+            deviation exceeds this fraction of its box size. Default is 0.25.
+        model (DetectMultiBackend, optional): Preloaded model to reuse instead of loading `weights`. Default is None.
+        callbacks (utils.callbacks.Callbacks): Prediction hooks, `on_predict_batch_end(path, im0s, pred, s)` fires
+            after every batch and setting `callbacks.stop_predict = True` stops early. Default is None (no hooks).
 
     Returns:
         None
@@ -148,6 +230,14 @@ def run(
         run(source='data/videos/example.mp4', weights='yolov5s.pt', conf_thres=0.4, device='0')
         ```
     """
+    callbacks = Callbacks() if callbacks is None else callbacks  # not a shared default, stop_predict is per call
+    if chunks > 1:  # offline mode for one long video, every chunk runs this function in its own process
+        assert Path(str(source)).suffix[1:].lower() in VID_FORMATS, "--chunks needs one video file --source"
+        assert model is None and not view_img, "--chunks loads one model per process and can not show results"
+        opts = {k: v for k, v in locals().items() if k not in ("chunks", "model", "callbacks", "vid_range")}
+        callbacks.run("on_predict_end", *run_chunks(run, chunks=chunks, **opts))
+        return
+
     source = str(source)
     save_img = not nosave and not source.endswith(".txt")  # save inference images
     is_file = Path(source).suffix[1:] in (IMG_FORMATS + VID_FORMATS)
@@ -160,159 +250,324 @@ def run(
     # Directories
     save_dir = increment_path(Path(project) / name, exist_ok=exist_ok)  # increment run
     (save_dir / "labels" if save_txt else save_dir).mkdir(parents=True, exist_ok=True)  # make dir
-
-    # Load model
-    device = select_device(device)
-    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
-    stride, names, pt = model.stride, model.names, model.pt
-    imgsz = check_img_size(imgsz, s=stride)  # check image size
-
-    # Dataloader
-    bs = 1  # batch_size
-    if webcam:
-        view_img = check_imshow(warn=True)
-        dataset = LoadStreams(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
-        bs = len(dataset)
-    elif screenshot:
-        dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt)
-    else:
-        dataset = LoadImages(source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride)
-    vid_path, vid_writer = [None] * bs, [None] * bs
-
-    # Run inference
-    model.warmup(imgsz=(1 if pt or model.triton else bs, 3, *imgsz))  # warmup
-    seen, windows, dt = 0, [], (Profile(device=device), Profile(device=device), Profile(device=device))
-    for path, im, im0s, vid_cap, s in dataset:
-        with dt[0]:
-            im = torch.from_numpy(im).to(model.device)
-            im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
-            im /= 255  # 0 - 255 to 0.0 - 1.0
-            if len(im.shape) == 3:
-                im = im[None]  # expand for batch dim
-            if model.xml and im.shape[0] > 1:
-                ims = torch.chunk(im, im.shape[0], 0)
-
-        # Inference
-        with dt[1]:
-            visualize = increment_path(save_dir / Path(path).stem, mkdir=True) if visualize else False
-            if model.xml and im.shape[0] > 1:
-                pred = None
-                for image in ims:
-                    if pred is None:
-                        pred = model(image, augment=augment, visualize=visualize).unsqueeze(0)
+    with contextlib.ExitStack() as stack:  # sinks and video writers are closed also if run() raises
+        csv_sink = stack.enter_context(CSVSink(save_dir / "predictions.csv")) if save_csv else None
+        txt_sink = stack.enter_context(TxtSink(save_dir / "labels")) if save_txt else None
+        sinks = open_sinks(save_results, save_dir / "results")  # structured per-detection rows
+        for sink in sinks:
+            stack.enter_context(sink)
+
+        # Load model
+        if model is None:
+            device = select_device(device)
+            model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+        else:  # called with a resident model
+            device = model.device
+        stride, names, pt = model.stride, model.names, model.pt
+        imgsz = check_img_size(imgsz, s=stride)  # check image size
+        counters = list(load_lane_counters(lanes, names, device).values()) if lanes else []  # per-camera lane counters
+
+        # Dataloader
+        bs = 1  # batch_size
+        shedder = None  # stream load shedding
+        if webcam:
+            view_img = check_imshow(warn=True)
+            # ring buffer frames, held ticks of full queues and 3 for readers
+            buffer = 2 * pipeline + 7 if pipeline else 4
+            dataset = LoadStreams(
+                source,
+                img_size=imgsz,
+                stride=stride,
+                auto=pt,
+                vid_stride=vid_stride,
+                buffer=buffer,
+                processes=stream_processes,
+                rates=stream_rates,
+                priorities=stream_priorities,
+                max_batch=stream_batch if pt else 0,  # fixed batch size backends infer all streams
+                max_wait=stream_wait,
+                hold=bool(pipeline),  # im0s of queued ticks stay valid until released by stage 3
+            )
+            stack.callback(dataset.close)  # stop capture processes, also if run() raises
+            bs = len(dataset)
+            if slo:
+                sizes = scaled_sizes(imgsz, slo_sizes, stride) if pt else [imgsz]  # fixed input size backends
+                shedder = LoadShedder(slo, sizes, vid_stride, slo_max_stride)
+        elif screenshot:
+            dataset = LoadScreenshots(source, img_size=imgsz, stride=stride, auto=pt)
+        elif batch_size > 1:
+            assert not (keyframe or motion_thres), (
+                "--batch-size > 1 can not be combined with keyframes or motion gating"
+            )
+            dataset = LoadImagesBatched(
+                source,
+                img_size=imgsz,
+                stride=stride,
+                auto=pt,
+                vid_stride=vid_stride,
+                vid_range=vid_range,
+                batch_size=batch_size,
+            )
+        else:
+            dataset = LoadImages(
+                source, img_size=imgsz, stride=stride, auto=pt, vid_stride=vid_stride, vid_range=vid_range
+            )
+        vid_path, vid_writer = [None] * bs, VideoWriterPool(writer_queue, writer_policy)  # encoder thread per stream
+        stack.callback(vid_writer.close)  # encode queued frames and finalize videos, also when stopped early
+        track_path, trackers = [None] * bs, [None] * bs  # per-stream trackers, restarted for every new video
+        gate = MotionGate(motion_thres, motion_interval, streams=bs) if motion_thres else None
+        if keyframe:
+            assert not gate, "keyframe mode and motion gating can not be combined"
+            track = True  # frames between keyframes are predicted by the trackers
+        since, keyframes = [0] * bs, 0  # frames since the last keyframe per stream, total keyframes
+
+        # Run inference
+        for x in shedder.sizes if shedder else [imgsz]:
+            model.warmup(imgsz=(1 if pt or model.triton else bs, 3, *x))  # warmup
+        batched = isinstance(dataset, LoadImagesBatched)  # batches of file frames, one log line per frame
+        seen, windows = 0, []
+        dt = {k: Profile(device=device) for k in ("decode", "pre-process", "inference", "NMS", "post-process")}
+
+        @smart_inference_mode()  # grad mode is per thread
+        def preprocess():
+            """Stage 1: decodes and letterboxes frames (dataset), selects streams to infer, moves them to the device."""
+            nonlocal since, keyframes
+            loader = iter(dataset)
+            while True:
+                if shedder:
+                    shedder.apply(dataset)  # size and stride of the current load shedding level
+                with dt["decode"]:
+                    batch = next(loader, None)
+                if batch is None:
+                    return
+                path, im, im0s, vid_cap, s = batch
+                # read before next()
+                mode, frames = dataset.mode, dataset.count if webcam else getattr(dataset, "frame", 0)
+                new = dataset.new if webcam else None  # streams with a new frame, the others were processed already
+                fresh = [i for i, x in enumerate(new) if x] if new else None
+                t = time.time()
+                captured = [t - a for i, a in zip(dataset.index, dataset.age) if new[i]] if shedder else None  # times
+                if vid_cap:  # video properties for the writer
+                    vid_cap = (
+                        vid_cap.get(cv2.CAP_PROP_FPS),
+                        int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                        int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                    )
+                active = gate(im0s if webcam else [im0s], fresh) if gate else None  # streams with motion
+                if keyframe:  # streams due for a keyframe: new video, interval reached or uncertain tracks
+                    since = [n + 1 for n in since]
+                    active = [
+                        i
+                        for i, x in enumerate(path if webcam else [path])
+                        if track_path[i] != Path(x)
+                        or since[i] >= keyframe
+                        or trackers[i].uncertainty() > keyframe_thres
+                    ]
+                if new and not all(new):
+                    active = [i for i in fresh if active is None or i in active]
+                if active is not None and not pt and active:
+                    active = list(range(bs))  # fixed batch size backends infer the whole batch
+                if keyframe:
+                    since = [0 if i in active else n for i, n in enumerate(since)]
+                    keyframes += len(active)
+                with dt["pre-process"]:
+                    im = torch.from_numpy(im).to(model.device)
+                    im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
+                    im /= 255  # 0 - 255 to 0.0 - 1.0
+                    if len(im.shape) == 3:
+                        im = im[None]  # expand for batch dim
+                    if active is not None:
+                        im = im[active]  # motion-gated or keyframe streams only
+                yield path, im, im0s, vid_cap, s, active, mode, frames, new, captured
+
+        @smart_inference_mode()
+        def inference(batches):
+            """Stage 2: runs the model forward on preprocessed batches."""
+            nonlocal visualize
+            for path, im, im0s, vid_cap, s, active, *meta in batches:
+                with dt["inference"]:
+                    visualize = increment_path(save_dir / Path(path).stem, mkdir=True) if visualize else False
+                    if not len(im):
+                        pred = None  # all streams static
+                    elif model.xml and im.shape[0] > 1:
+                        pred = torch.cat(
+                            [model(x, augment=augment, visualize=visualize)[None] for x in im.chunk(len(im))]
+                        )
+                        pred = [pred, None]
+                    else:
+                        pred = model(im, augment=augment, visualize=visualize)
+                yield path, im, im0s, vid_cap, s, active, *meta, pred, dt["inference"].dt
+
+        # Stages run one after another per batch, or concurrently connected by bounded queues with --pipeline
+        if pipeline:
+            assert not keyframe, "keyframe mode needs sequential stages, it can not be pipelined"
+            batches = prefetch(inference(prefetch(preprocess(), pipeline)), pipeline)
+        else:
+            batches = inference(preprocess())
+        t0, shape = time.time(), (1, 3, *imgsz)  # shape of the last forward
+        for batch in batches:  # stage 3: NMS, outputs
+            path, im, im0s, vid_cap, s, active, mode, frames, new, captured, pred, t_inference = batch
+            if pred is not None:
+                shape = tuple(im.shape)
+            if batched:
+                prefixes, s = s, ""  # per-frame log prefixes
+            # NMS
+            with dt["NMS"]:
+                if pred is not None:
+                    pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+                if gate:
+                    pred = gate.merge(pred or [], active)  # static streams reuse their last detections
+                elif active is not None:
+                    it = iter(pred or [])
+                    pred = [next(it) if i in active else None for i in range(bs)]  # None for streams not inferred
+
+            # Second-stage classifier (optional)
+            # pred = utils.general.apply_classifier(pred, classifier_model, im, im0s)
+
+            # Process predictions
+            with dt["post-process"]:
+                for i, det in enumerate(pred):  # per image
+                    if new and not new[i]:
+                        continue  # stream without a new frame
+                    seen += 1
+                    k = i if webcam else 0  # stream index
+                    if webcam:  # batch_size >= 1
+                        p, im0, frame = path[i], im0s[i].copy(), frames
+                        s += f"{i}: "
+                    elif batched:
+                        p, im0, frame, s = path[i], im0s[i].copy(), frames[i], prefixes[i]
+                    else:
+                        p, im0, frame = path, im0s.copy(), frames
+
+                    p = Path(p)  # to Path
+                    save_path = str(save_dir / p.name)  # im.jpg
+                    txt_path = str(save_dir / "labels" / p.stem) + ("" if mode == "image" else f"_{frame}")  # im.txt
+                    s += "{:g}x{:g} ".format(*im.shape[2:])  # print string
+                    gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
+                    imc = im0.copy() if save_crop else im0  # for save_crop
+                    annotator = Annotator(im0, line_width=line_thickness, example=str(names))
+                    if det is None:  # between keyframes
+                        det = trackers[k].predict()  # propagated tracks (xyxy, conf, cls, id)
+                        clip_boxes(det, im0.shape)
                     else:
-                        pred = torch.cat((pred, model(image, augment=augment, visualize=visualize).unsqueeze(0)), dim=0)
-                pred = [pred, None]
-            else:
-                pred = model(im, augment=augment, visualize=visualize)
-        # NMS
-        with dt[2]:
-            pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
-
-        # Second-stage classifier (optional)
-        # pred = utils.general.apply_classifier(pred, classifier_model, im, im0s)
-
-        # Define the path for the CSV file
-        csv_path = save_dir / "predictions.csv"
-
-        # Create or append to the CSV file
-        def write_to_csv(image_name, prediction, confidence):
-            """Writes prediction data for an image to a CSV file, appending if the file exists."""
-            data = {"Image Name": image_name, "Prediction": prediction, "Confidence": confidence}
-            with open(csv_path, mode="a", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=data.keys())
-                if not csv_path.is_file():
-                    writer.writeheader()
-                writer.writerow(data)
-
-        # Process predictions
-        for i, det in enumerate(pred):  # per image
-            seen += 1
-            if webcam:  # batch_size >= 1
-                p, im0, frame = path[i], im0s[i].copy(), dataset.count
-                s += f"{i}: "
-            else:
-                p, im0, frame = path, im0s.copy(), getattr(dataset, "frame", 0)
-
-            p = Path(p)  # to Path
-            save_path = str(save_dir / p.name)  # im.jpg
-            txt_path = str(save_dir / "labels" / p.stem) + ("" if dataset.mode == "image" else f"_{frame}")  # im.txt
-            s += "{:g}x{:g} ".format(*im.shape[2:])  # print string
-            gn = torch.tensor(im0.shape)[[1, 0, 1, 0]]  # normalization gain whwh
-            imc = im0.copy() if save_crop else im0  # for save_crop
-            annotator = Annotator(im0, line_width=line_thickness, example=str(names))
-            if len(det):
-                # Rescale boxes from img_size to im0 size
-                det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()
-
-                # Print results
-                for c in det[:, 5].unique():
-                    n = (det[:, 5] == c).sum()  # detections per class
-                    s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
-
-                # Write results
-                for *xyxy, conf, cls in reversed(det):
-                    c = int(cls)  # integer class
-                    label = names[c] if hide_conf else f"{names[c]}"
-                    confidence = float(conf)
-                    confidence_str = f"{confidence:.2f}"
-
-                    if save_csv:
-                        write_to_csv(p.name, label, confidence_str)
-
-                    if save_txt:  # Write to file
-                        if save_format == 0:
-                            coords = (
-                                (xyxy2xywh(torch.tensor(xyxy).view(1, 4)) / gn).view(-1).tolist()
-                            )  # normalized xywh
+                        det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape).round()  # rescale to im0 size
+                        if track:
+                            if track_path[k] != p:  # new video or stream
+                                # sparse keyframes confirm tracks on their first hit
+                                track_path[k], trackers[k] = p, Tracker(min_hits=1 if keyframe else 3)
+                                if counters:
+                                    counters[k % len(counters)].reset()  # track IDs restart
+                            det = trackers[k].update(det)  # confirmed tracks (xyxy, conf, cls, id)
+                    if len(det):
+                        # Print results
+                        for c in det[:, 5].unique():
+                            n = (det[:, 5] == c).sum()  # detections per class
+                            s += f"{n} {names[int(c)]}{'s' * (n > 1)}, "  # add to string
+
+                        # Write results, one buffered sink write per image
+                        d = det.flip(0).cpu()  # same order as the drawing loop
+                        if save_csv:
+                            rows = [
+                                {"Image Name": p.name, "Prediction": names[int(c)], "Confidence": f"{x:.2f}"}
+                                for c, x in d[:, [5, 4]].tolist()
+                            ]
+                            csv_sink.write(rows)
+                        if save_txt:
+                            coords = (xyxy2xywh(d[:, :4]) if save_format == 0 else d[:, :4]) / gn  # normalized
+                            lines = torch.cat((d[:, 5:6], coords, d[:, 4:5]) if save_conf else (d[:, 5:6], coords), 1)
+                            text = "".join(("%g " * len(x)).rstrip() % tuple(x) + "\n" for x in lines.tolist())
+                            txt_sink.write([{"file": f"{txt_path}.txt", "text": text}])
+                        if sinks:
+                            rows = []
+                            for x in d.tolist():
+                                row = {"image": p.name, "frame": frame, "class": int(x[5]), "name": names[int(x[5])]}
+                                row.update(zip(("x1", "y1", "x2", "y2"), x[:4]), conf=round(x[4], 4))
+                                if track:
+                                    row["track"] = int(x[6])
+                                rows.append(row)
+                            for sink in sinks:
+                                sink.write(rows)
+
+                        ids = det[:, 6].int().tolist() if track else [None] * len(det)  # track IDs
+                        for (*xyxy, conf, cls), tid in zip(reversed(det[:, :6]), reversed(ids)):
+                            c = int(cls)  # integer class
+                            if save_img or save_crop or view_img:  # Add bbox to image
+                                c = int(cls)  # integer class
+                                name = names[c] if tid is None else f"{names[c]} #{tid}"
+                                label = None if hide_labels else (name if hide_conf else f"{name} {conf:.2f}")
+                                annotator.box_label(xyxy, label, color=colors(c, True))
+                            if save_crop:
+                                save_one_box(xyxy, imc, file=save_dir / "crops" / names[c] / f"{p.stem}.jpg", BGR=True)
+
+                    # Lane counts and signals
+                    if counters:
+                        counter = counters[k % len(counters)]
+                        if track:
+                            entered = counter.event_counts(counter.track(det)).sum(1).tolist()  # lane entries
+                            signals, density = determine_signals(counter.to_dict(counter.unique_counts()))
+                            s += "".join(f"{lane} +{n}, " for lane, n in zip(counter.lanes, entered) if n)
                         else:
-                            coords = (torch.tensor(xyxy).view(1, 4) / gn).view(-1).tolist()  # xyxy
-                        line = (cls, *coords, conf) if save_conf else (cls, *coords)  # label format
-                        with open(f"{txt_path}.txt", "a") as f:
-                            f.write(("%g " * len(line)).rstrip() % line + "\n")
-
-                    if save_img or save_crop or view_img:  # Add bbox to image
-                        c = int(cls)  # integer class
-                        label = None if hide_labels else (names[c] if hide_conf else f"{names[c]} {conf:.2f}")
-                        annotator.box_label(xyxy, label, color=colors(c, True))
-                    if save_crop:
-                        save_one_box(xyxy, imc, file=save_dir / "crops" / names[c] / f"{p.stem}.jpg", BGR=True)
-
-            # Stream results
-            im0 = annotator.result()
-            if view_img:
-                if platform.system() == "Linux" and p not in windows:
-                    windows.append(p)
-                    cv2.namedWindow(str(p), cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO)  # allow window resize (Linux)
-                    cv2.resizeWindow(str(p), im0.shape[1], im0.shape[0])
-                cv2.imshow(str(p), im0)
-                cv2.waitKey(1)  # 1 millisecond
-
-            # Save results (image with detections)
-            if save_img:
-                if dataset.mode == "image":
-                    cv2.imwrite(save_path, im0)
-                else:  # 'video' or 'stream'
-                    if vid_path[i] != save_path:  # new video
-                        vid_path[i] = save_path
-                        if isinstance(vid_writer[i], cv2.VideoWriter):
-                            vid_writer[i].release()  # release previous video writer
-                        if vid_cap:  # video
-                            fps = vid_cap.get(cv2.CAP_PROP_FPS)
-                            w = int(vid_cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                            h = int(vid_cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                        else:  # stream
-                            fps, w, h = 30, im0.shape[1], im0.shape[0]
-                        save_path = str(Path(save_path).with_suffix(".mp4"))  # force *.mp4 suffix on results videos
-                        vid_writer[i] = cv2.VideoWriter(save_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
-                    vid_writer[i].write(im0)
-
-        # Print time (inference-only)
-        LOGGER.info(f"{s}{'' if len(det) else '(no detections), '}{dt[1].dt * 1E3:.1f}ms")
+                            signals, density = determine_signals(counter(det))
+                        s += "".join(f"{k} {density[k]:g}u {v}, " for k, v in signals.items())
+
+                    # Stream results
+                    im0 = annotator.result()
+                    if view_img:
+                        if platform.system() == "Linux" and p not in windows:
+                            windows.append(p)
+                            # allow window resize (Linux)
+                            cv2.namedWindow(str(p), cv2.WINDOW_NORMAL | cv2.WINDOW_KEEPRATIO)
+                            cv2.resizeWindow(str(p), im0.shape[1], im0.shape[0])
+                        cv2.imshow(str(p), im0)
+                        cv2.waitKey(1)  # 1 millisecond
+
+                    # Save results (image with detections)
+                    if save_img:
+                        if mode == "image":
+                            cv2.imwrite(save_path, im0)
+                        else:  # 'video' or 'stream'
+                            if vid_path[k] != save_path:  # new video
+                                vid_path[k] = save_path
+                                if vid_cap:  # video
+                                    fps, w, h = vid_cap
+                                else:  # stream
+                                    fps, w, h = 30, im0.shape[1], im0.shape[0]
+                                save_path = str(Path(save_path).with_suffix(".mp4"))  # force *.mp4 suffix
+                                vid_writer.open(k, save_path, fps, (w, h))  # finalizes the previous video of stream k
+                            vid_writer.write(k, im0)  # encoded asynchronously
+
+                    if batched:
+                        ms = t_inference * 1e3 / len(pred)  # per image
+                        LOGGER.info(f"{s}{'' if len(det) else '(no detections), '}{ms:.1f}ms")
+
+            # Print time (inference-only)
+            if not batched:
+                s += f"{'' if det is not None and len(det) else '(no detections), '}{t_inference * 1E3:.1f}ms"
+                LOGGER.info(s)
+            callbacks.run("on_predict_batch_end", path, im0s, pred, s)
+            if webcam and pipeline:
+                dataset.release(frames)  # ring buffer frames of this tick
+            if shedder:
+                t = time.time()
+                shedder.update([t - x for x in captured])  # end-to-end latencies of the new frames
+            if callbacks.stop_predict:
+                LOGGER.info("Prediction stopped early")
+                break
 
     # Print results
-    t = tuple(x.t / seen * 1e3 for x in dt)  # speeds per image
-    LOGGER.info(f"Speed: %.1fms pre-process, %.1fms inference, %.1fms NMS per image at shape {(1, 3, *imgsz)}" % t)
+    callbacks.run("on_predict_end", seen, save_dir)
+    t = ", ".join(f"{x.t / max(seen, 1) * 1e3:.1f}ms {k}" for k, x in dt.items())  # stage times per image
+    LOGGER.info(f"Speed: {t} per image at shape {shape}")
+    LOGGER.info(f"Throughput: {seen / (time.time() - t0):.1f} images/s")
+    if gate:
+        LOGGER.info(f"Motion gating: {gate.inferred}/{gate.frames} frames inferred")
+    if shedder:
+        (h, w), s = shedder.size, shedder.stride
+        LOGGER.info(f"Load shedding: {shedder.changes} level changes, imgsz {h}x{w} and vid_stride {s} at the end")
+    if keyframe:
+        LOGGER.info(f"Keyframes: {keyframes}/{seen} frames inferred")
+    if vid_writer.written:
+        LOGGER.info(f"Video writers: {vid_writer.summary()}")
     if save_txt or save_img:
         s = f"\n{len(list(save_dir.glob('labels/*.txt')))} labels saved to {save_dir / 'labels'}" if save_txt else ""
         LOGGER.info(f"Results saved to {colorstr('bold', save_dir)}{s}")
@@ -336,6 +591,8 @@ def parse_opt():
         --view-img (bool, optional): Flag to display results. Defaults to False.
         --save-txt (bool, optional): Flag to save results to *.txt files. Defaults to False.
         --save-csv (bool, optional): Flag to save results in CSV format. Defaults to False.
+        --save-results (list[str], optional): Formats of per-detection results.* files: csv, jsonl, parquet, sqlite.
+            Defaults to [].
         --save-conf (bool, optional): Flag to save confidences in labels saved via --save-txt. Defaults to False.
         --save-crop (bool, optional): Flag to save cropped prediction boxes. Defaults to False.
         --nosave (bool, optional): Flag to prevent saving images/videos. Defaults to False.
@@ -352,8 +609,38 @@ def parse_opt():
         --hide-conf (bool, optional): Flag to hide confidences in the output. Defaults to False.
         --half (bool, optional): Flag to use FP16 half-precision inference. Defaults to False.
         --dnn (bool, optional): Flag to use OpenCV DNN for ONNX inference. Defaults to False.
+        --stream-processes (bool, optional): Flag to decode every stream in its own process into shared memory.
+            Defaults to False.
+        --stream-rates (float, optional): Max inferred FPS of each stream, 0 for every frame. Defaults to None.
+        --stream-priorities (int, optional): Priority of each stream, higher streams are inferred first. Defaults to
+            None.
+        --stream-batch (int, optional): Max streams inferred per batch, 0 for all. Defaults to 0.
+        --stream-wait (float, optional): Seconds a new stream frame may wait for a fuller batch. Defaults to 0.0.
+        --slo (float, optional): Stream frame latency SLO in seconds to shed load by inference size and video stride,
+            0 to disable. Defaults to 0.0.
+        --slo-sizes (int, optional): Inference sizes (long side) to step through for the SLO. Defaults to None.
+        --slo-max-stride (int, optional): Max video frame-rate stride for the SLO. Defaults to 4.
+        --chunks (int, optional): Process one long video file in this many frame ranges in parallel processes.
+            Defaults to 0.
+        --batch-size (int, optional): Images or video frames per forward for file and directory sources. Defaults
+            to 1.
+        --pipeline (int, optional): Queue size between concurrent decode, inference and output stages, 0 to run
+            them in sequence. Defaults to 0.
+        --writer-queue (int, optional): Frames queued per output video for its encoder thread. Defaults to 32.
+        --writer-policy (str, optional): Full writer queue policy, 'block', 'drop' or 'downscale'. Defaults to
+            'block'.
         --vid-stride (int, optional): Video frame-rate stride, determining the number of frames to skip in between
             consecutive frames. Defaults to 1.
+        --lanes (str, optional): Lane polygons YAML path for per-lane counts and signals. Defaults to None.
+        --track (bool, optional): Flag to track detections and count vehicles by track ID. Defaults to False.
+        --motion-thres (float, optional): Changed-pixel fraction below which frames reuse the last detections, 0 to
+            disable motion gating. Defaults to 0.0.
+        --motion-interval (int, optional): Frames after which a motion-gated stream is inferred regardless. Defaults
+            to 30.
+        --keyframe (int, optional): Infer every N frames at most and propagate tracks in between, 0 to infer all
+            frames. Defaults to 0.
+        --keyframe-thres (float, optional): Relative track uncertainty that triggers an early keyframe. Defaults to
+            0.25.
 
     Returns:
         argparse.Namespace: Parsed command-line arguments as an argparse.Namespace object.
@@ -382,6 +669,7 @@ def parse_opt():
         help="whether to save boxes coordinates in YOLO format or Pascal-VOC format when save-txt is True, 0 for YOLO and 1 for Pascal-VOC",
     )
     parser.add_argument("--save-csv", action="store_true", help="save results in CSV format")
+    parser.add_argument("--save-results", nargs="+", default=[], choices=list(SINKS), help="per-detection files")
     parser.add_argument("--save-conf", action="store_true", help="save confidences in --save-txt labels")
     parser.add_argument("--save-crop", action="store_true", help="save cropped prediction boxes")
     parser.add_argument("--nosave", action="store_true", help="do not save images/videos")
@@ -399,6 +687,25 @@ def parse_opt():
     parser.add_argument("--half", action="store_true", help="use FP16 half-precision inference")
     parser.add_argument("--dnn", action="store_true", help="use OpenCV DNN for ONNX inference")
     parser.add_argument("--vid-stride", type=int, default=1, help="video frame-rate stride")
+    parser.add_argument("--stream-processes", action="store_true", help="decode streams in capture processes")
+    parser.add_argument("--stream-rates", nargs="+", type=float, help="max inferred FPS per stream, 0 for all")
+    parser.add_argument("--stream-priorities", nargs="+", type=int, help="per-stream priority, higher first")
+    parser.add_argument("--stream-batch", type=int, default=0, help="max streams inferred per batch, 0 for all")
+    parser.add_argument("--stream-wait", type=float, default=0.0, help="seconds a frame may wait for a fuller batch")
+    parser.add_argument("--slo", type=float, default=0.0, help="stream frame latency SLO (seconds), 0 off")
+    parser.add_argument("--slo-sizes", nargs="+", type=int, help="inference sizes (long side) to shed load through")
+    parser.add_argument("--slo-max-stride", type=int, default=4, help="max video frame-rate stride to shed load")
+    parser.add_argument("--chunks", type=int, default=0, help="parallel processes for frame ranges of one video")
+    parser.add_argument("--batch-size", type=int, default=1, help="batch size for file and directory sources")
+    parser.add_argument("--pipeline", type=int, default=0, help="pipelined stages queue size, 0 for sequential")
+    parser.add_argument("--writer-queue", type=int, default=32, help="frames queued per output video encoder")
+    parser.add_argument("--writer-policy", default="block", choices=POLICIES, help="policy on a full writer queue")
+    parser.add_argument("--lanes", type=str, default=None, help="(optional) lane polygons yaml for per-lane signals")
+    parser.add_argument("--track", action="store_true", help="track detections and count vehicles by track ID")
+    parser.add_argument("--motion-thres", type=float, default=0.0, help="motion gating changed-pixel fraction, 0 off")
+    parser.add_argument("--motion-interval", type=int, default=30, help="motion gating forced inference interval")
+    parser.add_argument("--keyframe", type=int, default=0, help="max frames between inferred keyframes, 0 off")
+    parser.add_argument("--keyframe-thres", type=float, default=0.25, help="track uncertainty for an early keyframe")
     opt = parser.parse_args()
     opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
     print_args(vars(opt))
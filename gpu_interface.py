@@ -3,10 +3,78 @@ from tkinter import ttk, filedialog
 import pandas as pd
 from tkinter import messagebox
 import os
-import subprocess
+import queue
+import time
+from datetime import datetime, timedelta
+from threading import Thread
 from tkinter import scrolledtext
 from traffic_data_generator import TrafficDataProcessor
 from traffic_visualizer import GraphVisualizerGUI
+from utils.callbacks import Callbacks
+
+# Time ranges offered for the on-demand Excel export of the traffic history
+EXPORT_RANGES = {'Last hour': timedelta(hours=1), 'Last day': timedelta(days=1), 'Last week': timedelta(weeks=1)}
+
+class InferenceWorker(Thread):
+    """Resident detection thread holding a warmed model, running detect.run() jobs from a queue"""
+
+    def __init__(self, weights='yolov5s.pt', device=''):
+        super().__init__(daemon=True)
+        self.weights = weights
+        self.device = device
+        self.model = None
+        self.jobs = queue.Queue()  # sources to analyze, None stops the worker
+        self.events = queue.Queue()  # text messages for the GUI thread
+        self.busy = False
+
+        # Stream per-frame progress and counts back to the GUI
+        self.callbacks = Callbacks()
+        self.callbacks.register_action('on_predict_batch_end', callback=self.on_batch_end)
+
+    def run(self):
+        # Heavy imports and weight loading happen once, off the Tk main loop
+        import torch
+        from detect import run as detect_run
+        from models.common import DetectMultiBackend
+        from utils.torch_utils import select_device
+
+        try:
+            self.model = DetectMultiBackend(self.weights, device=select_device(self.device))
+            with torch.inference_mode():
+                self.model(torch.zeros(1, 3, 640, 640, device=self.model.device))  # warmup, also on CPU
+            self.events.put("Model loaded and ready.\n")
+        except Exception as e:
+            self.events.put(f"\nError loading model: {str(e)}\n")
+            return
+
+        while (source := self.jobs.get()) is not None:
+            t = time.time()
+            try:
+                detect_run(weights=self.weights, source=source, model=self.model, callbacks=self.callbacks)
+                status = 'Cancelled' if self.callbacks.stop_predict else 'Done'
+                self.events.put(f"\n{status} in {time.time() - t:.1f}s\n")
+            except Exception as e:
+                self.events.put(f"\nError occurred: {str(e)}\n")
+            self.busy = False
+
+    def on_batch_end(self, path, im0s, pred, s):
+        self.events.put(f"{s}\n")
+
+    def submit(self, source):
+        """Queue a file for analysis, returns False if a job is already running"""
+        if self.busy:
+            return False
+        self.busy = True
+        self.callbacks.stop_predict = False  # reset on queueing, a cancel before the job starts still applies
+        self.jobs.put(source)
+        return True
+
+    def cancel(self):
+        self.callbacks.stop_predict = True
+
+    def stop(self):
+        self.cancel()
+        self.jobs.put(None)
 
 class ApplicationGUI:
     def __init__(self, root):
@@ -32,8 +100,17 @@ class ApplicationGUI:
         
         # Create main option buttons
         self.create_button("ACP Model", self.acp_model_click)
+        self.create_button("Cancel Analysis", self.cancel_click)
         self.create_button("DataSets", self.datasets_click)
         self.create_button("GraphSet", self.graphset_click)
+
+        # Create export range selector for DataSets
+        range_frame = ttk.Frame(self.main_frame)
+        range_frame.pack(fill=tk.X, padx=50)
+        ttk.Label(range_frame, text="Export range:").pack(side=tk.LEFT, padx=5)
+        self.export_range = ttk.Combobox(range_frame, values=list(EXPORT_RANGES), state="readonly")
+        self.export_range.pack(side=tk.LEFT, padx=5)
+        self.export_range.set("Last day")
         
         # Create output text area
         self.output_text = scrolledtext.ScrolledText(self.main_frame, height=15)
@@ -41,6 +118,26 @@ class ApplicationGUI:
         
         # Store reference to graph window
         self.graph_window = None
+
+        # Start the resident inference worker, the model loads while the GUI is idle
+        self.worker = InferenceWorker()
+        self.worker.start()
+        self.root.after(100, self.poll_worker)
+
+    def poll_worker(self):
+        """Move worker messages into the output area from the Tk main loop"""
+        try:
+            while True:
+                self.output_text.insert(tk.END, self.worker.events.get_nowait())
+                self.output_text.see(tk.END)
+        except queue.Empty:
+            pass
+        self.root.after(100, self.poll_worker)
+
+    def cancel_click(self):
+        if self.worker.busy:
+            self.worker.cancel()
+            self.output_text.insert(tk.END, "\nCancelling...\n")
         
     def create_button(self, text, command):
         btn = ttk.Button(self.buttons_frame, text=text, command=command)
@@ -59,35 +156,17 @@ class ApplicationGUI:
             )
             
             if file_path:
-                # Clear previous output
-                self.output_text.delete(1.0, tk.END)
-                self.output_text.insert(tk.END, "Processing file...\n")
-                self.root.update()
-                
-                # Construct the YOLO command
-                conda_python_path = "python"  # Update this path if needed
-                yolo_command = f"{conda_python_path} detect.py --source {file_path}"
-                
-                # Execute the command
-                process = subprocess.Popen(
-                    yolo_command,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                
-                # Get output and errors
-                output, errors = process.communicate()
-                
-                # Display output
-                self.output_text.insert(tk.END, "Command Output:\n")
-                self.output_text.insert(tk.END, output)
-                
-                if errors:
-                    self.output_text.insert(tk.END, "\nErrors:\n")
-                    self.output_text.insert(tk.END, errors)
-                
+                if not self.worker.is_alive():
+                    messagebox.showerror("Error", "Inference worker is not running, see output for details.")
+                    return
+
+                # Queue the file on the resident worker, progress streams into the output area
+                if self.worker.submit(file_path):
+                    self.output_text.delete(1.0, tk.END)
+                    self.output_text.insert(tk.END, "Processing file...\n")
+                else:
+                    messagebox.showinfo("Busy", "An analysis is already running. Cancel it or wait for it to finish.")
+
         except Exception as e:
             self.output_text.insert(tk.END, f"\nError occurred: {str(e)}\n")
             messagebox.showerror("Error", f"Error processing file: {str(e)}")
@@ -99,11 +178,13 @@ class ApplicationGUI:
             self.output_text.insert(tk.END, "Generating traffic data...\n")
             self.root.update()
             
-            # Generate the traffic data Excel file
-            excel_file = self.traffic_processor.generate_excel_report()
+            # Generate the traffic data Excel file for the selected time range only
+            start = datetime.now() - EXPORT_RANGES[self.export_range.get()]
+            excel_file = self.traffic_processor.generate_excel_report(start=start)
             
             # Show success message in output area
             self.output_text.insert(tk.END, f"\nTraffic data has been generated successfully!\n")
+            self.output_text.insert(tk.END, f"Exported rows since {start:%Y-%m-%d %H:%M:%S}\n")
             self.output_text.insert(tk.END, f"File saved as: {excel_file}\n")
             
             # Open the generated Excel file
@@ -132,11 +213,11 @@ class ApplicationGUI:
         
     def graphset_click(self):
         try:
-            # Check if traffic_data.xlsx exists
-            if not os.path.exists('traffic_data.xlsx'):
+            # Check if traffic history has data
+            if self.traffic_processor.history.latest().empty:
                 self.output_text.delete(1.0, tk.END)
                 self.output_text.insert(tk.END, "No traffic data found. Generating new data...\n")
-                self.traffic_processor.generate_excel_report()
+                self.traffic_processor.append_random_traffic()  # graphs read the history, no Excel export
                 self.output_text.insert(tk.END, "Traffic data generated successfully.\n")
             
             # If graph window already exists, bring it to front
@@ -148,7 +229,7 @@ class ApplicationGUI:
             # Create new graph window
             self.graph_window = tk.Toplevel(self.root)
             self.graph_window.protocol("WM_DELETE_WINDOW", self.on_graph_window_close)
-            GraphVisualizerGUI(self.graph_window)
+            GraphVisualizerGUI(self.graph_window, self.traffic_processor.history)
             
             self.output_text.delete(1.0, tk.END)
             self.output_text.insert(tk.END, "Opened graph visualization window.\n")
@@ -3,13 +3,18 @@
 
 import ast
 import contextlib
+import io
+import itertools
 import json
 import math
 import platform
+import struct
 import warnings
 import zipfile
 from collections import OrderedDict, namedtuple
 from copy import copy
+from functools import cached_property
+from multiprocessing.pool import ThreadPool
 from pathlib import Path
 from urllib.parse import urlparse
 
@@ -36,9 +41,11 @@ except (ImportError, AssertionError):
 from ultralytics.utils.plotting import Annotator, colors, save_one_box
 
 from utils import TryExcept
-from utils.dataloaders import exif_transpose, letterbox
+from utils.augmentations import letterbox_into
+from utils.dataloaders import exif_transpose
 from utils.general import (
     LOGGER,
+    NUM_THREADS,
     ROOT,
     Profile,
     check_requirements,
@@ -808,6 +815,7 @@ class AutoShape(nn.Module):
     multi_label = False  # NMS multiple labels per box
     classes = None  # (optional list) filter by class, i.e. = [0, 15, 16] for COCO persons, cats and dogs
     max_det = 1000  # maximum number of detections per image
+    keep_ims = True  # retain input images in Detections for show(), save(), crop() and render(), else reduced decode
     amp = False  # Automatic Mixed Precision (AMP) inference
 
     def __init__(self, model, verbose=True):
@@ -839,16 +847,63 @@ class AutoShape(nn.Module):
                 m.anchor_grid = list(map(fn, m.anchor_grid))
         return self
 
+    def _load(self, im, f, size):
+        """
+        Loads a forward() input as a contiguous HWC RGB array, returns it, its filename and original (h, w) shape.
+
+        Encoded image bytes, and JPEG files and URIs if images are not retained (keep_ims=False), are decoded by
+        `_decode()`, at reduced resolution where possible, boxes are still scaled to the original shape.
+        """
+        if isinstance(im, (str, Path)):  # filename or uri
+            uri, f = str(im).startswith("http"), im
+            if self.keep_ims:
+                im = np.asarray(exif_transpose(Image.open(requests.get(im, stream=True).raw if uri else im)))
+            else:
+                im = requests.get(im).content if uri else Path(im).read_bytes()
+        if isinstance(im, (bytes, bytearray, memoryview)):  # encoded image
+            im, shape = self._decode(im, size)
+            return im, Path(f).with_suffix(".jpg").name, shape
+        elif isinstance(im, Image.Image):  # PIL Image
+            im, f = np.asarray(exif_transpose(im)), getattr(im, "filename", f) or f
+        if im.shape[0] < 5:  # image in CHW
+            im = im.transpose((1, 2, 0))  # reverse dataloader .transpose(2, 0, 1)
+        im = im[..., :3] if im.ndim == 3 else cv2.cvtColor(im, cv2.COLOR_GRAY2BGR)  # enforce 3ch input
+        im = im if im.data.contiguous else np.ascontiguousarray(im)
+        return im, Path(f).with_suffix(".jpg").name, im.shape[:2]
+
+    def _decode(self, b, size):
+        """
+        Decodes encoded image bytes to a contiguous HWC RGB array applying EXIF orientation, returns it and its original
+        (h, w) shape.
+
+        If images are not retained (keep_ims=False) JPEGs are decoded at 1/2, 1/4 or 1/8 resolution, not below
+        inference `size`. Raises ValueError if the bytes are not a decodable image.
+        """
+        k, shape = 1, None
+        if not self.keep_ims and bytes(b[:2]) == b"\xff\xd8":  # JPEG
+            with contextlib.suppress(Exception):  # reads header only
+                pil = Image.open(io.BytesIO(b))
+                w, h = pil.size
+                shape = (w, h) if pil.getexif().get(0x0112, 1) in (5, 6, 7, 8) else (h, w)  # EXIF orientation
+                s = make_divisible(max(size), self.stride)
+                k = max((k for k in (8, 4, 2) if max(shape) / k >= s), default=1)
+        flag = getattr(cv2, f"IMREAD_REDUCED_COLOR_{k}") if k > 1 else cv2.IMREAD_COLOR
+        im = cv2.imdecode(np.frombuffer(b, dtype=np.uint8), flag)  # applies EXIF orientation
+        if im is None:
+            raise ValueError("image could not be decoded")
+        return np.ascontiguousarray(im[..., ::-1]), shape or im.shape[:2]  # BGR to RGB
+
     @smart_inference_mode()
     def forward(self, ims, size=640, augment=False, profile=False):
         """
         Performs inference on inputs with optional augment & profiling.
 
-        Supports various formats including file, URI, OpenCV, PIL, numpy, torch.
+        Supports various formats including file, URI, encoded bytes, OpenCV, PIL, numpy, torch.
         """
         # For size(height=640, width=1280), RGB images example inputs are:
         #   file:        ims = 'data/images/zidane.jpg'  # str or PosixPath
         #   URI:             = 'https://ultralytics.com/images/zidane.jpg'
+        #   bytes:           = Path('image.jpg').read_bytes()  # encoded image
         #   OpenCV:          = cv2.imread('image.jpg')[:,:,::-1]  # HWC BGR to RGB x(640,1280,3)
         #   PIL:             = Image.open('image.jpg') or ImageGrab.grab()  # HWC x(640,1280,3)
         #   numpy:           = np.zeros((640,1280,3))  # HWC
@@ -865,28 +920,21 @@ class AutoShape(nn.Module):
                 with amp.autocast(autocast):
                     return self.model(ims.to(p.device).type_as(p), augment=augment)  # inference
 
-            # Pre-process
+            # Pre-process, decode and letterbox in parallel into one preallocated batch
             n, ims = (len(ims), list(ims)) if isinstance(ims, (list, tuple)) else (1, [ims])  # number, list of images
-            shape0, shape1, files = [], [], []  # image and inference shapes, filenames
-            for i, im in enumerate(ims):
-                f = f"image{i}"  # filename
-                if isinstance(im, (str, Path)):  # filename or uri
-                    im, f = Image.open(requests.get(im, stream=True).raw if str(im).startswith("http") else im), im
-                    im = np.asarray(exif_transpose(im))
-                elif isinstance(im, Image.Image):  # PIL Image
-                    im, f = np.asarray(exif_transpose(im)), getattr(im, "filename", f) or f
-                files.append(Path(f).with_suffix(".jpg").name)
-                if im.shape[0] < 5:  # image in CHW
-                    im = im.transpose((1, 2, 0))  # reverse dataloader .transpose(2, 0, 1)
-                im = im[..., :3] if im.ndim == 3 else cv2.cvtColor(im, cv2.COLOR_GRAY2BGR)  # enforce 3ch input
-                s = im.shape[:2]  # HWC
-                shape0.append(s)  # image shape
-                g = max(size) / max(s)  # gain
-                shape1.append([int(y * g) for y in s])
-                ims[i] = im if im.data.contiguous else np.ascontiguousarray(im)  # update
-            shape1 = [make_divisible(x, self.stride) for x in np.array(shape1).max(0)]  # inf shape
-            x = [letterbox(im, shape1, auto=False)[0] for im in ims]  # pad
-            x = np.ascontiguousarray(np.array(x).transpose((0, 3, 1, 2)))  # stack and BHWC to BCHW
+            pool = ThreadPool(min(n, NUM_THREADS)) if n > 1 else None
+            starmap = pool.starmap if pool else lambda fn, args: list(itertools.starmap(fn, args))
+            try:
+                loaded = starmap(self._load, [(im, f"image{i}", size) for i, im in enumerate(ims)])
+                ims, files, shape0 = (list(x) for x in zip(*loaded))  # images, filenames, original shapes
+                shape1 = np.array([[int(y * (max(size) / max(s))) for y in s] for s in shape0]).max(0)  # scaled shapes
+                shape1 = [make_divisible(x, self.stride) for x in shape1]  # inf shape
+                x = np.full((n, *shape1, 3), 114, dtype=np.uint8)  # padded batch
+                starmap(letterbox_into, zip(ims, x))
+            finally:
+                if pool:
+                    pool.close()
+            x = np.ascontiguousarray(x.transpose((0, 3, 1, 2)))  # BHWC to BCHW
             x = torch.from_numpy(x).to(p.device).type_as(p) / 255  # uint8 to fp16/32
 
         with amp.autocast(autocast):
@@ -908,41 +956,102 @@ class AutoShape(nn.Module):
                 for i in range(n):
                     scale_boxes(shape1, y[i][:, :4], shape0[i])
 
-            return Detections(ims, y, files, dt, self.names, x.shape)
+            return Detections(ims if self.keep_ims else None, y, files, dt, self.names, x.shape, shapes=shape0)
 
 
 class Detections:
-    """Manages YOLOv5 detection results with methods for visualization, saving, cropping, and exporting detections."""
+    """
+    Manages YOLOv5 detection results with methods for visualization, saving, cropping, and exporting detections.
 
-    def __init__(self, ims, pred, files, times=(0, 0, 0), names=None, shape=None):
-        """Initializes the YOLOv5 Detections class with image info, predictions, filenames, timing and normalization."""
+    Detections of all images are held in one (n, 6) xyxy, conf, cls tensor `data`, rows of image i at
+    data[offsets[i]:offsets[i + 1]]. Box formats xywh, xyxyn and xywhn are computed on first access and cached.
+    """
+
+    def __init__(self, ims, pred, files, times=(0, 0, 0), names=None, shape=None, shapes=None):
+        """Initializes the YOLOv5 Detections class with images (None to not retain them) or their (h, w) `shapes`,
+        per-image predictions, filenames, timing and inference shape.
+        """
         super().__init__()
-        d = pred[0].device  # device
-        gn = [torch.tensor([*(im.shape[i] for i in [1, 0, 1, 0]), 1, 1], device=d) for im in ims]  # normalizations
-        self.ims = ims  # list of images as numpy arrays
-        self.pred = pred  # list of tensors pred[0] = (xyxy, conf, cls)
+        self.ims = ims  # list of images as numpy arrays, None if not retained
+        self.shapes = shapes or [im.shape[:2] for im in ims]  # image (h, w) shapes
+        self.data = pred[0] if len(pred) == 1 else torch.cat(pred)  # (xyxy, conf, cls) rows of all images
+        self.offsets = np.cumsum([0] + [len(x) for x in pred]).tolist()  # image i rows data[offsets[i]:offsets[i+1]]
         self.names = names  # class names
         self.files = files  # image filenames
         self.times = times  # profiling times
-        self.xyxy = pred  # xyxy pixels
-        self.xywh = [xyxy2xywh(x) for x in pred]  # xywh pixels
-        self.xyxyn = [x / g for x, g in zip(self.xyxy, gn)]  # xyxy normalized
-        self.xywhn = [x / g for x, g in zip(self.xywh, gn)]  # xywh normalized
-        self.n = len(self.pred)  # number of images (batch size)
+        self.n = len(pred)  # number of images (batch size)
         self.t = tuple(x.t / self.n * 1e3 for x in times)  # timestamps (ms)
         self.s = tuple(shape)  # inference BCHW shape
+        self._boxes = {"xyxy": self.data}  # concatenated box formats
+        self._frames = False  # per-image box formats as pandas DataFrames, see pandas()
+
+    def boxes(self, fmt="xyxy"):
+        """Returns detections of all images as one (n, 6) tensor of box format `fmt` ('xyxy', 'xywh', 'xyxyn' or
+        'xywhn'), confidence and class, computed on first use.
+        """
+        if fmt not in self._boxes:
+            if fmt == "xywh":
+                self._boxes[fmt] = xyxy2xywh(self.data)
+            else:  # normalized
+                gn = torch.tensor([[w, h, w, h, 1, 1] for h, w in self.shapes], device=self.data.device)
+                counts = torch.tensor(np.diff(self.offsets), device=self.data.device)
+                self._boxes[fmt] = self.boxes(fmt[:-1]) / gn.repeat_interleave(counts, dim=0)
+        return self._boxes[fmt]
+
+    def _split(self, x):
+        """Splits rows of all images `x` into a list of per-image views."""
+        return [x[a:b] for a, b in zip(self.offsets[:-1], self.offsets[1:])]
+
+    def _per_image(self, fmt):
+        """Returns per-image detections of box format `fmt`, tensors or DataFrames for a pandas() copy."""
+        if not self._frames:
+            return self._split(self.boxes(fmt))
+        x = self.boxes(fmt).cpu().numpy()
+        c = x[:, 5].astype(np.int64)
+        keys = self._columns(fmt)
+        df = pd.DataFrame(x[:, :5].astype(np.float64), columns=keys[:5])
+        df["class"], df["name"] = c, [self.names[k] for k in c.tolist()]
+        return [df.iloc[a:b].reset_index(drop=True) for a, b in zip(self.offsets[:-1], self.offsets[1:])]
+
+    @cached_property
+    def pred(self):
+        """List of per-image (xyxy, conf, cls) tensors."""
+        return self._split(self.data)
+
+    @cached_property
+    def xyxy(self):
+        """List of per-image xyxy pixel detections."""
+        return self._per_image("xyxy")
+
+    @cached_property
+    def xywh(self):
+        """List of per-image xywh pixel detections."""
+        return self._per_image("xywh")
+
+    @cached_property
+    def xyxyn(self):
+        """List of per-image xyxy normalized detections."""
+        return self._per_image("xyxyn")
+
+    @cached_property
+    def xywhn(self):
+        """List of per-image xywh normalized detections."""
+        return self._per_image("xywhn")
 
     def _run(self, pprint=False, show=False, save=False, crop=False, render=False, labels=True, save_dir=Path("")):
         """Executes model predictions, displaying and/or saving outputs with optional crops and labels."""
+        draw = show or save or crop or render
+        assert not draw or self.ims is not None, "images are not retained, set AutoShape.keep_ims = True"
         s, crops = "", []
-        for i, (im, pred) in enumerate(zip(self.ims, self.pred)):
-            s += f"\nimage {i + 1}/{len(self.pred)}: {im.shape[0]}x{im.shape[1]} "  # string
+        for i, ((h, w), pred) in enumerate(zip(self.shapes, self.pred)):
+            im = self.ims[i] if draw else None
+            s += f"\nimage {i + 1}/{self.n}: {h}x{w} "  # string
             if pred.shape[0]:
                 for c in pred[:, -1].unique():
                     n = (pred[:, -1] == c).sum()  # detections per class
                     s += f"{n} {self.names[int(c)]}{'s' * (n > 1)}, "  # add to string
                 s = s.rstrip(", ")
-                if show or save or render or crop:
+                if draw:
                     annotator = Annotator(im, example=str(self.names))
                     for *box, conf, cls in reversed(pred):  # xyxy, confidence, class
                         label = f"{self.names[int(cls)]} {conf:.2f}"
@@ -963,6 +1072,8 @@ class Detections:
             else:
                 s += "(no detections)"
 
+            if not (show or save or render):
+                continue
             im = Image.fromarray(im.astype(np.uint8)) if isinstance(im, np.ndarray) else im  # from np
             if show:
                 if is_jupyter():
@@ -1022,16 +1133,69 @@ class Detections:
         """
         Returns detections as pandas DataFrames for various box formats (xyxy, xyxyn, xywh, xywhn).
 
-        Example: print(results.pandas().xyxy[0]).
+        DataFrames of each box format are built on first access. Example: print(results.pandas().xyxy[0]).
         """
-        new = copy(self)  # return copy
-        ca = "xmin", "ymin", "xmax", "ymax", "confidence", "class", "name"  # xyxy columns
-        cb = "xcenter", "ycenter", "width", "height", "confidence", "class", "name"  # xywh columns
-        for k, c in zip(["xyxy", "xyxyn", "xywh", "xywhn"], [ca, ca, cb, cb]):
-            a = [[x[:5] + [int(x[5]), self.names[int(x[5])]] for x in x.tolist()] for x in getattr(self, k)]  # update
-            setattr(new, k, [pd.DataFrame(x, columns=c) for x in a])
+        new = copy(self)  # return copy, sharing data and computed box formats
+        for k in ["xyxy", "xyxyn", "xywh", "xywhn"]:
+            new.__dict__.pop(k, None)  # drop cached tensor lists
+        new._frames = True
         return new
 
+    @staticmethod
+    def _columns(fmt="xyxy"):
+        """Returns the column names of box format `fmt` ('xyxy', 'xyxyn', 'xywh' or 'xywhn')."""
+        box = ("xmin", "ymin", "xmax", "ymax") if fmt.startswith("xyxy") else ("xcenter", "ycenter", "width", "height")
+        return (*box, "confidence", "class", "name")
+
+    def numpy(self, fmt="xyxy"):
+        """
+        Returns detections as one (n, 6) float32 NumPy array of box, confidence and class per image.
+
+        Example: boxes = results.numpy("xywhn")[0][:, :4].
+        """
+        return np.split(self.boxes(fmt).float().cpu().numpy(), self.offsets[1:-1])
+
+    def columns(self, fmt="xyxy"):
+        """
+        Returns detections as one columnar dict per image, NumPy arrays under the pandas() column names of `fmt` and a
+        list of class names under 'name'.
+
+        Example: conf = results.columns()[0]["confidence"].
+        """
+        keys = self._columns(fmt)
+        x = self.boxes(fmt).float().cpu().numpy()
+        c = x[:, 5].astype(np.int64)
+        names = [self.names[k] for k in c.tolist()]
+        return [
+            {**dict(zip(keys[:5], x[a:b, :5].T)), "class": c[a:b], "name": names[a:b]}
+            for a, b in zip(self.offsets[:-1], self.offsets[1:])
+        ]
+
+    def json(self, fmt="xyxy"):
+        """
+        Returns detections as one JSON string of records per image, as pandas().xyxy[i].to_json(orient="records")
+        without building DataFrames.
+        """
+        keys = self._columns(fmt)
+        rows = [dict(zip(keys, (*r[:5], int(r[5]), self.names[int(r[5])]))) for r in self.boxes(fmt).tolist()]
+        return [json.dumps(rows[a:b]) for a, b in zip(self.offsets[:-1], self.offsets[1:])]
+
+    def tobytes(self, fmt="xyxy"):
+        """
+        Returns detections as one binary block per image, a 12-byte header (b'YOLO', uint16 version 1, uint16 columns 6,
+        uint32 rows n) followed by n rows of little-endian float32 box, confidence and class.
+
+        Example: n = struct.unpack_from("<4sHHI", b)[3]; x = np.frombuffer(b, "<f4", n * 6, 12).reshape(n, 6).
+        """
+        return [struct.pack("<4sHHI", b"YOLO", 1, 6, len(x)) + x.astype("<f4").tobytes() for x in self.numpy(fmt)]
+
+    def msgpack(self, fmt="xyxy"):
+        """Returns detections as one msgpack map of columns (see columns()) per image."""
+        check_requirements("msgpack")
+        import msgpack
+
+        return [msgpack.packb({k: np.asarray(v).tolist() for k, v in x.items()}) for x in self.columns(fmt)]
+
     def tolist(self):
         """
         Converts a Detections object into a list of individual detection results for iteration.
@@ -1041,12 +1205,13 @@ class Detections:
         r = range(self.n)  # iterable
         return [
             Detections(
-                [self.ims[i]],
-                [self.pred[i]],
+                None if self.ims is None else [self.ims[i]],
+                [self.pred[i]],  # view of data
                 [self.files[i]],
                 self.times,
                 self.names,
                 self.s,
+                shapes=[self.shapes[i]],
             )
             for i in r
         ]
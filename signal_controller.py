@@ -0,0 +1,305 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""
+Run an always-on YOLOv5 traffic signal controller for one or more intersections.
+
+Every camera listed in the lanes YAML is opened once through LoadStreams (one capture thread per camera), the model is
+loaded and warmed once, and on every tick the new frames of all cameras are run through a single batched forward pass.
+Detections are reduced to per-lane counts, cameras without a new frame keep their last counts, and the signals of all
+intersections are set in one vectorized SignalEngine pass.
+
+Usage:
+    $ python signal_controller.py --weights yolov5s.pt --lanes data/lanes.yaml --interval 1.0
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import torch
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[0]  # YOLOv5 root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+ROOT = Path(os.path.relpath(ROOT, Path.cwd()))  # relative
+
+from models.common import DetectMultiBackend
+from utils.dataloaders import LoadStreams
+from utils.general import (
+    LOGGER,
+    Profile,
+    check_img_size,
+    check_requirements,
+    colorstr,
+    non_max_suppression,
+    print_args,
+    scale_boxes,
+    yaml_load,
+)
+from utils.history import TrafficHistory
+from utils.lanes import load_lane_counters
+from utils.shedding import LoadShedder, scaled_sizes
+from utils.signals import SignalEngine
+from utils.torch_utils import select_device, smart_inference_mode
+from utils.tracker import Tracker
+
+
+@smart_inference_mode()
+def run(
+    weights=ROOT / "yolov5s.pt",  # model path or triton URL
+    lanes=ROOT / "data/lanes.yaml",  # lane polygons and camera sources yaml path
+    data=ROOT / "data/coco128.yaml",  # dataset.yaml path
+    imgsz=(640, 640),  # inference size (height, width)
+    conf_thres=0.25,  # confidence threshold
+    iou_thres=0.45,  # NMS IOU threshold
+    max_det=1000,  # maximum detections per image
+    device="",  # cuda device, i.e. 0 or 0,1,2,3 or cpu
+    classes=None,  # filter by class: --class 0, or --class 0 2 3
+    agnostic_nms=False,  # class-agnostic NMS
+    half=False,  # use FP16 half-precision inference
+    dnn=False,  # use OpenCV DNN for ONNX inference
+    vid_stride=1,  # video frame-rate stride
+    stream_processes=False,  # decode every camera in its own process into shared memory instead of a thread
+    stream_batch=0,  # max cameras inferred per tick, 0 for all
+    stream_wait=0.0,  # seconds a new frame may wait for a fuller batch
+    slo=0.0,  # frame latency SLO in seconds, shed load by imgsz and vid_stride above it, 0 off
+    slo_sizes=None,  # inference sizes (long side) to step through for the SLO, default 100, 80 and 65% of imgsz
+    slo_max_stride=4,  # max video frame-rate stride for the SLO
+    interval=1.0,  # signal update cadence (seconds)
+    ticks=0,  # number of ticks to run, 0 for forever
+    history=None,  # traffic history store directory to append per-lane rows to
+    track=False,  # count unique tracked vehicles instead of per-frame detections
+    track_window=1,  # ticks a tracked vehicle stays counted in the lane it was last seen in
+):
+    """
+    Runs the multi-camera signal controller loop until all streams end, `ticks` are done or Ctrl+C.
+
+    Args:
+        weights (str | Path): Model weights path or Triton URL. Default is 'yolov5s.pt'.
+        lanes (str | Path): Lanes YAML with per-camera `source`, `intersection` and `lanes` polygons, and optional
+            `fps` (max inferred frame rate) and `priority` (higher is inferred first). Default is 'data/lanes.yaml'.
+        data (str | Path): Dataset YAML path. Default is 'data/coco128.yaml'.
+        imgsz (tuple[int, int]): Inference image size as (height, width). Default is (640, 640).
+        conf_thres (float): Confidence threshold for detections. Default is 0.25.
+        iou_thres (float): IoU threshold for non-max suppression. Default is 0.45.
+        max_det (int): Maximum number of detections per image. Default is 1000.
+        device (str): CUDA device, i.e. '0' or '0,1,2,3' or 'cpu'. Default is '' (best available).
+        classes (list[int], optional): Class indices to keep. Default is None (all classes).
+        agnostic_nms (bool): If True, perform class-agnostic NMS. Default is False.
+        half (bool): If True, use FP16 half-precision inference. Default is False.
+        dnn (bool): If True, use OpenCV DNN backend for ONNX inference. Default is False.
+        vid_stride (int): Video frame-rate stride. Default is 1.
+        stream_processes (bool): If True, every camera is decoded by its own capture process into shared memory, so
+            decoding many cameras does not contend for the GIL with inference. Default is False.
+        stream_batch (int): Max cameras inferred per tick, higher `priority` cameras of the lanes YAML first (i.e.
+            stop-line cameras), then those with the oldest frames. Cameras with an `fps` key are inferred at most at
+            that rate. Default is 0 (all cameras with a new frame).
+        stream_wait (float): Seconds a new frame may wait for more cameras to fill a `stream_batch` batch. Default is
+            0.0.
+        slo (float): Frame latency SLO in seconds, from capture to signals. If > 0, the inference size is stepped down
+            through `slo_sizes` and then the video stride up to `slo_max_stride` while latency exceeds it, so signals
+            keep following fresh frames under overload (utils.shedding.LoadShedder). Default is 0.0 (off).
+        slo_sizes (list[int], optional): Long sides of the inference sizes to step through, all warmed at start.
+            Default is None (100, 80 and 65% of `imgsz`).
+        slo_max_stride (int): Max video frame-rate stride the load shedder may set. Default is 4.
+        interval (float): Seconds between ticks, each tick runs one batched inference and updates all signals.
+            Default is 1.0.
+        ticks (int): Number of ticks to run, 0 runs forever. Default is 0.
+        history (str | Path, optional): TrafficHistory directory, per-lane counts and signals are appended every tick.
+            Default is None.
+        track (bool): If True, detections are tracked per camera (utils.tracker.Tracker) and each vehicle is counted
+            once per lane, flickering unconfirmed detections are dropped. History rows then also hold the vehicles
+            that entered each lane in the tick (Vehicles_Entered, from LaneCounter.track() lane entry events).
+            Default is False.
+        track_window (int): With `track`, ticks a vehicle stays counted in its last lane. Default is 1.
+
+    Returns:
+        (dict): Last {intersection: signals} assignment.
+    """
+    cameras = yaml_load(lanes)["cameras"]
+    sources = [str(v["source"]) for v in cameras.values()]
+    junctions = [str(v.get("intersection", k)) for k, v in cameras.items()]  # intersection of each camera
+    rates = [float(v.get("fps", 0)) for v in cameras.values()]  # max inferred FPS of each camera, 0 for all frames
+    priorities = [int(v.get("priority", 0)) for v in cameras.values()]
+
+    # Load model
+    device = select_device(device)
+    model = DetectMultiBackend(weights, device=device, dnn=dnn, data=data, fp16=half)
+    stride, names, pt = model.stride, model.names, model.pt
+    imgsz = check_img_size(imgsz, s=stride)  # check image size
+    counters = list(load_lane_counters(lanes, names, device).values())
+    store = TrafficHistory(history) if history else None
+
+    # Map camera lanes onto one (intersections, lanes, categories) count array, same-named lanes are summed
+    engine = SignalEngine()
+    junction_names = list(dict.fromkeys(junctions))
+    lane_names = [[] for _ in junction_names]  # lanes of each intersection
+    slots = []  # (intersection index, lane indices) of each camera
+    for c, junction in zip(counters, junctions):
+        j = junction_names.index(junction)
+        lane_names[j].extend(x for x in c.lanes if x not in lane_names[j])
+        slots.append((j, [lane_names[j].index(x) for x in c.lanes]))
+    cats = [counters[0].categories.index(k) for k in engine.categories]  # LaneCounter to engine category order
+    vehicles = [k != "people" for k in engine.categories]
+    mask = np.zeros((len(junction_names), max(len(x) for x in lane_names)), dtype=bool)  # False for padding lanes
+    for j, x in enumerate(lane_names):
+        mask[j, : len(x)] = True
+
+    # Dataloader
+    dataset = LoadStreams(
+        sources,
+        img_size=imgsz,
+        stride=stride,
+        auto=pt,
+        vid_stride=vid_stride,
+        fresh=pt,
+        processes=stream_processes,
+        rates=rates,
+        priorities=priorities,
+        max_batch=stream_batch if pt else 0,  # fixed batch size backends infer all cameras
+        max_wait=stream_wait,
+    )
+    bs = len(dataset)
+    shedder = None
+    if slo:  # load shedding, fixed input size backends by stride only
+        sizes = scaled_sizes(imgsz, slo_sizes, stride) if pt else [imgsz]
+        shedder = LoadShedder(slo, sizes, vid_stride, slo_max_stride)
+    trackers = [Tracker() for _ in range(bs)] if track else None
+    last = [np.zeros((len(k), len(cats)), dtype=np.int64) for _, k in slots]  # latest lane counts of each camera
+    entries = [np.zeros_like(x) for x in last]  # lane entries of tracked vehicles of each camera in this tick
+
+    # Run controller
+    for x in shedder.sizes if shedder else [imgsz]:
+        model.warmup(imgsz=(1 if pt or model.triton else bs, 3, *x))  # warmup
+    prefix = colorstr("controller: ")
+    LOGGER.info(f"{prefix}{bs} cameras, {len(set(junctions))} intersections, {interval:g}s interval")
+    n, signals, dt = 0, {}, (Profile(device=device), Profile(device=device), Profile(device=device))
+    try:
+        for _, im, im0s, _, _ in dataset:
+            t0 = time.time()
+            captured = [t0 - a for i, a in zip(dataset.index, dataset.age) if dataset.new[i]]  # capture times
+            with dt[0]:
+                im = torch.from_numpy(im).to(model.device)
+                im = im.half() if model.fp16 else im.float()  # uint8 to fp16/32
+                im /= 255  # 0 - 255 to 0.0 - 1.0
+
+            # Inference
+            with dt[1]:
+                pred = model(im)
+
+            # NMS and lane counts
+            with dt[2]:
+                pred = non_max_suppression(pred, conf_thres, iou_thres, classes, agnostic_nms, max_det=max_det)
+                for det, i, im0 in zip(pred, dataset.index, im0s):  # cameras without a new frame keep their counts
+                    if not dataset.new[i]:
+                        continue
+                    det[:, :4] = scale_boxes(im.shape[2:], det[:, :4], im0.shape)
+                    if trackers:
+                        events = counters[i].track(trackers[i].update(det))
+                        entries[i] = counters[i].event_counts(events)[:, cats].numpy()
+                        c = counters[i].unique_counts(track_window)
+                    else:
+                        c = counters[i].counts(det)
+                    last[i] = c[:, cats].cpu().numpy()
+                counts = np.zeros((*mask.shape, len(cats)), dtype=np.int64)
+                entered = np.zeros_like(counts)
+                for (j, k), c, e in zip(slots, last, entries):
+                    counts[j, k] += c
+                    entered[j, k] += e
+                entries = [np.zeros_like(x) for x in last]
+
+            # Signals, all intersections in one vectorized pass
+            codes, density = engine(counts, mask)
+            lights = engine.names(codes)
+            n += 1
+            s, now, rows = f"tick {n}: ", datetime.now(), []
+            for j, junction in enumerate(junction_names):
+                signals[junction] = dict(zip(lane_names[j], lights[j].tolist()))
+                for k, lane in enumerate(lane_names[j]):
+                    x = dict(zip(engine.categories, counts[j, k].tolist()))
+                    rows.append(
+                        {
+                            "Timestamp": now,
+                            "Intersection": junction,
+                            "Lane": lane,
+                            **{c.capitalize(): v for c, v in x.items()},
+                            "Total_Vehicles": sum(v for c, v in x.items() if c != "people"),
+                            "Traffic_Density": float(density[j, k]),
+                            "Signal_Status": lights[j, k].capitalize(),
+                            **({"Vehicles_Entered": int(entered[j, k, vehicles].sum())} if trackers else {}),
+                        }
+                    )
+                s += f"{junction} " + ", ".join(
+                    f"{lane} {lights[j, k]} ({density[j, k]:g}u)" for k, lane in enumerate(lane_names[j])
+                )
+                s += "; "
+            s += f"{dt[0].dt * 1e3:.1f}ms pre-process, {dt[1].dt * 1e3:.1f}ms inference, {dt[2].dt * 1e3:.1f}ms NMS, "
+            LOGGER.info(f"{s}{(time.time() - t0) * 1e3:.1f}ms tick")
+            if store:
+                store.append(rows)
+            if shedder:
+                t = time.time()
+                shedder.update([t - x for x in captured])  # capture to signals latencies
+                shedder.apply(dataset)  # size and stride for the next tick
+            if ticks and n >= ticks:
+                break
+            time.sleep(max(interval - (time.time() - t0), 0))  # fixed cadence
+    except KeyboardInterrupt:
+        LOGGER.info(f"{prefix}stopped by user")
+    finally:
+        if store:
+            store.close()
+
+    # Print results
+    if n:
+        t = tuple(x.t / n * 1e3 for x in dt)  # speeds per tick
+        LOGGER.info(f"Speed: %.1fms pre-process, %.1fms inference, %.1fms NMS per tick at shape {(bs, 3, *imgsz)}" % t)
+    return signals
+
+
+def parse_opt():
+    """Parses command-line arguments for the YOLOv5 signal controller."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--weights", nargs="+", type=str, default=ROOT / "yolov5s.pt", help="model path or triton URL")
+    parser.add_argument("--lanes", type=str, default=ROOT / "data/lanes.yaml", help="lanes and camera sources yaml")
+    parser.add_argument("--data", type=str, default=ROOT / "data/coco128.yaml", help="(optional) dataset.yaml path")
+    parser.add_argument("--imgsz", "--img", "--img-size", nargs="+", type=int, default=[640], help="inference size h,w")
+    parser.add_argument("--conf-thres", type=float, default=0.25, help="confidence threshold")
+    parser.add_argument("--iou-thres", type=float, default=0.45, help="NMS IoU threshold")
+    parser.add_argument("--max-det", type=int, default=1000, help="maximum detections per image")
+    parser.add_argument("--device", default="", help="cuda device, i.e. 0 or 0,1,2,3 or cpu")
+    parser.add_argument("--classes", nargs="+", type=int, help="filter by class: --classes 0, or --classes 0 2 3")
+    parser.add_argument("--agnostic-nms", action="store_true", help="class-agnostic NMS")
+    parser.add_argument("--half", action="store_true", help="use FP16 half-precision inference")
+    parser.add_argument("--dnn", action="store_true", help="use OpenCV DNN for ONNX inference")
+    parser.add_argument("--vid-stride", type=int, default=1, help="video frame-rate stride")
+    parser.add_argument("--stream-processes", action="store_true", help="decode cameras in capture processes")
+    parser.add_argument("--stream-batch", type=int, default=0, help="max cameras inferred per tick, 0 for all")
+    parser.add_argument("--stream-wait", type=float, default=0.0, help="seconds a frame may wait for a fuller batch")
+    parser.add_argument("--slo", type=float, default=0.0, help="frame latency SLO (seconds), 0 off")
+    parser.add_argument("--slo-sizes", nargs="+", type=int, help="inference sizes (long side) to shed load through")
+    parser.add_argument("--slo-max-stride", type=int, default=4, help="max video frame-rate stride to shed load")
+    parser.add_argument("--interval", type=float, default=1.0, help="signal update interval (seconds)")
+    parser.add_argument("--ticks", type=int, default=0, help="number of ticks to run, 0 for forever")
+    parser.add_argument("--history", type=str, default=None, help="(optional) traffic history dir to append to")
+    parser.add_argument("--track", action="store_true", help="count unique tracked vehicles per lane")
+    parser.add_argument("--track-window", type=int, default=1, help="ticks a tracked vehicle stays counted")
+    opt = parser.parse_args()
+    opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
+    print_args(vars(opt))
+    return opt
+
+
+def main(opt):
+    """Checks requirements and runs the signal controller with command-line options."""
+    check_requirements(ROOT / "requirements.txt", exclude=("tensorboard", "thop"))
+    run(**vars(opt))
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    main(opt)
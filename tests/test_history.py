@@ -0,0 +1,50 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Tests of utils.history.TrafficHistory."""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from utils.history import TrafficHistory
+
+
+def rows(t, n, lane="lane_1"):
+    """Returns `n` rows one second apart from time `t`."""
+    return [
+        {"Timestamp": t + timedelta(seconds=i), "Intersection": "j1", "Lane": lane, "Cars": i} for i in range(n)
+    ]
+
+
+def test_tail_compact_tail(tmp_path):
+    """Rows a reader already returned are not returned again after their files are compacted."""
+    history = TrafficHistory(tmp_path)
+    t = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)  # closed hour
+    history.extend(pd.DataFrame(rows(t, 3)))
+    history.extend(pd.DataFrame(rows(t + timedelta(minutes=1), 2)))
+    seen = set()
+    assert len(history.tail(t, seen)) == 5
+
+    history.extend(pd.DataFrame(rows(t + timedelta(minutes=2), 4, "lane_2")))  # not read yet
+    assert history.compact()
+    assert len(list(tmp_path.glob("intersection=*/date=*/hour=*/*.parquet"))) == 1
+    df = history.tail(t, seen)
+    assert len(df) == 4 and set(df["Lane"]) == {"lane_2"}
+    assert len(history.tail(t, seen)) == 0
+
+    history.extend(pd.DataFrame(rows(t + timedelta(minutes=3), 1, "lane_3")))
+    assert history.compact()  # compacts a compacted file again
+    assert len(history.tail(t, set())) == 10  # new readers see every row once
+    df = history.tail(t, seen)
+    assert len(df) == 1 and set(df["Lane"]) == {"lane_3"}
+
+
+def test_recover_once(tmp_path):
+    """A dead writer's WAL is replayed by the first store opened and removed."""
+    (tmp_path / "_wal").mkdir()
+    wal = tmp_path / "_wal" / "999999999-deadbeef.jsonl"
+    wal.write_text("".join(json.dumps(r, default=str) + "\n" for r in rows(datetime.now(), 3)))
+    assert len(TrafficHistory(tmp_path).read()) == 3
+    assert not wal.exists() and not os.path.exists(tmp_path / "_recover.lock")
+    assert len(TrafficHistory(tmp_path).read()) == 3
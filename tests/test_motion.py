@@ -0,0 +1,24 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Tests of utils.motion.MotionGate."""
+
+import numpy as np
+import torch
+
+from utils.motion import MotionGate
+
+
+def test_merge_stream_served_first():
+    """A higher-numbered stream served first gets its detections, not yet inferred streams get empty ones."""
+    gate = MotionGate(thres=0.01, streams=2)
+    im0s = [np.zeros((64, 64, 3), dtype=np.uint8)] * 2
+    run = gate(im0s, [1])  # scheduler serves stream 1 only
+    assert run == [1]
+    det = torch.tensor([[1.0, 2.0, 3.0, 4.0, 0.9, 0.0]])
+    pred = gate.merge([det], run)
+    assert len(pred) == 2
+    assert pred[0].shape == (0, 6)
+    assert torch.equal(pred[1], det)
+
+    run = gate(im0s, [0])  # stream 0 served later
+    pred = gate.merge([det * 2], run)
+    assert torch.equal(pred[0], det * 2) and torch.equal(pred[1], det)
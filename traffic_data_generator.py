@@ -1,12 +1,21 @@
 import pandas as pd
+import numpy as np
 from datetime import datetime
 import os
 import random
 
+from utils.history import TrafficHistory
+from utils.signals import SignalEngine
+
+ENGINE = SignalEngine()
+
 class TrafficDataProcessor:
-    def __init__(self):
+    def __init__(self, history=None, intersection='junction_1'):
         self.excel_file = 'traffic_data.xlsx'
         self.lanes = ['Lane_1', 'Lane_2', 'Lane_3', 'Lane_4']
+        self.intersection = intersection
+        # Append-only traffic history shared with the signal controller and visualizer
+        self.history = history or TrafficHistory()
         
     def generate_random_traffic(self):
         """Generate random traffic data for each lane with more realistic patterns"""
@@ -25,8 +34,8 @@ class TrafficDataProcessor:
         for lane in self.lanes:
             # Base random ranges for each vehicle type
             data = {
-                'Date': current_time.strftime('%Y-%m-%d'),
-                'Time': current_time.strftime('%H:%M:%S'),
+                'Timestamp': current_time,
+                'Intersection': self.intersection,
                 'Lane': lane,
                 # Cars: Most common, higher range
                 'Cars': random.randint(10, 30) * multiplier,
@@ -55,104 +64,30 @@ class TrafficDataProcessor:
                 data['Buses']
             )
             
-            # Calculate traffic density (weighted sum)
-            data['Traffic_Density'] = (
-                data['Cars'] * 1.0 +      # Base weight for cars
-                data['Trucks'] * 2.5 +    # Trucks take more space
-                data['People'] * 0.3 +    # People take less space
-                data['Bicycles'] * 0.5 +  # Bicycles take little space
-                data['Motorcycles'] * 0.7 + # Motorcycles take moderate space
-                data['Buses'] * 3.0       # Buses take the most space
-            )
-            
-            # Add some randomization to simulate real-world variations
-            lane_factor = random.uniform(0.8, 1.2)
-            data['Traffic_Density'] *= lane_factor
-            
-            # Determine signal color based on traffic density
-            data['Signal_Status'] = 'Red'  # Default signal color
-            
             data_rows.append(data)
             
-        # Sort data rows by traffic density and assign signals
-        sorted_data = sorted(data_rows, key=lambda x: x['Traffic_Density'], reverse=True)
-        sorted_data[0]['Signal_Status'] = 'Green'  # Highest traffic gets green
-        sorted_data[1]['Signal_Status'] = 'Orange'  # Second highest gets orange
+        df = pd.DataFrame(data_rows)
         
-        return pd.DataFrame(data_rows)
-    
-    def generate_excel_report(self):
-        """Generate and save traffic data to Excel file with formatting"""
-        # Generate traffic data
-        df = self.generate_random_traffic()
+        # Calculate traffic density with the shared PCU weight table (utils/signals.py)
+        counts = df[[k.capitalize() for k in ENGINE.categories]].to_numpy()
+        # Add some randomization to simulate real-world variations
+        lane_factor = np.random.uniform(0.8, 1.2, len(df))
+        df['Traffic_Density'] = ENGINE.density(counts) * lane_factor
         
-        # Create Excel writer object
-        with pd.ExcelWriter(self.excel_file, engine='xlsxwriter') as writer:
-            # Write the main data
-            df.to_excel(writer, sheet_name='Traffic_Data', index=False)
-            
-            # Get workbook and worksheet objects
-            workbook = writer.book
-            worksheet = writer.sheets['Traffic_Data']
-            
-            # Define formats
-            header_format = workbook.add_format({
-                'bold': True,
-                'bg_color': '#D3D3D3',
-                'border': 1,
-                'align': 'center'
-            })
-            
-            cell_format = workbook.add_format({
-                'border': 1,
-                'align': 'center'
-            })
-            
-            number_format = workbook.add_format({
-                'border': 1,
-                'align': 'center',
-                'num_format': '0'  # Show integers without decimals
-            })
-            
-            # Apply formats
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_format)
-                
-                # Set column widths and formats
-                if value in ['Date']:
-                    worksheet.set_column(col_num, col_num, 12)
-                elif value in ['Time', 'Signal_Status']:
-                    worksheet.set_column(col_num, col_num, 10)
-                elif value in ['Lane']:
-                    worksheet.set_column(col_num, col_num, 8)
-                elif value in ['Traffic_Density']:
-                    worksheet.set_column(col_num, col_num, 15)
-                else:
-                    worksheet.set_column(col_num, col_num, 10)
-            
-            # Add conditional formatting for signal status
-            worksheet.conditional_format(1, df.columns.get_loc('Signal_Status'), 
-                                      len(df) + 1, df.columns.get_loc('Signal_Status'), 
-                                      {'type': 'text',
-                                       'criteria': 'containing',
-                                       'value': 'Green',
-                                       'format': workbook.add_format({'bg_color': '#90EE90'})})
-            
-            worksheet.conditional_format(1, df.columns.get_loc('Signal_Status'), 
-                                      len(df) + 1, df.columns.get_loc('Signal_Status'), 
-                                      {'type': 'text',
-                                       'criteria': 'containing',
-                                       'value': 'Orange',
-                                       'format': workbook.add_format({'bg_color': '#FFA500'})})
-            
-            worksheet.conditional_format(1, df.columns.get_loc('Signal_Status'), 
-                                      len(df) + 1, df.columns.get_loc('Signal_Status'), 
-                                      {'type': 'text',
-                                       'criteria': 'containing',
-                                       'value': 'Red',
-                                       'format': workbook.add_format({'bg_color': '#FF6B6B'})})
+        # Highest traffic gets green, second highest orange, others red
+        df['Signal_Status'] = [s.capitalize() for s in ENGINE.names(ENGINE.assign(df['Traffic_Density']))]
         
-        return self.excel_file
+        return df
+    
+    def append_random_traffic(self):
+        """Append new traffic data to the history store"""
+        self.history.append(self.generate_random_traffic())
+        self.history.flush()
+
+    def generate_excel_report(self, start=None, end=None):
+        """Append new traffic data to the history store and export the [start, end) time range to Excel"""
+        self.append_random_traffic()
+        return self.history.export_excel(self.excel_file, start=start, end=end)
 
 def main():
     processor = TrafficDataProcessor()
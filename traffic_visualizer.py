@@ -3,151 +3,286 @@ import seaborn as sns
 import pandas as pd
 import tkinter as tk
 from tkinter import ttk
+from threading import Event, Thread
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 
+from utils.history import TrafficHistory
+
 class TrafficVisualizer:
-    def __init__(self, excel_file='traffic_data.xlsx'):
-        self.excel_file = excel_file
-        self.data = pd.read_excel(self.excel_file)
-        
+    # Vehicle columns shown for each lane
+    vehicle_columns = ['Cars', 'Trucks', 'People', 'Bicycles', 'Motorcycles', 'Buses']
+
+    def __init__(self, history=None, intersection=None):
+        self.history = history or TrafficHistory()
+        self.intersection = intersection
+        # Most recent row per lane, read from the newest hour partition only
+        self.data = self.history.latest(intersection)
+        self.last = self.data['Timestamp'].max() if len(self.data) else None
+        self.seen = set()  # history files already read by load_new()
+
+        # Plotted artists per lane, updated in place by update_artists()
+        self.kind = None
+        self.plots = []
+        self.background = None
+
+    def load_new(self):
+        """Tail rows appended to the history since the last read, return True if the latest lane data changed"""
+        new = self.history.tail(self.last, self.seen, self.intersection)
+        if new.empty:
+            return False
+        # New files may hold rows flushed late with older timestamps, keep the newest row per lane
+        data = pd.concat([self.data, new], ignore_index=True).sort_values('Timestamp', kind='stable')
+        self.data = data.groupby(['Intersection', 'Lane'], sort=False).tail(1)  # atomic swap for the GUI thread
+        self.last = new['Timestamp'].max() if self.last is None else max(self.last, new['Timestamp'].max())
+        return True
+
+    def lane_values(self, lane):
+        """Latest vehicle counts of a lane, zeros if the lane has no data"""
+        lane_data = self.data[self.data['Lane'] == lane]
+        if lane_data.empty:
+            return np.zeros(len(self.vehicle_columns))
+        return lane_data[self.vehicle_columns].iloc[-1].to_numpy(dtype=float)
+
     def create_bar_graph(self, figure, lanes):
         figure.clear()
-        
+        self.kind, self.plots = 'bar', []
+
         # Create 2x2 subplots for the four lanes
         for idx, lane in enumerate(lanes, 1):
             ax = figure.add_subplot(2, 2, idx)
-            
-            # Filter data for the current lane
-            lane_data = self.data[self.data['Lane'] == lane]
-            
-            # Get vehicle columns (exclude non-vehicle columns)
-            vehicle_columns = ['Cars', 'Trucks', 'People', 'Bicycles', 'Motorcycles', 'Buses']
-            
-            # Create bar graph
-            x = range(len(vehicle_columns))
-            values = [lane_data[col].iloc[0] for col in vehicle_columns]
-            ax.bar(x, values, color='skyblue')
-            
+
+            # Create bar graph, bars are animated so live updates can be blitted
+            x = range(len(self.vehicle_columns))
+            values = self.lane_values(lane)
+            bars = ax.bar(x, values, color='skyblue', animated=True)
+            ax.set_ylim(0, max(values.max(), 1) * 1.5)
+            self.plots.append((lane, ax, bars))
+
             # Customize the subplot
             ax.set_title(f'{lane} Traffic Distribution')
             ax.set_xticks(x)
-            ax.set_xticklabels(vehicle_columns, rotation=45)
+            ax.set_xticklabels(self.vehicle_columns, rotation=45)
             ax.set_ylabel('Count')
-        
+
         figure.tight_layout()
-    
+
     def create_line_graph(self, figure, lanes):
         figure.clear()
-        
+        self.kind, self.plots = 'line', []
+
         # Create 2x2 subplots for the four lanes
         for idx, lane in enumerate(lanes, 1):
             ax = figure.add_subplot(2, 2, idx)
-            
-            # Filter data for the current lane
-            lane_data = self.data[self.data['Lane'] == lane]
-            
-            # Get vehicle columns
-            vehicle_columns = ['Cars', 'Trucks', 'People', 'Bicycles', 'Motorcycles', 'Buses']
-            values = [lane_data[col].iloc[0] for col in vehicle_columns]
-            
-            # Create line graph
-            ax.plot(vehicle_columns, values, marker='o', linestyle='-', linewidth=2, markersize=8)
-            
+
+            # Create line graph, line is animated so live updates can be blitted
+            x = range(len(self.vehicle_columns))
+            values = self.lane_values(lane)
+            line, = ax.plot(x, values, marker='o', linestyle='-', linewidth=2, markersize=8, animated=True)
+            ax.set_ylim(0, max(values.max(), 1) * 1.5)
+            self.plots.append((lane, ax, line))
+
             # Customize the subplot
             ax.set_title(f'{lane} Traffic Trend')
-            ax.set_xticklabels(vehicle_columns, rotation=45)
+            ax.set_xticks(x)
+            ax.set_xticklabels(self.vehicle_columns, rotation=45)
             ax.set_ylabel('Count')
             ax.grid(True)
-        
+
         figure.tight_layout()
-    
+
     def create_heat_graph(self, figure, lanes):
         figure.clear()
-        
+        self.kind, self.plots = 'heat', []
+
         # Create 2x2 subplots for the four lanes
         for idx, lane in enumerate(lanes, 1):
             ax = figure.add_subplot(2, 2, idx)
-            
-            # Filter data for the current lane
-            lane_data = self.data[self.data['Lane'] == lane]
-            
-            # Get vehicle columns and create heatmap data
-            vehicle_columns = ['Cars', 'Trucks', 'People', 'Bicycles', 'Motorcycles', 'Buses']
-            heatmap_data = lane_data[vehicle_columns].iloc[0].values.reshape(1, -1)
-            
-            # Create heatmap
-            sns.heatmap(heatmap_data, 
+
+            # Create heatmap data
+            values = self.lane_values(lane)
+            heatmap_data = values.reshape(1, -1)
+
+            # Create heatmap, color scale leaves headroom so live updates rarely need a full redraw
+            sns.heatmap(heatmap_data,
                        ax=ax,
-                       xticklabels=vehicle_columns,
+                       xticklabels=self.vehicle_columns,
                        yticklabels=['Density'],
                        cmap='YlOrRd',
+                       vmin=0,
+                       vmax=max(values.max(), 1) * 1.5,
                        annot=True,
                        fmt='.0f')
-            
+            mesh, texts = ax.collections[0], list(ax.texts)
+            for artist in [mesh, *texts]:
+                artist.set_animated(True)
+            self.plots.append((lane, ax, (mesh, texts)))
+
             # Customize the subplot
             ax.set_title(f'{lane} Traffic Heatmap')
-            ax.set_xticklabels(vehicle_columns, rotation=45)
-        
+            ax.set_xticklabels(self.vehicle_columns, rotation=45)
+
         figure.tight_layout()
 
+    def animated_artists(self):
+        """All artists updated by live mode"""
+        for _, _, artists in self.plots:
+            if self.kind == 'bar':
+                yield from artists
+            elif self.kind == 'line':
+                yield artists
+            else:
+                yield artists[0]
+                yield from artists[1]
+
+    def on_draw(self, event):
+        """Capture the static background after a full draw and render animated artists on top"""
+        canvas = event.canvas
+        self.background = canvas.copy_from_bbox(canvas.figure.bbox)
+        for artist in self.animated_artists():
+            canvas.figure.draw_artist(artist)
+
+    def update_artists(self, canvas):
+        """Update plotted values in place and blit them, full redraw only when an axis or color limit is exceeded"""
+        redraw = self.background is None
+        for lane, ax, artists in self.plots:
+            values = self.lane_values(lane)
+            if self.kind == 'bar':
+                for bar, v in zip(artists, values):
+                    bar.set_height(v)
+            elif self.kind == 'line':
+                artists.set_ydata(values)
+            else:
+                mesh, texts = artists
+                mesh.set_array(values)
+                for text, v in zip(texts, values):
+                    text.set_text(f'{v:.0f}')
+
+            # Rescale with headroom when values outgrow the current limits
+            top = mesh.get_clim()[1] if self.kind == 'heat' else ax.get_ylim()[1]
+            if values.max() > top:
+                if self.kind == 'heat':
+                    mesh.set_clim(0, values.max() * 1.5)
+                else:
+                    ax.set_ylim(0, values.max() * 1.5)
+                redraw = True
+
+        if redraw:
+            canvas.draw()  # on_draw() recaptures the background
+        else:
+            canvas.restore_region(self.background)
+            for artist in self.animated_artists():
+                canvas.figure.draw_artist(artist)
+            canvas.blit(canvas.figure.bbox)
+        canvas.flush_events()
+
 class GraphVisualizerGUI:
-    def __init__(self, root):
+    def __init__(self, root, history=None, interval=1000):
         self.root = root
         self.root.title("Traffic Data Visualizer")
         self.root.geometry("1200x800")
-        
+        self.interval = interval  # live refresh interval (ms)
+
         # Initialize visualizer
-        self.visualizer = TrafficVisualizer()
-        
+        self.visualizer = TrafficVisualizer(history)
+
         # Create main frame
         self.main_frame = ttk.Frame(self.root, padding="10")
         self.main_frame.pack(fill=tk.BOTH, expand=True)
-        
+
         # Create controls frame
         self.controls_frame = ttk.Frame(self.main_frame)
         self.controls_frame.pack(fill=tk.X, pady=10)
-        
+
         # Create graph type selector
         ttk.Label(self.controls_frame, text="Select Graph Type:").pack(side=tk.LEFT, padx=5)
-        self.graph_type = ttk.Combobox(self.controls_frame, 
+        self.graph_type = ttk.Combobox(self.controls_frame,
                                       values=["Bar Graph", "Line Graph", "Heat Map"],
                                       state="readonly")
         self.graph_type.pack(side=tk.LEFT, padx=5)
         self.graph_type.set("Bar Graph")
         self.graph_type.bind('<<ComboboxSelected>>', self.update_graph)
-        
+
         # Create refresh button
-        ttk.Button(self.controls_frame, text="Refresh Data", 
+        ttk.Button(self.controls_frame, text="Refresh Data",
                   command=self.refresh_data).pack(side=tk.LEFT, padx=5)
-        
+
+        # Create live mode toggle
+        self.live = tk.BooleanVar(value=True)
+        self.live_enabled = True  # plain copy of self.live readable from the loader thread
+        ttk.Checkbutton(self.controls_frame, text="Live", variable=self.live,
+                        command=self.toggle_live).pack(side=tk.LEFT, padx=5)
+
+        # Create status label for loader errors
+        self.status = ttk.Label(self.controls_frame, text="", foreground="red")
+        self.status.pack(side=tk.LEFT, padx=5)
+        self.error = None  # last loader error, shown by poll()
+
         # Create matplotlib figure
         self.figure = plt.Figure(figsize=(12, 8))
         self.canvas = FigureCanvasTkAgg(self.figure, master=self.main_frame)
         self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+
         # Initial graph display
         self.update_graph()
-    
+
+        # Load new rows on a background thread, the Tk main loop only blits them
+        self.updated, self.stopped, self.wake = Event(), Event(), Event()
+        Thread(target=self.load_loop, daemon=True).start()
+        self.root.bind('<Destroy>', lambda e: self.stop() if e.widget is self.root else None)
+        self.root.after(self.interval, self.poll)
+
+    def on_draw(self, event):
+        self.visualizer.on_draw(event)
+
+    def toggle_live(self):
+        self.live_enabled = self.live.get()
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+    def load_loop(self):
+        """Background thread tailing the history for new rows, every interval in live mode or when woken by Refresh"""
+        while not self.stopped.is_set():
+            refresh = self.wake.wait(self.interval / 1000)
+            self.wake.clear()
+            if self.stopped.is_set():
+                break
+            if refresh or self.live_enabled:
+                try:
+                    if self.visualizer.load_new():
+                        self.updated.set()
+                    self.error = None
+                except Exception as e:  # keep live mode running, i.e. while files are being compacted
+                    self.error = f"Live update failed: {e}"
+
+    def poll(self):
+        """Tk main loop callback blitting new data loaded by the background thread"""
+        if self.updated.is_set():
+            self.updated.clear()
+            self.visualizer.update_artists(self.canvas)
+        self.status.config(text=self.error or "")
+        if not self.stopped.is_set():
+            self.root.after(self.interval, self.poll)
+
     def update_graph(self, event=None):
         lanes = ['Lane_1', 'Lane_2', 'Lane_3', 'Lane_4']
         graph_type = self.graph_type.get()
-        
+
         if graph_type == "Bar Graph":
             self.visualizer.create_bar_graph(self.figure, lanes)
         elif graph_type == "Line Graph":
             self.visualizer.create_line_graph(self.figure, lanes)
         else:  # Heat Map
             self.visualizer.create_heat_graph(self.figure, lanes)
-        
+
         self.canvas.draw()
-    
+
     def refresh_data(self):
-        try:
-            self.visualizer = TrafficVisualizer()  # Reload data from Excel
-            self.update_graph()
-        except Exception as e:
-            tk.messagebox.showerror("Error", f"Error refreshing data: {str(e)}")
+        # Wake the background loader, poll() blits the rows it loads, errors show in the status label
+        self.wake.set()
 
 def main():
     root = tk.Tk()
@@ -155,4 +290,4 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,6 +3,7 @@
 
 import contextlib
 import platform
+import queue
 import threading
 
 
@@ -43,6 +44,50 @@ def threaded(func):
     return wrapper
 
 
+def prefetch(iterable, maxsize=4):
+    """
+    Iterates `iterable` in a daemon thread and yields its items through a bounded queue.
+
+    The producer blocks while `maxsize` items are waiting (backpressure). Producer exceptions are re-raised in the
+    consumer, and closing the returned generator (i.e. `break`) stops the producer.
+
+    Example: for batch in prefetch(dataset): ...
+    """
+    items, stop, end = queue.Queue(maxsize), threading.Event(), object()
+
+    def put(item):
+        """Puts `item` on the queue, waiting while it is full until the consumer stops, returns False if stopped."""
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        """Puts items of `iterable` on the queue until exhausted or stopped, then an end marker or the exception."""
+        try:
+            for x in iterable:
+                if not put((x, None)):
+                    return
+            put((end, None))
+        except BaseException as e:
+            put((end, e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            x, e = items.get()
+            if e is not None:
+                raise e
+            if x is end:
+                return
+            yield x
+    finally:
+        stop.set()
+
+
 def join_threads(verbose=False):
     """
     Joins all daemon threads, optionally printing their names if verbose is True.
@@ -152,6 +152,23 @@ def letterbox(im, new_shape=(640, 640), color=(114, 114, 114), auto=True, scaleF
     return im, ratio, (dw, dh)
 
 
+def letterbox_into(im, out):
+    """Resizes and centers image into preallocated (h, w, 3) array `out` as letterbox(im, out.shape[:2], auto=False),
+    without intermediate copies, returns ratio and padding. Borders of `out` are not written, fill them beforehand.
+    """
+    shape, new_shape = im.shape[:2], out.shape[:2]
+    r = min(new_shape[0] / shape[0], new_shape[1] / shape[1])  # scale ratio (new / old)
+    new_unpad = int(round(shape[1] * r)), int(round(shape[0] * r))
+    dw, dh = (new_shape[1] - new_unpad[0]) / 2, (new_shape[0] - new_unpad[1]) / 2  # wh padding per side
+    top, left = int(round(dh - 0.1)), int(round(dw - 0.1))
+    dst = out[top : top + new_unpad[1], left : left + new_unpad[0]]
+    if shape[::-1] != new_unpad:  # resize
+        cv2.resize(im, new_unpad, dst=dst, interpolation=cv2.INTER_LINEAR)
+    else:
+        dst[:] = im
+    return (r, r), (dw, dh)
+
+
 def random_perspective(
     im, targets=(), segments=(), degrees=10, translate=0.1, scale=0.1, shear=10, perspective=0.0, border=(0, 0)
 ):
@@ -29,8 +29,11 @@ class Callbacks:
             "on_train_end": [],
             "on_params_update": [],
             "teardown": [],
+            "on_predict_batch_end": [],
+            "on_predict_end": [],
         }
         self.stop_training = False  # set True to interrupt training
+        self.stop_predict = False  # set True to interrupt prediction
 
     def register_action(self, hook, name="", callback=None):
         """
@@ -0,0 +1,149 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""
+Offline processing of one long video in parallel chunks, i.e. `python detect.py --source day.mp4 --chunks 8`.
+
+The video is split into consecutive frame ranges, each chunk is processed by a predict `run()` in its own process
+(own model, `torch.set_num_threads` share of the CPU cores), and the chunk outputs are merged back in frame order into
+one output video, one set of labels and one file per result format.
+"""
+
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+import torch
+
+from utils.general import LOGGER, check_requirements, colorstr, cv2, increment_path
+
+PREFIX = colorstr("chunks: ")
+
+
+def split_frames(n, chunks, stride=1):
+    """Returns `chunks` consecutive (start, end) ranges covering frames [0, n), starts aligned to `stride`."""
+    size = -(-n // chunks // stride) * stride  # ceil to a multiple of stride
+    return [(i, min(i + size, n)) for i in range(0, n, size)] if n else []
+
+
+def _init_worker(threads):
+    """Process pool initializer limiting torch and OpenCV threads and muting per-frame logs of the chunk runs."""
+    torch.set_num_threads(threads)
+    cv2.setNumThreads(1)
+    LOGGER.setLevel(logging.WARNING)
+
+
+def _run_chunk(run, kwargs):
+    """Runs predict `run(**kwargs)` for one chunk in a worker process."""
+    run(**kwargs)
+    return kwargs["name"]
+
+
+def concat_videos(files, file):
+    """Concatenates videos `files` of equal size and FPS into `file`, by stream copy with ffmpeg when available."""
+    if shutil.which("ffmpeg"):
+        lst = Path(file).with_suffix(".txt")
+        lst.write_text("".join(f"file '{Path(f).resolve()}'\n" for f in files))
+        cmd = ["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", str(lst), "-c", "copy", file]
+        subprocess.run(cmd, check=True)
+        lst.unlink()
+        return
+    cap = cv2.VideoCapture(str(files[0]))  # re-encode fallback
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    w, h = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    writer = cv2.VideoWriter(str(file), cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    for f in files:
+        cap = cv2.VideoCapture(str(f))
+        while True:
+            ret, im = cap.read()
+            if not ret:
+                break
+            writer.write(im)
+        cap.release()
+    writer.release()
+
+
+def concat_results(files, file):
+    """Concatenates result files `files` of one format (utils.sinks) into `file`, in order."""
+    suffix = Path(file).suffix
+    if suffix == ".parquet":
+        check_requirements("pyarrow")
+        import pyarrow.parquet as pq
+
+        writer = None
+        for f in files:
+            table = pq.read_table(f)
+            writer = writer or pq.ParquetWriter(file, table.schema)
+            writer.write_table(table.cast(writer.schema))
+        writer.close()
+    elif suffix == ".db":
+        shutil.copyfile(files[0], file)
+        db = sqlite3.connect(file)
+        tables = [x for (x,) in db.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+        for f in files[1:]:
+            db.execute("ATTACH DATABASE ? AS part", (str(f),))
+            with db:
+                for t in tables:
+                    db.execute(f"INSERT INTO {t} SELECT * FROM part.{t}")
+            db.execute("DETACH DATABASE part")
+        db.close()
+    else:  # text, with the header row of the first file only for CSV
+        with open(file, "w", newline="") as out:
+            for i, f in enumerate(files):
+                with open(f, newline="") as x:
+                    if i and suffix == ".csv":
+                        x.readline()
+                    shutil.copyfileobj(x, out)
+
+
+def merge_chunks(dirs, save_dir):
+    """Merges the output directories of consecutive chunks `dirs` into `save_dir`."""
+    merged = {}  # relative path: files of all chunks
+    for d in dirs:
+        for f in sorted(Path(d).rglob("*")):
+            if f.is_file():
+                merged.setdefault(f.relative_to(d), []).append(f)
+    for rel, files in merged.items():
+        file = save_dir / rel
+        file.parent.mkdir(parents=True, exist_ok=True)
+        if rel.suffix.lower() == ".mp4":
+            concat_videos(files, str(file))
+        elif len(files) == 1:
+            shutil.move(files[0], file)
+        elif rel.suffix in (".csv", ".jsonl", ".parquet", ".db"):
+            concat_results(files, file)
+        else:  # i.e. crops with the same name in several chunks
+            for f in files:
+                shutil.move(f, increment_path(file))
+
+
+def run_chunks(run, source, chunks=8, project="runs/detect", name="exp", exist_ok=False, vid_stride=1, **kwargs):
+    """
+    Runs predict `run()` over one video `source` split into `chunks` frame ranges in parallel processes.
+
+    Each chunk writes its outputs to `save_dir/chunks/<i>`, which are merged into `save_dir` once all chunks are done.
+    Frame numbers (label file names, result rows) are those of the full video. Tracker IDs and lane counters start
+    over in every chunk. Returns the number of frames processed and `save_dir`.
+    """
+    save_dir = increment_path(Path(project) / name, exist_ok=exist_ok)
+    save_dir.mkdir(parents=True, exist_ok=True)
+    cap = cv2.VideoCapture(str(source))
+    n = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    assert n > 0, f"{source} has no frames to split into chunks"
+    ranges = split_frames(n, chunks, vid_stride)
+    threads = max(os.cpu_count() // len(ranges), 1)
+    LOGGER.info(f"{PREFIX}{n} frames of {source} in {len(ranges)} chunks, {threads} threads each")
+
+    kwargs.update(source=source, vid_stride=vid_stride, project=save_dir / "chunks", exist_ok=True)
+    with ProcessPoolExecutor(len(ranges), get_context("spawn"), initializer=_init_worker, initargs=(threads,)) as pool:
+        jobs = [pool.submit(_run_chunk, run, {**kwargs, "name": str(i), "vid_range": r}) for i, r in enumerate(ranges)]
+        dirs = [save_dir / "chunks" / job.result() for job in jobs]  # in frame order, raises chunk errors
+    merge_chunks(dirs, save_dir)
+    shutil.rmtree(save_dir / "chunks")
+    LOGGER.info(f"Results saved to {colorstr('bold', save_dir)}")
+    return sum(b // vid_stride - a // vid_stride for a, b in ranges), save_dir
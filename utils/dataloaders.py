@@ -10,10 +10,13 @@ import os
 import random
 import shutil
 import time
+import weakref
 from itertools import repeat
+from multiprocessing import get_context
 from multiprocessing.pool import Pool, ThreadPool
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
-from threading import Thread
+from threading import Event, Lock, Thread
 from urllib.parse import urlparse
 
 import numpy as np
@@ -322,8 +325,14 @@ class LoadScreenshots:
 class LoadImages:
     """YOLOv5 image/video dataloader, i.e. `python detect.py --source image.jpg/vid.mp4`."""
 
-    def __init__(self, path, img_size=640, stride=32, auto=True, transforms=None, vid_stride=1):
-        """Initializes YOLOv5 loader for images/videos, supporting glob patterns, directories, and lists of paths."""
+    def __init__(self, path, img_size=640, stride=32, auto=True, transforms=None, vid_stride=1, vid_range=None):
+        """
+        Initializes YOLOv5 loader for images/videos, supporting glob patterns, directories, and lists of paths.
+
+        `vid_range` (start, end) limits videos to frames [start, end), seeking to `start`, i.e. for one chunk of a long
+        video processed in parallel (utils.chunks) or to resume a video (batch_detect.py), `end` None for all remaining
+        frames. Frame numbers stay those of the full video.
+        """
         if isinstance(path, str) and Path(path).suffix == ".txt":  # *.txt file with img/vid/dir on each line
             path = Path(path).read_text().rsplit()
         files = []
@@ -351,6 +360,7 @@ class LoadImages:
         self.auto = auto
         self.transforms = transforms  # optional
         self.vid_stride = vid_stride  # video frame-rate stride
+        self.vid_range = vid_range  # (start, end) frames of each video
         if any(videos):
             self._new_video(videos[0])  # new video
         else:
@@ -374,9 +384,11 @@ class LoadImages:
         if self.video_flag[self.count]:
             # Read video
             self.mode = "video"
-            for _ in range(self.vid_stride):
-                self.cap.grab()
-            ret_val, im0 = self.cap.retrieve()
+            ret_val = not self.vid_range or self.frame < self.frames  # False past the end of vid_range
+            if ret_val:
+                for _ in range(self.vid_stride):
+                    self.cap.grab()
+                ret_val, im0 = self.cap.retrieve()
             while not ret_val:
                 self.count += 1
                 self.cap.release()
@@ -413,6 +425,11 @@ class LoadImages:
         self.frame = 0
         self.cap = cv2.VideoCapture(path)
         self.frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT) / self.vid_stride)
+        if self.vid_range:
+            start, end = self.vid_range
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)  # seeks to the preceding keyframe and decodes up to start
+            self.frame = start // self.vid_stride
+            self.frames = min(end // self.vid_stride, self.frames) if end else self.frames
         self.orientation = int(self.cap.get(cv2.CAP_PROP_ORIENTATION_META))  # rotation degrees
         # self.cap.set(cv2.CAP_PROP_ORIENTATION_AUTO, 0)  # disable https://github.com/ultralytics/yolov5/issues/8493
 
@@ -431,24 +448,206 @@ class LoadImages:
         return self.nf  # number of files
 
 
+class LoadImagesBatched:
+    """
+    Batches LoadImages frames of equal letterboxed shape, i.e. `python detect.py --source dir/ --batch-size 16`.
+
+    Images are bucketed by shape so `auto=True` rectangular letterboxes of mixed aspect ratios still fill batches, while
+    pending buckets are flushed whenever the source switches between images and videos, so each batch holds either
+    images only or consecutive frames of one video. Batches are (paths, (b, 3, h, w) images, im0s, cap, prefixes)
+    with per-image frame numbers in `self.frame`.
+    """
+
+    def __init__(
+        self, path, img_size=640, stride=32, auto=True, transforms=None, vid_stride=1, vid_range=None, batch_size=16
+    ):
+        """Initializes a LoadImages source that yields batches of up to `batch_size` same-shape frames."""
+        self.loader = LoadImages(path, img_size, stride, auto, transforms, vid_stride, vid_range)
+        self.batch_size = batch_size
+        self.mode = "image"
+        self.frame = []
+
+    def __iter__(self):
+        """Resets the underlying loader and pending buckets."""
+        self.items = iter(self.loader)
+        self.buckets, self.ready, self.source = {}, [], None  # shape: pending items, full batches, current video
+        return self
+
+    def __next__(self):
+        """Returns the next batch, reading frames until a bucket is full or the loader is exhausted."""
+        while not self.ready and self.items is not None:
+            try:
+                path, im, im0, cap, s = next(self.items)
+            except StopIteration:
+                self.items = None
+                self.ready.extend(self.buckets.values())  # partial batches
+                break
+            source = path if self.loader.mode == "video" else None
+            if source != self.source:  # image/video switch, keep frame order for video writers
+                self.ready.extend(self.buckets.values())
+                self.buckets, self.source = {}, source
+            bucket = self.buckets.setdefault(im.shape, [])
+            bucket.append((path, im, im0, cap, s, self.loader.mode, getattr(self.loader, "frame", 0)))
+            if len(bucket) == self.batch_size:
+                self.ready.append(self.buckets.pop(im.shape))
+        if not self.ready:
+            raise StopIteration
+        paths, ims, im0s, caps, ss, modes, frames = zip(*self.ready.pop(0))
+        self.mode, self.frame = modes[0], list(frames)
+        return list(paths), np.stack(ims), list(im0s), caps[0], list(ss)
+
+    def __len__(self):
+        """Returns the number of files in the dataset."""
+        return len(self.loader)
+
+
+def read_frames(cap, stream, ring, state, times, leases, frames=float("inf"), event=None):
+    """
+    Decodes frames of `stream` from `cap` into the slots of `ring` until the stream ends, the LoadStreams reader loop.
+
+    `state` is the stream's [frames decoded, newest slot, served slot, video stride] int64 index, `times` the capture
+    time and `leases` the consumer's lease count of each slot, shared with the consumer without locks (also across
+    processes): the reader writes a frame, its time, then the newest slot and count, the consumer writes only the served
+    slot, the stride and the leases. New frames skip the two newest and all leased slots, so frames the consumer serves
+    or still holds are never overwritten, and are dropped while no slot is free. Unresponsive streams are re-opened and
+    served as black frames, frames of another size (i.e. after a reconnect) are resized to the ring shape.
+    """
+    n, prev = 0, -1  # frame number, previous newest slot
+    while cap.isOpened() and n < frames:
+        n += 1
+        cap.grab()  # .read() = .grab() followed by .retrieve()
+        if n % state[3] == 0:  # video frame-rate stride, may change while running
+            latest = int(state[1])
+            free = [s for s in (latest + np.arange(1, len(ring))) % len(ring) if s != prev and not leases[s]]
+            if not free:  # all slots held by the consumer, drop the frame
+                time.sleep(0.0)
+                continue
+            s = free[0]
+            success, im = cap.retrieve(ring[s])  # decodes in place
+            if not success:
+                LOGGER.warning("WARNING ⚠️ Video stream unresponsive, please check your IP camera connection.")
+                ring[s] = 0
+                cap.open(stream)  # re-open stream if signal was lost
+            elif im.shape != ring.shape[1:]:  # new frame size
+                ring[s] = cv2.resize(im, ring.shape[2:0:-1]) if im.ndim == 3 else 0
+            times[s] = time.time()
+            state[1], prev = s, latest
+            state[0] += 1
+            if event:
+                event.set()
+        time.sleep(0.0)  # wait time
+
+
+def _capture(source, i, n, shape, buffer, names, frames, event):
+    """LoadStreams capture process, decodes stream `i` of `n` into shared memory ring buffer and index `names`, the
+    index holding states (n, 4), capture times (n, buffer) and slot leases (n, buffer) of all streams.
+    """
+    frames_memory, index = SharedMemory(names[0]), SharedMemory(names[1])
+    state = np.ndarray((n, 4), dtype=np.int64, buffer=index.buf)[i]
+    times = np.ndarray((n, buffer), dtype=np.float64, buffer=index.buf, offset=n * 4 * 8)[i]
+    leases = np.ndarray((n, buffer), dtype=np.int64, buffer=index.buf, offset=n * (4 + buffer) * 8)[i]
+    with contextlib.suppress(KeyboardInterrupt):
+        cap = cv2.VideoCapture(source)
+        ring = np.ndarray((buffer, *shape), dtype=np.uint8, buffer=frames_memory.buf)
+        read_frames(cap, source, ring, state, times, leases, frames, event)
+
+
+def _release(processes, memory):
+    """Stops LoadStreams capture processes and frees their shared memory."""
+    for p in processes:
+        p.terminate()
+    for m in memory:
+        with contextlib.suppress(FileNotFoundError):
+            m.unlink()
+
+
 class LoadStreams:
-    """Loads and processes video streams for YOLOv5, supporting various sources including YouTube and IP cameras."""
+    """
+    Loads and processes video streams for YOLOv5, supporting various sources including YouTube and IP cameras.
+
+    Every stream is decoded by its own thread, or with `processes=True` its own process (no GIL contention with the
+    inference process, frames, index and leases in shared memory), straight into a preallocated ring buffer of
+    `buffer` frames with a capture time and lease count per frame and a lock-free index (see `read_frames`). Frames
+    are letterboxed into one preallocated batch array, so ticks allocate no frame memory. A tick never serves a frame
+    twice: by default all streams are returned and `self.new` marks those with a new frame, with `fresh=True` only
+    streams with new frames are returned. `self.index` holds the stream numbers of the returned frames and `self.age`
+    their age in seconds.
+
+    Ticks are scheduled across streams: a stream is ready when it has a new frame and its target rate `rates[i]` (FPS,
+    0 for every frame) allows it, a tick waits until `max_batch` streams are ready or the oldest ready frame is
+    `max_wait` seconds old, and serves at most `max_batch` of them, higher `priorities` first, then oldest frames
+    first. Ready streams left out keep their frame for the next tick. The defaults serve every new frame as soon as
+    there is one. `resize()` and `set_stride()` change the inference size and video stride while running, i.e. for load
+    shedding (utils.shedding).
+
+    Returned frames are views: the batch array is reused on the next tick and a ring buffer frame stays valid until
+    its stream serves a newer frame. With `hold=True` the frames of every tick stay valid until `release(count)` of
+    that tick (i.e. when pipelined stages still use them), a stream whose `buffer - 3` slots are all held drops new
+    frames until one is released. `close()` stops capture processes and frees their shared memory.
+    """
 
-    def __init__(self, sources="file.streams", img_size=640, stride=32, auto=True, transforms=None, vid_stride=1):
+    def __init__(
+        self,
+        sources="file.streams",
+        img_size=640,
+        stride=32,
+        auto=True,
+        transforms=None,
+        vid_stride=1,
+        buffer=4,
+        fresh=False,
+        processes=False,
+        rates=None,
+        priorities=None,
+        max_batch=0,
+        max_wait=0.0,
+        hold=False,
+    ):
         """Initializes a stream loader for processing video streams with YOLOv5, supporting various sources including
         YouTube.
         """
+        assert buffer >= 4, "LoadStreams needs a ring buffer of at least 4 frames (served, 2 newest and decoding)"
         torch.backends.cudnn.benchmark = True  # faster for fixed-size inference
         self.mode = "stream"
         self.img_size = img_size
         self.stride = stride
         self.vid_stride = vid_stride  # video frame-rate stride
-        sources = Path(sources).read_text().rsplit() if os.path.isfile(sources) else [sources]
+        self.buffer = buffer  # ring buffer frames per stream
+        self.fresh = fresh  # only return streams with new frames
+        self.max_batch = max_batch  # max streams served per tick, 0 for all
+        self.max_wait = max_wait  # seconds a ready frame waits for a fuller batch
+        self.hold = hold  # keep the frames of each tick leased until release(count)
+        self.held, self.lock = {}, Lock()  # leased (stream, slot) pairs per tick, lease updates across threads
+        if isinstance(sources, (list, tuple)):  # list of sources, i.e. ['rtsp://cam1', 'rtsp://cam2']
+            sources = [str(x) for x in sources]
+        else:
+            sources = Path(sources).read_text().rsplit() if os.path.isfile(sources) else [sources]
         n = len(sources)
         self.sources = [clean_str(x) for x in sources]  # clean source names for later
-        self.imgs, self.fps, self.frames, self.threads = [None] * n, [0] * n, [0] * n, [None] * n
+        self.fps, self.frames, self.threads, self.rings = [0] * n, [0] * n, [None] * n, [None] * n
+        self.served = np.zeros(n)  # capture time of the last served frame per stream
+        self.seq = np.zeros(n, dtype=np.int64)  # frames decoded (state[:, 0]) when each stream was last served
+        self.period = np.array([1 / x if x else 0.0 for x in rates or [0] * n])  # min seconds between served frames
+        self.priority = np.array(priorities or [0] * n)  # higher is served first
+        self.due = np.zeros(n)  # time from which each stream may be served again
+        assert len(self.period) == len(self.priority) == n, f"expected {n} stream rates and priorities"
+        if processes:  # index in shared memory, one capture process per stream
+            ctx = get_context("spawn")
+            self.event = ctx.Event()
+            self.memory = [SharedMemory(create=True, size=n * (4 + 2 * buffer) * 8)]
+            buf = self.memory[0].buf
+            self.state = np.ndarray((n, 4), dtype=np.int64, buffer=buf)  # frames decoded, newest/served slot, stride
+            self.times = np.ndarray((n, buffer), dtype=np.float64, buffer=buf, offset=n * 4 * 8)  # capture times
+            self.leases = np.ndarray((n, buffer), dtype=np.int64, buffer=buf, offset=n * (4 + buffer) * 8)
+        else:
+            self.event, self.memory = Event(), []
+            self.state, self.times = np.zeros((n, 4), dtype=np.int64), np.zeros((n, buffer))
+            self.leases = np.zeros((n, buffer), dtype=np.int64)  # consumer leases per slot
+        self.state[:], self.times[:], self.leases[:] = 0, 0, 0
+        self.state[:, 2] = -1  # nothing served yet
+        self.state[:, 3] = vid_stride
         for i, s in enumerate(sources):  # index, source
-            # Start thread to read frames from video stream
+            # Open video stream
             st = f"{i + 1}/{n}: {s}... "
             if urlparse(s).hostname in ("www.youtube.com", "youtube.com", "youtu.be"):  # if source is YouTube video
                 # YouTube format i.e. 'https://www.youtube.com/watch?v=Zgi9g1ksQHc' or 'https://youtu.be/LNwODJXcvt4'
@@ -468,35 +667,59 @@ class LoadStreams:
             self.frames[i] = max(int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), 0) or float("inf")  # infinite stream fallback
             self.fps[i] = max((fps if math.isfinite(fps) else 0) % 100, 0) or 30  # 30 FPS fallback
 
-            _, self.imgs[i] = cap.read()  # guarantee first frame
-            self.threads[i] = Thread(target=self.update, args=([i, cap, s]), daemon=True)
+            _, im = cap.read()  # guarantee first frame
+            if processes:
+                self.memory.append(SharedMemory(create=True, size=buffer * im.nbytes))
+                self.rings[i] = np.ndarray((buffer, *im.shape), dtype=im.dtype, buffer=self.memory[-1].buf)
+                cap.release()  # re-opened by the capture process
+                names = self.memory[-1].name, self.memory[0].name
+                args = s, i, n, im.shape, buffer, names, self.frames[i], self.event
+                self.threads[i] = ctx.Process(target=_capture, args=args, daemon=True)
+            else:
+                self.rings[i] = np.empty((buffer, *im.shape), dtype=im.dtype)
+                self.threads[i] = Thread(target=self.update, args=([i, cap, s]), daemon=True)
+            self.rings[i][0], self.times[i, 0], self.state[i, :2] = im, time.time(), (1, 0)
             LOGGER.info(f"{st} Success ({self.frames[i]} frames {w}x{h} at {self.fps[i]:.2f} FPS)")
-            self.threads[i].start()
         LOGGER.info("")  # newline
 
         # check for common shapes
-        s = np.stack([letterbox(x, img_size, stride=stride, auto=auto)[0].shape for x in self.imgs])
+        s = np.stack([letterbox(x[0], img_size, stride=stride, auto=auto)[0].shape for x in self.rings])
         self.rect = np.unique(s, axis=0).shape[0] == 1  # rect inference if all shapes equal
         self.auto = auto and self.rect
         self.transforms = transforms  # optional
         if not self.rect:
             LOGGER.warning("WARNING ⚠️ Stream shapes differ. For optimal performance supply similarly-shaped streams.")
+        self.canvas = None
+        self.resize(img_size)
+        for t in self.threads:
+            t.start()
+        self._finalizer = weakref.finalize(self, _release, self.threads, self.memory) if processes else None
+
+    def close(self):
+        """Stops capture processes and frees their shared memory now, not only when the loader is garbage collected."""
+        if self._finalizer:
+            self._finalizer()  # runs once
+
+    def resize(self, img_size):
+        """Sets inference size `img_size`, reallocating the letterbox canvases and batch array when it changes."""
+        if self.canvas is not None and np.array_equal(img_size, self.img_size):
+            return
+        self.img_size = img_size
+        n, shape = len(self.sources), self.rings[0].shape[1:]
+        h, w = letterbox(np.empty(shape, np.uint8), img_size, stride=self.stride, auto=self.auto)[0].shape[:2]
+        self.canvas = np.full((n, h, w, 3), 114, dtype=np.uint8)  # letterboxed BGR frame per stream, same shape for all
+        self.batch = np.empty((n, 3, h, w), dtype=np.uint8)  # RGB BCHW model input
+        self.boxes = [None] * n  # (frame shape, resized wh, top-left padding) letterbox geometry per stream
+
+    def set_stride(self, vid_stride):
+        """Sets the video frame-rate stride of all streams, applied by the readers from their next frame on."""
+        self.vid_stride = vid_stride
+        self.state[:, 3] = vid_stride
 
     def update(self, i, cap, stream):
-        """Reads frames from stream `i`, updating imgs array; handles stream reopening on signal loss."""
-        n, f = 0, self.frames[i]  # frame number, frame array
-        while cap.isOpened() and n < f:
-            n += 1
-            cap.grab()  # .read() = .grab() followed by .retrieve()
-            if n % self.vid_stride == 0:
-                success, im = cap.retrieve()
-                if success:
-                    self.imgs[i] = im
-                else:
-                    LOGGER.warning("WARNING ⚠️ Video stream unresponsive, please check your IP camera connection.")
-                    self.imgs[i] = np.zeros_like(self.imgs[i])
-                    cap.open(stream)  # re-open stream if signal was lost
-            time.sleep(0.0)  # wait time
+        """Reads frames from stream `i` into its ring buffer; handles stream reopening on signal loss."""
+        ring, state, times, leases = self.rings[i], self.state[i], self.times[i], self.leases[i]
+        read_frames(cap, stream, ring, state, times, leases, self.frames[i], self.event)
 
     def __iter__(self):
         """Resets and returns the iterator for iterating over video frames or images in a dataset."""
@@ -504,7 +727,7 @@ class LoadStreams:
         return self
 
     def __next__(self):
-        """Iterates over video frames or images, halting on thread stop or 'q' key press, raising `StopIteration` when
+        """Waits for new frames and returns them, halting on thread stop or 'q' key press, raising `StopIteration` when
         done.
         """
         self.count += 1
@@ -512,15 +735,84 @@ class LoadStreams:
             cv2.destroyAllWindows()
             raise StopIteration
 
-        im0 = self.imgs.copy()
+        n = len(self.sources)
+        while True:  # wait for a batch of ready frames
+            self.event.clear()
+            count = self.state[:, 0].copy()  # frames decoded, read first as readers increment it after the newest slot
+            latest = self.state[:, 1].copy()
+            times = self.times[np.arange(n), latest]  # capture times of the newest frames, written before the index
+            t = time.time()
+            pending = (count > self.seq) & (latest != self.state[:, 2])  # served slots are leased, never overwritten
+            ready = pending & (self.due <= t)
+            if ready.any():
+                wait = self.max_wait - (t - times[ready].min())
+                if ready.sum() >= (self.max_batch or n) or wait <= 0:
+                    break
+            else:
+                wait = 0.1
+            limited = pending & ~ready  # new frames held back by their stream rate
+            if limited.any():
+                wait = min(wait, (self.due[limited] - t).min())
+            if not all(x.is_alive() for x in self.threads):
+                cv2.destroyAllWindows()
+                raise StopIteration
+            self.event.wait(min(max(wait, 0.001), 0.1))
+
+        ready = np.flatnonzero(ready)
+        ready = ready[np.lexsort((times[ready], -self.priority[ready]))][: self.max_batch or n]  # priority, then age
+        new = np.isin(np.arange(n), ready)
+        self.new = new.tolist()
+        self.index = ready.tolist() if self.fresh else list(range(n))
+        self.due[ready] = np.maximum(self.due[ready] + self.period[ready], t)
+        slots = np.where(new | (self.state[:, 2] < 0), latest, self.state[:, 2])  # others return their last frame
+        with self.lock:
+            for i in ready:  # lease the served slots, release the previously served ones
+                if self.state[i, 2] >= 0:
+                    self.leases[i, self.state[i, 2]] -= 1
+                self.leases[i, latest[i]] += 1
+            self.state[ready, 2] = latest[ready]
+            if self.hold:
+                self.held[self.count] = [(i, slots[i]) for i in self.index]
+                for i in self.index:
+                    self.leases[i, slots[i]] += 1
+        self.served[ready], self.seq[ready] = times[ready], count[ready]
+        self.age = (time.time() - np.where(new, times, self.served)[self.index]).tolist()
+        im0 = [self.rings[i][slots[i]] for i in self.index]
+
         if self.transforms:
             im = np.stack([self.transforms(x) for x in im0])  # transforms
         else:
-            im = np.stack([letterbox(x, self.img_size, stride=self.stride, auto=self.auto)[0] for x in im0])  # resize
-            im = im[..., ::-1].transpose((0, 3, 1, 2))  # BGR to RGB, BHWC to BCHW
-            im = np.ascontiguousarray(im)  # contiguous
-
-        return self.sources, im, im0, None, ""
+            for j, (i, x) in enumerate(zip(self.index, im0)):
+                if self.new[i] or self.boxes[i] is None:
+                    self._letterbox(i, x)  # canvases of the other streams hold their last frame already
+                self.batch[j] = self.canvas[i, ..., ::-1].transpose(2, 0, 1)  # BGR to RGB, HWC to CHW
+            im = self.batch[: len(im0)]
+
+        return [self.sources[i] for i in self.index], im, im0, None, ""
+
+    def release(self, count):
+        """Releases the frames of tick `count` held with `hold=True`, their ring buffer slots may be overwritten."""
+        with self.lock:
+            for i, s in self.held.pop(count, ()):
+                self.leases[i, s] -= 1
+
+    def _letterbox(self, i, im0):
+        """Letterboxes frame `im0` of stream `i` into its canvas in place, as `letterbox()` with the canvas shape."""
+        if self.boxes[i] is None or self.boxes[i][0] != im0.shape:  # new frame size
+            h0, w0 = im0.shape[:2]
+            h, w = self.canvas.shape[1:3]
+            shape = (self.img_size,) * 2 if isinstance(self.img_size, int) else self.img_size
+            r = min(shape[0] / h0, shape[1] / w0, h / h0, w / w0)
+            nw, nh = int(round(w0 * r)), int(round(h0 * r))
+            top, left = int(round((h - nh) / 2 - 0.1)), int(round((w - nw) / 2 - 0.1))
+            self.boxes[i] = im0.shape, (nw, nh), (top, left)
+            self.canvas[i] = 114  # padding
+        _, (nw, nh), (top, left) = self.boxes[i]
+        dst = self.canvas[i, top : top + nh, left : left + nw]
+        if (nw, nh) == (im0.shape[1], im0.shape[0]):
+            np.copyto(dst, im0)
+        else:
+            cv2.resize(im0, (nw, nh), dst=dst, interpolation=cv2.INTER_LINEAR)
 
     def __len__(self):
         """Returns the number of sources in the dataset, supporting up to 32 streams at 30 FPS over 30 years."""
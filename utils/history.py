@@ -0,0 +1,347 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Append-only, time-partitioned Parquet store for per-lane traffic history."""
+
+import contextlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+
+import pandas as pd
+import psutil
+
+from utils.general import LOGGER, check_requirements, clean_str, colorstr
+
+PREFIX = colorstr("history: ")
+_OPEN_WALS = set()  # WAL files of stores open in this process
+
+
+@contextlib.contextmanager
+def _lock(file, blocking=True):
+    """
+    Holds cross-process lock `file`, created exclusively and holding the owner's pid, and yields True.
+
+    Yields False without the lock if `blocking` is False and another process holds it. Locks of dead processes are
+    broken.
+    """
+    file = Path(file)
+    while True:
+        try:
+            fd = os.open(file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            with contextlib.suppress(FileNotFoundError, ValueError):
+                pid = int(file.read_text() or 0)  # 0 while the owner is writing its pid
+                if pid and not psutil.pid_exists(pid):  # owner died
+                    file.unlink(missing_ok=True)
+                    continue
+            if not blocking:
+                yield False
+                return
+            time.sleep(0.01)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield True
+    finally:
+        file.unlink(missing_ok=True)
+
+
+class TrafficHistory:
+    """
+    Append-only store of per-lane traffic rows, partitioned as `root/intersection=*/date=*/hour=*/*.parquet`.
+
+    Rows are appended to an in-memory buffer backed by a per-process write-ahead log (JSON Lines) and flushed to a new
+    immutable Parquet file per intersection and hour once `max_rows` or `max_age` is reached. Files are written to a
+    temporary name and atomically renamed, so any number of writer and reader processes can share one `root`. WAL files
+    left behind by dead processes are recovered on open, and `compact()` merges the files of closed hours, swapping
+    them under a lock file that readers take while listing files. Merged files record their source files, so `tail()`
+    readers do not see rows of files they already read twice.
+
+    Usage:
+        history = TrafficHistory('traffic_history')
+        history.append([{'Timestamp': datetime.now(), 'Intersection': 'junction_1', 'Lane': 'lane_1', 'Cars': 3}])
+        df = history.read(start=datetime(2024, 1, 1), intersection='junction_1')
+        history.export_excel('traffic_data.xlsx', start=datetime(2024, 1, 1))
+    """
+
+    def __init__(self, root="traffic_history", max_rows=1000, max_age=30.0):
+        """Opens (or creates) a store at `root`, flushing buffered rows after `max_rows` rows or `max_age` seconds."""
+        check_requirements("pyarrow")
+        self.root = Path(root)
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.buffer = []
+        self.lock = threading.RLock()
+        self.t = time.time()  # last flush time
+        self.wal_file, self.wal = None, None  # opened on first append
+        (self.root / "_wal").mkdir(parents=True, exist_ok=True)
+        self._recover()
+
+    def append(self, rows):
+        """Appends rows (DataFrame or list of dicts) with 'Timestamp' (default now) and 'Intersection' columns."""
+        rows = rows.to_dict("records") if isinstance(rows, pd.DataFrame) else list(rows)
+        now = datetime.now()
+        for r in rows:
+            r.setdefault("Timestamp", now)
+            r.setdefault("Intersection", "default")
+        with self.lock:
+            if self.wal is None:
+                self.wal_file = self.root / "_wal" / f"{os.getpid()}-{uuid4().hex[:8]}.jsonl"
+                self.wal = open(self.wal_file, "a")
+                _OPEN_WALS.add(self.wal_file)
+            self.wal.writelines(json.dumps(r, default=str) + "\n" for r in rows)
+            self.wal.flush()
+            self.buffer.extend(rows)
+            if len(self.buffer) >= self.max_rows or time.time() - self.t >= self.max_age:
+                self.flush()
+
+    def flush(self):
+        """Writes buffered rows to new Parquet files, one per intersection and hour, and truncates the WAL."""
+        with self.lock:
+            if self.buffer:
+                self._write(pd.DataFrame(self.buffer))
+                self.buffer = []
+                self.wal.seek(0)
+                self.wal.truncate()
+            self.t = time.time()
+
+    def extend(self, df):
+        """Writes a DataFrame straight to new Parquet partition files, bypassing the buffer and WAL (bulk loads)."""
+        if len(df):
+            self._write(df.copy())
+
+    def close(self):
+        """Flushes remaining rows and removes this writer's WAL file."""
+        with self.lock:
+            self.flush()
+            if self.wal is not None:
+                self.wal.close()
+                self.wal_file.unlink(missing_ok=True)
+                _OPEN_WALS.discard(self.wal_file)
+                self.wal_file, self.wal = None, None
+
+    def __enter__(self):
+        """Returns the store for use as a context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Closes the store on context exit."""
+        self.close()
+
+    def files(self, start=None, end=None, intersection=None):
+        """Returns Parquet files of hour partitions overlapping [start, end), optionally for one intersection."""
+        start = pd.Timestamp(start).floor("h") if start is not None else None
+        junction = f"intersection={clean_str(intersection)}" if intersection is not None else "intersection=*"
+        files = []
+        with _lock(self.root / "_files.lock"):  # not while compact() swaps files
+            for d in sorted(self.root.glob(f"{junction}/date=*/hour=*")):
+                hour = self._hour(d)
+                if (start is None or hour >= start) and (end is None or hour < pd.Timestamp(end)):
+                    files.extend(sorted(d.glob("*.parquet")))
+        return files
+
+    def read(self, start=None, end=None, intersection=None, columns=None):
+        """Returns rows with Timestamp in [start, end) as a DataFrame sorted by Timestamp, including unflushed rows."""
+        columns = list(dict.fromkeys(["Timestamp", *columns])) if columns else None
+        dfs = []
+        for _ in range(3):  # retry if files are compacted while reading
+            try:
+                dfs = [pd.read_parquet(f, columns=columns) for f in self.files(start, end, intersection)]
+                break
+            except FileNotFoundError:
+                continue
+        df = self._select(dfs, columns, intersection)
+        i = pd.Series(True, index=df.index)
+        if start is not None:
+            i &= df["Timestamp"] >= pd.Timestamp(start)
+        if end is not None:
+            i &= df["Timestamp"] < pd.Timestamp(end)
+        return df[i].reset_index(drop=True)
+
+    def tail(self, since=None, seen=None, intersection=None):
+        """
+        Returns new rows for incremental (live) reads, sorted by Timestamp.
+
+        Only files not yet in `seen` are read, and read files are added to it, so repeated calls with the same set read
+        each immutable file once and otherwise only list the hour partitions of `since` and the hour before. All rows
+        of new files are returned, also those older than `since` that another writer flushed late, unflushed rows of
+        this store only if after `since`. Rows of a file merged by `compact()` that came from files in `seen` are
+        skipped.
+        """
+        seen = set() if seen is None else seen
+        start = pd.Timestamp(since) - pd.Timedelta(hours=1) if since is not None else None  # late flushes
+        names = {f.name for f in seen}
+        dfs = []
+        for f in self.files(start, None, intersection):
+            if f not in seen:
+                try:
+                    df, sources = self._load(f)
+                except FileNotFoundError:  # compacted while reading
+                    continue
+                if sources:  # keep rows of source files not read yet
+                    keep = [not names.intersection(x) for n, x in sources for _ in range(n)]
+                    df = df[keep]
+                dfs.append(df)
+                seen.add(f)
+                names.add(f.name)
+        return self._select(dfs, None, intersection, since)
+
+    def latest(self, intersection=None):
+        """Returns the most recent row per intersection and lane, reading only the newest hour partition of each
+        intersection.
+        """
+        junction = f"intersection={clean_str(intersection)}" if intersection is not None else "intersection=*"
+        dfs = []
+        for _ in range(3):  # retry if files are compacted while reading
+            with _lock(self.root / "_files.lock"):
+                hours = [max(j.glob("date=*/hour=*"), key=self._hour, default=None) for j in self.root.glob(junction)]
+                files = [f for d in hours if d is not None for f in sorted(d.glob("*.parquet"))]
+            try:
+                dfs = [pd.read_parquet(f) for f in files]
+                break
+            except FileNotFoundError:
+                continue
+        df = self._select(dfs, None, intersection)
+        return df.groupby(["Intersection", "Lane"], sort=False).tail(1).reset_index(drop=True) if len(df) else df
+
+    def compact(self):
+        """
+        Merges the files of each closed (past) hour partition into a single Parquet file, returns False if another
+        process is compacting the store.
+
+        The merged file is written to a temporary name and swapped in for the originals under the readers' lock. Rows
+        keep the order of the merged files, and the file metadata holds (rows, [file names]) runs naming every file the
+        rows were in, so `tail()` can skip rows it already returned.
+        """
+        with _lock(self.root / "_compact.lock", blocking=False) as locked:
+            if not locked:
+                LOGGER.info(f"{PREFIX}{self.root} is being compacted by another process")
+                return False
+            now = pd.Timestamp.now().floor("h")
+            for d in self.root.glob("intersection=*/date=*/hour=*"):
+                files = sorted(d.glob("*.parquet"))
+                if len(files) > 1 and self._hour(d) < now:
+                    dfs, sources = [], []
+                    for f in files:
+                        df, runs = self._load(f)
+                        dfs.append(df)
+                        sources += [[n, [*x, f.name]] for n, x in runs] if runs else [[len(df), [f.name]]]
+                    tmp = self._save(pd.concat(dfs, ignore_index=True), d, swap=False, sources=sources)
+                    with _lock(self.root / "_files.lock"):
+                        os.replace(tmp, tmp.with_suffix(".parquet"))
+                        for f in files:
+                            f.unlink(missing_ok=True)
+        LOGGER.info(f"{PREFIX}compacted {self.root}")
+        return True
+
+    def export_excel(self, file="traffic_data.xlsx", start=None, end=None, intersection=None):
+        """Exports rows with Timestamp in [start, end) to a formatted Excel file and returns its path."""
+        df = self.read(start, end, intersection)
+        df.insert(0, "Date", df["Timestamp"].dt.strftime("%Y-%m-%d"))
+        df.insert(1, "Time", df["Timestamp"].dt.strftime("%H:%M:%S"))
+        df = df.drop(columns="Timestamp")
+        with pd.ExcelWriter(file, engine="xlsxwriter") as writer:
+            df.to_excel(writer, sheet_name="Traffic_Data", index=False)
+            workbook, worksheet = writer.book, writer.sheets["Traffic_Data"]
+            header_format = workbook.add_format({"bold": True, "bg_color": "#D3D3D3", "border": 1, "align": "center"})
+            widths = {"Date": 12, "Time": 10, "Signal_Status": 10, "Lane": 8, "Traffic_Density": 15, "Intersection": 14}
+            for i, c in enumerate(df.columns):
+                worksheet.write(0, i, c, header_format)
+                worksheet.set_column(i, i, widths.get(c, 10))
+            if "Signal_Status" in df:
+                j = df.columns.get_loc("Signal_Status")
+                for value, color in ("Green", "#90EE90"), ("Orange", "#FFA500"), ("Red", "#FF6B6B"):
+                    worksheet.conditional_format(
+                        1,
+                        j,
+                        len(df) + 1,
+                        j,
+                        {
+                            "type": "text",
+                            "criteria": "containing",
+                            "value": value,
+                            "format": workbook.add_format({"bg_color": color}),
+                        },
+                    )
+        return file
+
+    def _write(self, df):
+        """Writes a DataFrame to new files in its intersection/date/hour partitions."""
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+        for (junction, hour), x in df.groupby([df["Intersection"].astype(str), df["Timestamp"].dt.floor("h")]):
+            d = self.root / f"intersection={clean_str(junction)}" / f"date={hour:%Y-%m-%d}" / f"hour={hour:%H}"
+            self._save(x, d)
+
+    def _select(self, dfs, columns=None, intersection=None, since=None):
+        """Concatenates file DataFrames with unflushed rows (after `since`), filtered by intersection and sorted by
+        Timestamp.
+        """
+        with self.lock:
+            if self.buffer:
+                b = pd.DataFrame(self.buffer)
+                if since is not None:
+                    b = b[pd.to_datetime(b["Timestamp"]) > pd.Timestamp(since)]
+                dfs.append(b if columns is None else b[[c for c in columns if c in b]])
+        dfs = [x for x in dfs if len(x)]
+        if not dfs:
+            return pd.DataFrame({c: pd.Series(dtype=object) for c in columns or []}).assign(
+                Timestamp=pd.Series(dtype="datetime64[ns]")
+            )
+        df = pd.concat(dfs, ignore_index=True)
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"])
+        if intersection is not None:
+            df = df[df["Intersection"] == intersection]
+        return df.sort_values("Timestamp", kind="stable", ignore_index=True)
+
+    @staticmethod
+    def _hour(d):
+        """Returns the start Timestamp of hour partition directory `d`, i.e. '.../date=2024-01-01/hour=07'."""
+        return pd.Timestamp(f"{d.parent.name[5:]} {d.name[5:]}:00")
+
+    @staticmethod
+    def _load(f):
+        """Returns the DataFrame of Parquet file `f` and its compacted source runs, [] if not compacted."""
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(f)
+        sources = (table.schema.metadata or {}).get(b"sources")
+        return table.to_pandas(), json.loads(sources) if sources else []
+
+    @staticmethod
+    def _save(df, d, swap=True, sources=None):
+        """Saves a DataFrame to a new Parquet file in directory `d` via atomic rename, returns the file, or the
+        temporary file not renamed yet if not `swap`. Compacted `sources` runs are stored in the file metadata.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        d.mkdir(parents=True, exist_ok=True)
+        f = d / f"part-{time.time_ns()}-{uuid4().hex[:8]}.parquet"
+        tmp = f.with_suffix(".tmp")
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if sources:
+            table = table.replace_schema_metadata({**table.schema.metadata, b"sources": json.dumps(sources)})
+        pq.write_table(table, tmp)
+        if not swap:
+            return tmp
+        os.replace(tmp, f)
+        return f
+
+    def _recover(self):
+        """Flushes WAL files left behind by processes that are no longer running, under a lock so that stores opened
+        concurrently by several processes replay each WAL once.
+        """
+        with _lock(self.root / "_recover.lock"):
+            for f in self.root.glob("_wal/*.jsonl"):
+                pid = int(f.name.split("-")[0])
+                if f in _OPEN_WALS or (pid != os.getpid() and psutil.pid_exists(pid)):
+                    continue  # live writer
+                rows = [json.loads(x) for x in f.read_text().splitlines() if x.strip()]
+                if rows:
+                    self._write(pd.DataFrame(rows))
+                    LOGGER.info(f"{PREFIX}recovered {len(rows)} rows from {f}")
+                f.unlink(missing_ok=True)
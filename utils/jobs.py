@@ -0,0 +1,130 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""
+Persistent SQLite job manifest for resumable batch processing of many input files.
+
+Usage:
+    jobs = JobManifest("runs/batch/exp/manifest.db")
+    jobs.add(["cam1/day1.mp4", "cam1/day2.mp4"])  # new sources become 'pending', known ones are kept
+    while job := jobs.claim(worker=0):  # (id, source, frame) of a pending job, now 'running'
+        jobs.checkpoint(job[0], frame=1000)  # progress, a restarted job resumes from here
+        jobs.done(job[0], frame=5000)
+"""
+
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+
+import psutil
+
+STATUSES = "pending", "running", "done", "failed"
+
+
+class JobManifest:
+    """
+    Table of input files with status, progress (last processed frame) and timing, shared by several processes.
+
+    Every method uses a short transaction of its own, `claim()` with an immediate write lock so two workers never take
+    the same job. Jobs left 'running' by a crash are made 'pending' again by `reset()`, they resume from their last
+    checkpointed frame. Running jobs record the host and pid of their worker and `checkpoint()` is their heartbeat, so
+    `reset()` of one runner only takes over jobs whose worker died or went silent, not those of other live runners.
+    """
+
+    def __init__(self, file):
+        """Opens or creates the manifest database `file`."""
+        self.file = Path(file)
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.file, timeout=60, isolation_level=None)  # autocommit, explicit transactions
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY, source TEXT UNIQUE, status TEXT DEFAULT "
+            "'pending', frame INTEGER DEFAULT 0, worker INTEGER, error TEXT, seconds REAL DEFAULT 0, updated REAL)"
+        )
+        columns = {x[1] for x in self.db.execute("PRAGMA table_info(jobs)")}
+        for c in ("host TEXT", "pid INTEGER"):  # worker process of running jobs, added to older manifests
+            if c.split()[0] not in columns:
+                self.db.execute(f"ALTER TABLE jobs ADD COLUMN {c}")
+
+    def add(self, sources):
+        """Adds new `sources` as pending jobs, returns the number added."""
+        n = self.db.total_changes
+        self.db.execute("BEGIN")
+        self.db.executemany("INSERT OR IGNORE INTO jobs (source) VALUES (?)", ((str(x),) for x in sources))
+        self.db.execute("COMMIT")
+        return self.db.total_changes - n
+
+    def reset(self, failed=False, stale=300.0, running=False):
+        """
+        Makes stale 'running' jobs (and 'failed' ones if `failed`) 'pending' again, returns the number reset.
+
+        A running job is stale if its worker process on this host is dead or it was not updated (claimed or
+        checkpointed) for `stale` seconds. With `running` all running jobs are reset, also those of live workers.
+        """
+        host, now = socket.gethostname(), time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            jobs = self.db.execute("SELECT id, host, pid, updated FROM jobs WHERE status = 'running'").fetchall()
+            ids = [
+                id
+                for id, h, pid, updated in jobs
+                if running
+                or (h == host and pid and not psutil.pid_exists(pid))  # worker died
+                or updated is None
+                or now - updated > stale  # no heartbeat
+            ]
+            if failed:
+                ids += [x[0] for x in self.db.execute("SELECT id FROM jobs WHERE status = 'failed'")]
+            self.db.executemany("UPDATE jobs SET status = 'pending', error = NULL WHERE id = ?", ((x,) for x in ids))
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return len(ids)
+
+    def claim(self, worker):
+        """Claims the next pending job for `worker`, returns its (id, source, frame) or None when none is left."""
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            job = self.db.execute("SELECT id, source, frame FROM jobs WHERE status = 'pending' ORDER BY id").fetchone()
+            if job:
+                self.db.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, host = ?, pid = ?, updated = ? WHERE id = ?",
+                    (worker, socket.gethostname(), os.getpid(), time.time(), job[0]),
+                )
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return job
+
+    def checkpoint(self, id, frame, seconds=0.0):
+        """Records `frame` as the last processed frame of job `id` and adds `seconds` of processing time."""
+        self.db.execute(
+            "UPDATE jobs SET frame = ?, seconds = seconds + ?, updated = ? WHERE id = ?",
+            (frame, seconds, time.time(), id),
+        )
+
+    def done(self, id, frame, seconds=0.0):
+        """Marks job `id` 'done' after `frame` frames."""
+        self.checkpoint(id, frame, seconds)
+        self.db.execute("UPDATE jobs SET status = 'done' WHERE id = ?", (id,))
+
+    def fail(self, id, error):
+        """Marks job `id` 'failed' with an error message, its checkpoint is kept for a retry."""
+        self.db.execute(
+            "UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?", (str(error), time.time(), id)
+        )
+
+    def counts(self):
+        """Returns a dict of job counts per status."""
+        counts = dict.fromkeys(STATUSES, 0)
+        counts.update(self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return counts
+
+    def frames(self):
+        """Returns the total number of frames processed over all jobs."""
+        return self.db.execute("SELECT COALESCE(SUM(frame), 0) FROM jobs").fetchone()[0]
+
+    def close(self):
+        """Closes the database connection."""
+        self.db.close()
@@ -0,0 +1,146 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Lane polygon utils for counting detections per traffic lane."""
+
+import torch
+
+from utils.general import yaml_load
+
+LANE_CATEGORIES = {
+    "car": "cars",
+    "truck": "trucks",
+    "person": "people",
+    "bicycle": "bicycles",
+    "motorcycle": "motorcycles",
+    "bus": "buses",
+}  # model class name to lane count key, as consumed by OXAL/ACPcount.determine_signals()
+
+
+def points_in_polygons(points, polygons):
+    """
+    Vectorized even-odd (ray casting) point-in-polygon test.
+
+    Args:
+        points (torch.Tensor): (n, 2) xy points.
+        polygons (torch.Tensor): (m, k, 2) xy polygon vertices, shorter polygons padded by repeating their last vertex.
+
+    Returns:
+        (torch.Tensor): (n, m) bool mask, True where point i lies inside polygon j.
+    """
+    x, y = points[:, None, None, 0], points[:, None, None, 1]  # (n, 1, 1)
+    x1, y1 = polygons[None, ..., 0], polygons[None, ..., 1]  # (1, m, k) edge start
+    x2, y2 = x1.roll(-1, dims=-1), y1.roll(-1, dims=-1)  # edge end (closes polygon)
+    dy = y2 - y1
+    crosses = (y1 > y) != (y2 > y)  # edge spans the horizontal ray through the point
+    xi = x1 + (y - y1) * (x2 - x1) / torch.where(dy == 0, torch.ones_like(dy), dy)  # ray-edge intersection x
+    return ((crosses & (x < xi)).sum(-1) % 2).bool()
+
+
+class LaneCounter:
+    """
+    Counts detections per lane polygon for one camera, i.e. `LaneCounter(lanes, model.names)(det)`.
+
+    Per-frame counts see a waiting vehicle again in every frame. With tracker output (see utils.tracker.Tracker)
+    `track()` records which lane each track ID occupies and returns lane entry events, `unique_counts()` counts every
+    vehicle once per window and `event_counts()` counts entries. Call `reset()` when the tracker is restarted.
+    """
+
+    def __init__(self, lanes, names, anchor="bottom", device=None, memory=300):
+        """
+        Initializes lane polygons and the class to count-key mapping.
+
+        Args:
+            lanes (dict): Lane name to list of [x, y] polygon vertices in original frame pixels.
+            names (dict | list): Model class names.
+            anchor (str): Box point tested against lanes, 'bottom' (bottom-center ground contact) or 'center'.
+            device (torch.device, optional): Device of the detections to be counted.
+            memory (int): `track()` steps a track ID is remembered after it was last seen in a lane.
+        """
+        assert anchor in ("bottom", "center"), f"invalid lane anchor '{anchor}', valid values are 'bottom', 'center'"
+        self.lanes = list(lanes)
+        self.anchor = anchor
+        self.categories = tuple(dict.fromkeys(LANE_CATEGORIES.values()))
+        k = max(len(v) for v in lanes.values())
+        polygons = [list(v) + [v[-1]] * (k - len(v)) for v in lanes.values()]  # pad to k vertices
+        self.polygons = torch.tensor(polygons, dtype=torch.float32, device=device)  # (m, k, 2)
+
+        names = names if isinstance(names, dict) else dict(enumerate(names))
+        cls_map = torch.full((max(names) + 1,), -1, dtype=torch.long)
+        for i, name in names.items():
+            if name in LANE_CATEGORIES:
+                cls_map[i] = self.categories.index(LANE_CATEGORIES[name])
+        self.cls_map = cls_map.to(device)
+        self.memory = memory
+        self.step = 0  # track() calls
+        self.tracks = {}  # track ID: (lane index, category index, last step seen)
+
+    def assign(self, det):
+        """Returns (n,) lane index of each detection (xyxy, conf, cls), -1 if outside all lanes (first match wins)."""
+        xy = (det[:, 0:2] + det[:, 2:4]) / 2  # box centers
+        if self.anchor == "bottom":
+            xy[:, 1] = det[:, 3]  # bottom-center
+        inside = points_in_polygons(xy.float(), self.polygons.to(det.device))  # (n, m)
+        return torch.where(inside.any(1), inside.int().argmax(1), -1)
+
+    def counts(self, det):
+        """Returns (lanes, categories) int64 count tensor for detections (xyxy, conf, cls) in original frame pixels."""
+        m, c = len(self.lanes), len(self.categories)
+        if not len(det):
+            return torch.zeros((m, c), dtype=torch.long, device=det.device)
+        lane = self.assign(det)
+        cat = self.cls_map.to(det.device)[det[:, 5].long()]
+        i = (lane >= 0) & (cat >= 0)
+        return torch.bincount(lane[i] * c + cat[i], minlength=m * c).view(m, c)
+
+    def track(self, tracks):
+        """Records lanes of tracker output (xyxy, conf, cls, id), returns [(id, lane, category), ...] lane entries."""
+        self.step += 1
+        events = []
+        if len(tracks):
+            lanes = self.assign(tracks).tolist()
+            cats = self.cls_map.to(tracks.device)[tracks[:, 5].long()].tolist()
+            for i, lane, cat in zip(tracks[:, 6].long().tolist(), lanes, cats):
+                if lane < 0 or cat < 0:
+                    continue
+                if self.tracks.get(i, (None,))[0] != lane:
+                    events.append((i, self.lanes[lane], self.categories[cat]))  # entered lane
+                self.tracks[i] = (lane, cat, self.step)
+        self.tracks = {k: v for k, v in self.tracks.items() if self.step - v[2] < self.memory}
+        return events
+
+    def reset(self):
+        """Forgets all track IDs, i.e. for a new tracker whose IDs restart."""
+        self.step = 0
+        self.tracks = {}
+
+    def event_counts(self, events):
+        """Returns (lanes, categories) int64 counts of `track()` lane entry events."""
+        counts = torch.zeros((len(self.lanes), len(self.categories)), dtype=torch.long)
+        for _, lane, cat in events:
+            counts[self.lanes.index(lane), self.categories.index(cat)] += 1
+        return counts
+
+    def unique_counts(self, window=1):
+        """Returns (lanes, categories) int64 counts of unique track IDs seen per lane in the last `window` steps."""
+        counts = torch.zeros((len(self.lanes), len(self.categories)), dtype=torch.long)
+        for lane, cat, step in self.tracks.values():
+            if self.step - step < window:
+                counts[lane, cat] += 1
+        return counts
+
+    def to_dict(self, counts):
+        """Returns (lanes, categories) counts as {'lane_1': {'cars': n, 'trucks': n, 'people': n, ...}, ...}."""
+        return {lane: dict(zip(self.categories, n)) for lane, n in zip(self.lanes, counts.tolist())}
+
+    def __call__(self, det):
+        """Returns lane counts as {'lane_1': {'cars': n, 'trucks': n, 'people': n, ...}, ...} for determine_signals()."""
+        return self.to_dict(self.counts(det))
+
+
+def load_lane_counters(file, names, device=None):
+    """Returns {camera: LaneCounter} from a lanes YAML file, i.e. `load_lane_counters('data/lanes.yaml', model.names)`."""
+    cfg = yaml_load(file)
+    anchor = cfg.get("anchor", "bottom")
+    return {
+        str(k): LaneCounter(v["lanes"], names, anchor=v.get("anchor", anchor), device=device)
+        for k, v in cfg["cameras"].items()
+    }
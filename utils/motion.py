@@ -0,0 +1,77 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Motion gating to skip inference on static camera frames and reuse the last detections instead."""
+
+import cv2
+import torch
+
+
+class MotionGate:
+    """
+    Selects the streams of a batch that need inference, by frame difference against each stream's last keyframe.
+
+    Frames are compared as small blurred grayscale thumbnails, so the check costs about a millisecond per 1080p frame.
+    A stream is inferred when the fraction of changed thumbnail pixels exceeds `thres`, its frame size changes, or
+    `interval` frames passed since its last inference. Other streams reuse their last detections.
+
+    Usage:
+        gate = MotionGate(thres=0.005, interval=30, streams=len(dataset))
+        run = gate(im0s)  # indices of streams to infer
+        pred = gate.merge(non_max_suppression(model(im[run])), run)  # detections for all streams
+    """
+
+    def __init__(self, thres=0.005, interval=30, size=64, pixel_thres=12, streams=1):
+        """Initializes gate with changed-pixel fraction threshold, forced inference interval, thumbnail width and
+        number of streams.
+        """
+        self.thres = thres
+        self.interval = interval
+        self.size = size
+        self.pixel_thres = pixel_thres  # grayscale level change counted as motion
+        self.streams = streams
+        self.refs, self.age, self.dets = {}, {}, {}  # per-stream keyframe thumbnails, frames since keyframe, detections
+        self.frames, self.inferred = 0, 0
+
+    def thumbnail(self, im0):
+        """Returns a small blurred grayscale thumbnail of a BGR frame."""
+        h, w = im0.shape[:2]
+        im = cv2.cvtColor(im0, cv2.COLOR_BGR2GRAY) if im0.ndim == 3 else im0
+        im = cv2.resize(im, (self.size, max(round(self.size * h / w), 1)), interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(im, (3, 3), 0)
+
+    def score(self, a, b):
+        """Returns the fraction of thumbnail pixels that changed between thumbnails `a` and `b`."""
+        return float((cv2.absdiff(a, b) > self.pixel_thres).mean())
+
+    def __call__(self, im0s, streams=None):
+        """Returns indices of the BGR frames `im0s` (one per stream, checking `streams` only if given) that need
+        inference, updating their keyframes.
+        """
+        run = []
+        for i, im0 in enumerate(im0s):
+            if streams is not None and i not in streams:
+                continue
+            im = self.thumbnail(im0)
+            ref = self.refs.get(i)
+            self.age[i] = self.age.get(i, 0) + 1
+            if (
+                i not in self.dets
+                or ref.shape != im.shape
+                or self.age[i] >= self.interval
+                or self.score(im, ref) > self.thres
+            ):
+                self.refs[i], self.age[i] = im, 0
+                run.append(i)
+        self.frames += len(im0s) if streams is None else len(streams)
+        self.inferred += len(run)
+        return run
+
+    def merge(self, pred, run):
+        """
+        Stores detections `pred` of streams `run` and returns a copy of the latest detections of all streams.
+
+        Streams not inferred yet, i.e. not served first by a stream scheduler, get empty (0, 6) detections.
+        """
+        for i, det in zip(run, pred):
+            self.dets[i] = det.clone()
+        empty = next(iter(self.dets.values()), torch.zeros(0, 6))[:0]  # same device and dtype
+        return [self.dets[i].clone() if i in self.dets else empty.clone() for i in range(self.streams)]
@@ -0,0 +1,31 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Perform test requests."""
+
+import pprint
+import struct
+
+import numpy as np
+import requests
+
+DETECTION_URL = "http://localhost:5000/v1/object-detection/yolov5s"
+IMAGE = "zidane.jpg"
+
+# Read image
+with open(IMAGE, "rb") as f:
+    image_data = f.read()
+
+response = requests.post(DETECTION_URL, files={"image": image_data}).json()
+
+pprint.pprint(response)
+
+# Batch of images, one list of detections per image
+response = requests.post(f"{DETECTION_URL}/batch", files=[("image", image_data), ("image", image_data)]).json()
+
+pprint.pprint(response)
+
+# Binary response, a header and n rows of float32 xmin, ymin, xmax, ymax, confidence, class
+headers = {"Accept": "application/octet-stream"}
+content = requests.post(DETECTION_URL, files={"image": image_data}, headers=headers).content
+_, _, c, n = struct.unpack_from("<4sHHI", content)
+
+pprint.pprint(np.frombuffer(content, "<f4", n * c, 12).reshape(n, c))
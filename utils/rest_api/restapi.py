@@ -0,0 +1,356 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""
+Run an ASGI REST API serving local YOLOv5 models from a pool of worker processes.
+
+The server process only handles HTTP, every worker process loads and warms all models once at startup
+(DetectMultiBackend + AutoShape) and runs requests on its share of the CPU cores, so throughput under concurrent clients
+scales with the number of workers. Concurrent requests are coalesced into batches run as one forward each. Models are
+loaded from local weights files only, the server runs fully offline.
+
+Usage:
+    $ python utils/rest_api/restapi.py --model yolov5s.pt yolov5n.pt --workers 4 --port 5000
+    $ curl -X POST -F image=@zidane.jpg 'http://localhost:5000/v1/object-detection/yolov5s'
+    $ curl -X POST -F image=@zidane.jpg -F image=@bus.jpg 'http://localhost:5000/v1/object-detection/yolov5s/batch'
+    $ curl 'http://localhost:5000/v1/metrics'  # queue depth and batch size histograms
+"""
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import functools
+import logging
+import os
+import struct
+import sys
+from contextlib import asynccontextmanager
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import torch
+
+FILE = Path(__file__).resolve()
+ROOT = FILE.parents[2]  # YOLOv5 root directory
+if str(ROOT) not in sys.path:
+    sys.path.append(str(ROOT))  # add ROOT to PATH
+
+from models.common import AutoShape, DetectMultiBackend
+from utils.general import LOGGER, check_requirements, colorstr, print_args
+from utils.torch_utils import select_device
+
+DETECTION_URL = "/v1/object-detection/{model}"
+ENCODINGS = {  # Accept media type: Detections encoder
+    "application/json": "json",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/octet-stream": "tobytes",
+}
+MEDIA_TYPES = {"json": "application/json", "msgpack": "application/msgpack", "tobytes": "application/octet-stream"}
+PREFIX = colorstr("restapi: ")
+models = {}  # {name: AutoShape model} of a worker process
+
+
+def load_models(weights, device="", half=False, size=640, threads=1, conf_thres=0.25, iou_thres=0.45):
+    """Worker process initializer, loads and warms one AutoShape model per local weights file."""
+    torch.set_num_threads(threads)
+    LOGGER.setLevel(logging.WARNING)  # model summaries of every worker
+    device = select_device(device)
+    for w in weights:
+        model = AutoShape(DetectMultiBackend(w, device=device, fp16=half), verbose=False)
+        model.conf, model.iou = conf_thres, iou_thres
+        model.keep_ims = False  # responses hold detections only
+        model(np.zeros((size, size, 3), dtype=np.uint8), size=size)  # warmup
+        models[Path(w).stem] = model
+
+
+def predict(name, images, size=640):
+    """Runs model `name` on a list of (encoded image, response encoding) pairs in one batch, returns the encoded
+    detections of each image (None for images that could not be decoded).
+
+    Encoded images are decoded by AutoShape at reduced resolution where possible (keep_ims=False), a batch with an
+    undecodable image is run again image by image.
+    """
+    try:
+        results = models[name]([x for x, _ in images], size=size)  # letterboxed to one common shape, one forward
+    except ValueError:  # image could not be decoded
+        return [predict(name, [x], size)[0] for x in images] if len(images) > 1 else [None]
+    encoded = {k: iter(getattr(results, k)()) for k in {k for _, k in images}}  # each encoding used in this batch
+    return [next(encoded[k]) for _, k in images]
+
+
+def encoding(accept):
+    """Returns the response encoding of an HTTP Accept header, the first supported media type in it or JSON."""
+    for x in accept.split(","):
+        media = x.split(";")[0].strip().lower()
+        if media in ENCODINGS:
+            return ENCODINGS[media]
+    return "json"
+
+
+def concat(parts, encoding, batch=False):
+    """Returns the response body of encoded per-image detections, a JSON or msgpack array of them for batch requests
+    and the concatenated self-delimiting blocks for binary responses.
+    """
+    if encoding == "tobytes":
+        return b"".join(parts)
+    if not batch:
+        return parts[0]
+    if encoding == "json":
+        return "[" + ",".join(parts) + "]"
+    n = len(parts)  # msgpack array header, fixarray, array 16 or array 32
+    if n < 16:
+        header = bytes([0x90 | n])
+    else:
+        header = b"\xdc" + struct.pack(">H", n) if n < 2**16 else b"\xdd" + struct.pack(">I", n)
+    return header + b"".join(parts)
+
+
+class Batcher:
+    """
+    Coalesces concurrent requests for one model into batches run as one forward each.
+
+    Queued requests wait at most `max_wait` seconds for more requests to arrive, then until a worker slot is free
+    (`slots`, shared by the batchers of all models), and the queued requests, up to `max_batch` images, form one batch. Results are fanned back to the waiting requests. Requests are never split, a request with more than
+    `max_batch` images is a batch of its own.
+
+    Queue depth (images waiting when a batch is formed, power-of-2 buckets) and batch size (images per forward)
+    histograms are kept in `depths` and `sizes`.
+    """
+
+    def __init__(self, run, slots, max_batch=32, max_wait=0.005):
+        """Initializes batcher with async `run(images)` returning one result per image, and a worker slot semaphore."""
+        self.run = run
+        self.slots = slots
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = collections.deque()  # (images, future) of waiting requests
+        self.queued = 0  # images in queue
+        self.event = asyncio.Event()  # set on new requests
+        self.depths, self.sizes = collections.Counter(), collections.Counter()
+        self.requests, self.batches = 0, 0
+        self.task = None
+
+    def start(self):
+        """Starts the batching task on the running event loop."""
+        self.task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Stops the batching task."""
+        self.task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.task
+
+    async def __call__(self, images):
+        """Queues a request of encoded `images` and returns their results once its batch has run."""
+        future = asyncio.get_running_loop().create_future()
+        self.queue.append((images, future))
+        self.queued += len(images)
+        self.requests += 1
+        self.event.set()
+        return await future
+
+    async def _loop(self):
+        """Forms batches whenever requests are queued and a worker slot is free."""
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self.queue:
+                self.event.clear()
+                await self.event.wait()
+            deadline = loop.time() + self.max_wait
+            while self.queued < self.max_batch and loop.time() < deadline:  # wait for a fuller batch
+                self.event.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.event.wait(), deadline - loop.time())
+            await self.slots.acquire()  # only once requests are queued, idle models hold no slot
+            self.depths[1 << max(self.queued - 1, 0).bit_length()] += 1
+            batch, n = [], 0
+            while self.queue and (not batch or n + len(self.queue[0][0]) <= self.max_batch):
+                images, future = self.queue.popleft()
+                self.queued -= len(images)
+                if not future.done():  # not cancelled by a disconnected client
+                    batch.append((images, future))
+                    n += len(images)
+            if batch:
+                self.sizes[n] += 1
+                self.batches += 1
+                asyncio.create_task(self._run(batch))  # releases the slot when done
+            else:
+                self.slots.release()
+
+    async def _run(self, batch):
+        """Runs one batch and fans its results (or error) back to the requests."""
+        try:
+            results = await self.run([x for images, _ in batch for x in images])
+            i = 0
+            for images, future in batch:
+                if not future.done():
+                    future.set_result(results[i : i + len(images)])
+                i += len(images)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.slots.release()
+
+    def metrics(self):
+        """Returns queue depth and batch size histograms and counters as a dict."""
+        return {
+            "queue_depth": self.queued,
+            "requests": self.requests,
+            "batches": self.batches,
+            "queue_depth_histogram": {f"le_{k}": v for k, v in sorted(self.depths.items())},
+            "batch_size_histogram": {str(k): v for k, v in sorted(self.sizes.items())},
+        }
+
+
+def _resolve(future, result=None, error=None):
+    """Sets the result or error of an asyncio `future` unless the request was cancelled, on the event loop thread."""
+    if not future.done():
+        future.set_exception(error) if error else future.set_result(result)
+
+
+def create_app(
+    weights=("yolov5s.pt",),  # local weights files, served under their file stem
+    device="",  # cuda device, i.e. 0 or 0,1,2,3 or cpu
+    half=False,  # use FP16 half-precision inference
+    size=640,  # inference size
+    workers=1,  # worker processes, each holding all models
+    conf_thres=0.25,  # confidence threshold
+    iou_thres=0.45,  # NMS IOU threshold
+    max_batch=32,  # max images per forward and per batch request
+    max_wait_ms=5.0,  # milliseconds a request may wait for more requests to fill its batch
+):
+    """
+    Returns a Starlette ASGI app serving `weights` from a pool of `workers` processes, started with the app lifespan.
+
+    Concurrent requests for the same model are coalesced into batches of up to `max_batch` images, run as one forward
+    each (see Batcher).
+
+    Routes:
+        POST /v1/object-detection/<model>: one 'image' file, returns a list of detections.
+        POST /v1/object-detection/<model>/batch: up to `max_batch` 'image' files inferred together, returns a list of
+            detection lists.
+        GET /v1/metrics: queue depth and batch size histograms per model.
+
+    Detections are boxes in input image pixels, encoded by the request's Accept header (see models.common.Detections):
+        application/json (default): list of {'xmin', 'ymin', 'xmax', 'ymax', 'confidence', 'class', 'name'} records.
+        application/msgpack: map of columns, the record keys above with lists of values.
+        application/octet-stream: header and little-endian float32 rows, blocks of a batch are concatenated.
+    """
+    check_requirements(("starlette", "python-multipart"))
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    weights = [str(Path(w).with_suffix(Path(w).suffix or ".pt")) for w in weights]  # i.e. yolov5s to yolov5s.pt
+    for w in weights:
+        assert Path(w).exists(), f"{w} not found, the REST API only serves local weights files"
+    names = [Path(w).stem for w in weights]
+    threads = max(os.cpu_count() // workers, 1)
+    pool, batchers = None, {}
+
+    @asynccontextmanager
+    async def lifespan(app):
+        """Starts the worker pool and batchers before serving and stops them on shutdown."""
+        nonlocal pool
+        args = weights, device, half, size, threads, conf_thres, iou_thres
+        pool = get_context("spawn").Pool(workers, load_models, args)
+        slots = asyncio.Semaphore(workers)  # batches in flight, one per worker
+        for name in names:
+            batchers[name] = Batcher(functools.partial(run, name), slots, max_batch, max_wait_ms / 1000)
+            batchers[name].start()
+        LOGGER.info(f"{PREFIX}serving {names} from {workers} workers with {threads} threads each")
+        yield
+        for b in batchers.values():
+            await b.stop()
+        pool.terminate()
+        pool.join()
+
+    async def run(name, images):
+        """Runs `predict` on the worker pool without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pool.apply_async(
+            predict,
+            (name, images, size),
+            callback=lambda r: loop.call_soon_threadsafe(_resolve, future, r),
+            error_callback=lambda e: loop.call_soon_threadsafe(_resolve, future, None, e),
+        )
+        return await future
+
+    async def detect(request, batch=False):
+        """Handles a detection request for one image or, with `batch`, a list of images."""
+        name = request.path_params["model"]
+        if name not in names:
+            return JSONResponse({"error": f"unknown model '{name}', available models are {names}"}, status_code=404)
+        async with request.form(max_files=max_batch) as form:
+            files = form.getlist("image")[: max_batch if batch else 1]
+            if not files:
+                return JSONResponse({"error": "no 'image' file in request"}, status_code=400)
+            images = [await f.read() for f in files]
+        k = encoding(request.headers.get("accept", ""))
+        results = await batchers[name]([(x, k) for x in images])
+        if None in results:
+            i = [i for i, x in enumerate(results) if x is None]
+            return JSONResponse({"error": f"invalid image {i}, could not decode the uploaded file"}, status_code=400)
+        return Response(concat(results, k, batch), media_type=MEDIA_TYPES[k])
+
+    async def detect_batch(request):
+        """Handles a batch detection request."""
+        return await detect(request, batch=True)
+
+    async def metrics(request):
+        """Returns batching metrics of all models."""
+        return JSONResponse({k: b.metrics() for k, b in batchers.items()})
+
+    routes = [
+        Route(DETECTION_URL, detect, methods=["POST"]),
+        Route(f"{DETECTION_URL}/batch", detect_batch, methods=["POST"]),
+        Route("/v1/metrics", metrics, methods=["GET"]),
+    ]
+    return Starlette(routes=routes, lifespan=lifespan)
+
+
+def parse_opt():
+    """Parses command-line arguments for the REST API server."""
+    parser = argparse.ArgumentParser(description="ASGI REST API exposing YOLOv5 models")
+    parser.add_argument("--host", default="0.0.0.0", help="host address")
+    parser.add_argument("--port", default=5000, type=int, help="port number")
+    parser.add_argument("--model", nargs="+", default=["yolov5s.pt"], help="local weights, i.e. yolov5n.pt yolov5s")
+    parser.add_argument("--device", default="", help="cuda device, i.e. 0 or 0,1,2,3 or cpu")
+    parser.add_argument("--half", action="store_true", help="use FP16 half-precision inference")
+    parser.add_argument("--size", type=int, default=640, help="inference size")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes, each holding all models")
+    parser.add_argument("--conf-thres", type=float, default=0.25, help="confidence threshold")
+    parser.add_argument("--iou-thres", type=float, default=0.45, help="NMS IoU threshold")
+    parser.add_argument("--max-batch", type=int, default=32, help="max images per forward and batch request")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="max milliseconds to wait for a fuller batch")
+    opt = parser.parse_args()
+    print_args(vars(opt))
+    return opt
+
+
+def main(opt):
+    """Starts the REST API server with command-line options."""
+    check_requirements("uvicorn")
+    import uvicorn
+
+    app = create_app(
+        opt.model,
+        opt.device,
+        opt.half,
+        opt.size,
+        opt.workers,
+        opt.conf_thres,
+        opt.iou_thres,
+        opt.max_batch,
+        opt.max_wait_ms,
+    )
+    uvicorn.run(app, host=opt.host, port=opt.port)
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    main(opt)
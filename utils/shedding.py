@@ -0,0 +1,84 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Load shedding for live streams, trading inference size and frame rate for end-to-end latency under overload."""
+
+import collections
+
+import numpy as np
+
+from utils.general import LOGGER, colorstr, make_divisible
+
+PREFIX = colorstr("shedding: ")
+
+
+def scaled_sizes(imgsz, sizes=None, stride=32):
+    """Returns (h, w) inference sizes of `imgsz` aspect ratio with long sides `sizes` (default 100, 80 and 65% of
+    `imgsz`), rounded up to multiples of `stride`.
+    """
+    sizes = sizes or [max(imgsz) * k for k in (1.0, 0.8, 0.65)]
+    return [tuple(make_divisible(x * s / max(imgsz), stride) for x in imgsz) for s in sizes]
+
+
+class LoadShedder:
+    """
+    Steps inference size down and video frame-rate stride up while end-to-end frame latency exceeds an SLO.
+
+    Levels run from full quality to the cheapest setting: every size of `sizes` (largest first) at stride `vid_stride`,
+    then the smallest size with strides up to `max_stride`. Latencies (seconds from frame capture to outputs) are
+    collected over a `window` of frames, a full window whose 90th percentile exceeds `slo` sheds one level and one
+    below `slo * hysteresis` restores one, so the controller does not oscillate between neighbouring levels.
+
+    Usage:
+        shedder = LoadShedder(slo=0.5, sizes=[(640, 640), (512, 512), (416, 416)], max_stride=4)
+        shedder.apply(dataset)  # before next(dataset), resizes LoadStreams and sets its stride on level changes
+        shedder.update(latencies)  # after outputs, seconds since capture of each frame
+    """
+
+    def __init__(self, slo, sizes, vid_stride=1, max_stride=4, window=30, hysteresis=0.5):
+        """Initializes controller with latency SLO in seconds, warmed (h, w) inference sizes and stride bounds."""
+        self.slo = slo
+        self.sizes = sorted((tuple(x) for x in sizes), key=max, reverse=True)
+        self.levels = [(x, vid_stride) for x in self.sizes]
+        self.levels += [(self.levels[-1][0], s) for s in range(vid_stride + 1, max(max_stride, vid_stride) + 1)]
+        self.window = window
+        self.hysteresis = hysteresis
+        self.level = 0
+        self.latencies = collections.deque(maxlen=window)
+        self.changes = 0
+
+    @property
+    def size(self):
+        """Returns the inference (h, w) size of the current level."""
+        return self.levels[self.level][0]
+
+    @property
+    def stride(self):
+        """Returns the video frame-rate stride of the current level."""
+        return self.levels[self.level][1]
+
+    def update(self, latencies):
+        """Adds frame latencies in seconds, stepping one level down or up after a full window, returns the level."""
+        self.latencies.extend(latencies)
+        if len(self.latencies) < self.window:
+            return self.level
+        p = float(np.percentile(self.latencies, 90))
+        if p > self.slo and self.level < len(self.levels) - 1:
+            step = 1
+        elif p < self.slo * self.hysteresis and self.level > 0:
+            step = -1
+        else:
+            return self.level
+        (h0, w0), s0 = self.levels[self.level]
+        self.level += step
+        (h, w), s = self.levels[self.level]
+        self.latencies.clear()  # next decision on latencies of the new level only
+        self.changes += 1
+        LOGGER.info(
+            f"{PREFIX}p90 latency {p * 1e3:.0f}ms {'>' if step > 0 else '<'} {self.slo * 1e3:.0f}ms SLO"
+            f"{'' if step > 0 else f' * {self.hysteresis:g}'}, imgsz {h0}x{w0} -> {h}x{w}, vid_stride {s0} -> {s}"
+        )
+        return self.level
+
+    def apply(self, dataset):
+        """Sets the current level's size and stride on LoadStreams `dataset`, no-op if they are set already."""
+        dataset.resize(self.size)
+        dataset.set_stride(self.stride)
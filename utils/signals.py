@@ -0,0 +1,79 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Vectorized passenger-car-unit (PCU) traffic density and signal assignment for many intersections at once."""
+
+import numpy as np
+
+PCU_WEIGHTS = {
+    "cars": 1.0,
+    "trucks": 2.5,
+    "people": 0.3,
+    "bicycles": 0.5,
+    "motorcycles": 0.7,
+    "buses": 3.0,
+}  # passenger car units per road user, category order matches utils.lanes.LaneCounter.counts()
+SIGNALS = ("red", "orange", "green")  # signal names by code, higher code = more green time
+
+
+class SignalEngine:
+    """
+    Computes lane densities and green/orange/red signals for an (intersections, lanes, categories) count array.
+
+    Within each intersection the densest lane is green, the second densest orange and all others red, ties going to the
+    lower lane index. All intersections are evaluated in one vectorized pass.
+
+    Usage:
+        engine = SignalEngine()
+        codes, density = engine(counts)  # counts (n, lanes, 6) in PCU_WEIGHTS category order
+        signals = engine.names(codes)  # (n, lanes) array of 'green', 'orange', 'red'
+    """
+
+    def __init__(self, weights=None):
+        """Initializes the engine with a {category: PCU weight} table, default PCU_WEIGHTS."""
+        weights = weights or PCU_WEIGHTS
+        self.categories = tuple(weights)
+        self.weights = np.array([weights[k] for k in self.categories], dtype=np.float32)
+
+    def density(self, counts):
+        """Returns (..., lanes) PCU density of (..., lanes, categories) counts."""
+        return np.asarray(counts, dtype=np.float32) @ self.weights
+
+    @staticmethod
+    def assign(density, mask=None):
+        """
+        Assigns signal codes (0 red, 1 orange, 2 green) along the last (lane) axis of `density`.
+
+        Args:
+            density (np.ndarray): (..., lanes) lane densities.
+            mask (np.ndarray, optional): (..., lanes) bool, False for padding lanes that always stay red.
+
+        Returns:
+            (np.ndarray): (..., lanes) int8 signal codes.
+        """
+        density = np.asarray(density, dtype=np.float32)
+        if mask is not None:
+            density = np.where(mask, density, -np.inf)
+        order = np.argsort(-density, axis=-1, kind="stable")  # densest first
+        ranked = np.zeros(density.shape, dtype=np.int8)
+        ranked[..., 0] = 2  # green
+        if density.shape[-1] > 1:
+            ranked[..., 1] = 1  # orange
+        codes = np.empty_like(ranked)
+        np.put_along_axis(codes, order, ranked, axis=-1)
+        return codes if mask is None else np.where(mask, codes, 0).astype(np.int8)
+
+    def __call__(self, counts, mask=None):
+        """Returns (signal codes, density) for (..., lanes, categories) counts, see `assign()`."""
+        density = self.density(counts)
+        return self.assign(density, mask), density
+
+    @staticmethod
+    def names(codes):
+        """Returns signal names ('red', 'orange', 'green') for an array of signal codes."""
+        return np.array(SIGNALS)[codes]
+
+    def lanes(self, lanes):
+        """Returns (signals, density) dicts keyed by lane for one intersection {lane: {category: count}} dict."""
+        counts = [[data.get(k, 0) for k in self.categories] for data in lanes.values()]
+        codes, density = self(np.array(counts, dtype=np.float32).reshape(len(lanes), len(self.categories)))
+        signals = dict(zip(lanes, self.names(codes).tolist()))
+        return signals, dict(zip(lanes, density.tolist()))
@@ -0,0 +1,218 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""
+Buffered result sinks writing prediction rows from a background thread.
+
+Usage:
+    sink = JSONLSink("runs/detect/exp/results.jsonl")
+    sink.write([{"image": "bus.jpg", "name": "bus", "conf": 0.87}])  # buffered, returns immediately
+    sink.close()  # flush remaining rows and close the file
+"""
+
+import csv
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from utils.general import LOGGER, check_requirements, colorstr
+
+PREFIX = colorstr("sinks: ")
+
+
+class ResultSink:
+    """
+    Base class buffering rows (dicts) in memory and writing them from one writer thread.
+
+    Buffered rows are flushed every `max_rows` rows or `max_age` seconds, whichever comes first. Files are opened on
+    the first flush and kept open until `close()`, all file I/O happens on the writer thread. Subclasses implement
+    `_write(rows)` and optionally `_close()`.
+    """
+
+    def __init__(self, file, max_rows=10000, max_age=1.0):
+        """Initializes the sink for output `file` and starts its writer thread."""
+        self.file = Path(file)
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.rows = []
+        self.closed = False
+        self.error = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, rows):
+        """Buffers an iterable of row dicts, waking the writer thread once `max_rows` are waiting."""
+        if self.error:
+            raise self.error
+        with self.cond:
+            self.rows.extend(rows)
+            if len(self.rows) >= self.max_rows:
+                self.cond.notify()
+
+    def flush(self):
+        """Wakes the writer thread to write all buffered rows now."""
+        with self.cond:
+            self.cond.notify()
+
+    def close(self):
+        """Writes remaining rows, closes the output and stops the writer thread."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+        if self.error:
+            raise self.error
+
+    def __enter__(self):
+        """Returns the sink for use as a context manager."""
+        return self
+
+    def __exit__(self, *args):
+        """Closes the sink on context exit."""
+        self.close()
+
+    def _run(self):
+        """Writer thread loop, takes buffered rows under the lock and writes them outside of it."""
+        closed = False
+        while not closed:
+            with self.cond:
+                if not self.closed and len(self.rows) < self.max_rows:
+                    self.cond.wait(self.max_age)
+                rows, self.rows, closed = self.rows, [], self.closed
+            try:
+                if rows:
+                    self._write(rows)
+            except Exception as e:
+                LOGGER.warning(f"{PREFIX}WARNING ⚠️ writing {self.file} failed: {e}")
+                self.error = e
+                break
+        try:
+            self._close()
+        except Exception as e:
+            self.error = self.error or e
+
+    def _write(self, rows):
+        """Writes a list of row dicts."""
+        raise NotImplementedError
+
+    def _close(self):
+        """Closes open files."""
+        pass
+
+
+class CSVSink(ResultSink):
+    """Appends rows to a CSV file, with a header row when the file is new."""
+
+    f = None
+
+    def _write(self, rows):
+        """Writes rows with a csv.DictWriter, fields taken from the first row."""
+        if self.f is None:
+            new = not self.file.exists() or self.file.stat().st_size == 0
+            self.f = open(self.file, "a", newline="")
+            self.writer = csv.DictWriter(self.f, fieldnames=list(rows[0]))
+            if new:
+                self.writer.writeheader()
+        self.writer.writerows(rows)
+        self.f.flush()
+
+    def _close(self):
+        """Closes the CSV file."""
+        if self.f:
+            self.f.close()
+
+
+class JSONLSink(ResultSink):
+    """Appends rows to a JSON Lines file, one object per line."""
+
+    f = None
+
+    def _write(self, rows):
+        """Writes rows as JSON lines."""
+        if self.f is None:
+            self.f = open(self.file, "a")
+        self.f.write("".join(json.dumps(x, default=str) + "\n" for x in rows))
+        self.f.flush()
+
+    def _close(self):
+        """Closes the JSON Lines file."""
+        if self.f:
+            self.f.close()
+
+
+class TxtSink(ResultSink):
+    """Appends text to per-image files, rows are {'file': path, 'text': lines}, i.e. YOLO *.txt labels."""
+
+    def _write(self, rows):
+        """Groups rows by file so each file is opened once per flush."""
+        files = {}
+        for x in rows:
+            files.setdefault(x["file"], []).append(x["text"])
+        for file, texts in files.items():
+            with open(file, "a") as f:
+                f.write("".join(texts))
+
+
+class ParquetSink(ResultSink):
+    """Writes rows to one Parquet file, each flush becomes a row group with the schema of the first flush."""
+
+    writer = None
+
+    def __init__(self, file, max_rows=10000, max_age=1.0):
+        """Checks the pyarrow requirement and initializes the sink."""
+        check_requirements("pyarrow")
+        super().__init__(file, max_rows, max_age)
+
+    def _write(self, rows):
+        """Writes rows as a row group."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            table = pa.Table.from_pylist(rows)
+            self.writer = pq.ParquetWriter(self.file, table.schema)
+        else:
+            table = pa.Table.from_pylist(rows, schema=self.writer.schema)
+        self.writer.write_table(table)
+
+    def _close(self):
+        """Closes the Parquet writer, writing the file footer."""
+        if self.writer:
+            self.writer.close()
+
+
+class SQLiteSink(ResultSink):
+    """Inserts rows into an SQLite table, columns taken from the first row."""
+
+    db = None
+
+    def __init__(self, file, table="results", max_rows=10000, max_age=1.0):
+        """Initializes the sink for `table` in database `file`."""
+        self.table = table
+        super().__init__(file, max_rows, max_age)
+
+    def _write(self, rows):
+        """Inserts rows in one transaction."""
+        if self.db is None:  # connect on the writer thread, sqlite3 connections are bound to their thread
+            self.db = sqlite3.connect(self.file)
+            self.columns = list(rows[0])
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ({', '.join(self.columns)})")
+        sql = f"INSERT INTO {self.table} VALUES ({', '.join('?' * len(self.columns))})"
+        with self.db:
+            self.db.executemany(sql, ([x.get(k) for k in self.columns] for x in rows))
+
+    def _close(self):
+        """Closes the database connection."""
+        if self.db:
+            self.db.close()
+
+
+SINKS = {"csv": CSVSink, "jsonl": JSONLSink, "parquet": ParquetSink, "sqlite": SQLiteSink}  # structured row sinks
+SUFFIXES = {"csv": ".csv", "jsonl": ".jsonl", "parquet": ".parquet", "sqlite": ".db"}
+
+
+def open_sinks(formats, file="results"):
+    """Returns a list of sinks, one per format in `formats` (see SINKS), writing to `file` with the format's suffix."""
+    file = Path(file)
+    return [SINKS[k](file.with_suffix(SUFFIXES[k])) for k in formats]
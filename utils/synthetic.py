@@ -0,0 +1,178 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""
+Seeded, vectorized synthetic traffic history and YOLO detection data for load testing.
+
+Usage:
+    $ python -m utils.synthetic --rows 5000000 --out traffic_history  # lane-count rows into a TrafficHistory store
+    $ python -m utils.synthetic --rows 1000000 --out traffic.csv  # lane-count rows into a CSV file
+    $ python -m utils.synthetic --rows 0 --images 10000 --images-dir ../datasets/synthetic  # YOLO image/label pairs
+"""
+
+import argparse
+import math
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.general import LOGGER, NUM_THREADS, colorstr, cv2, yaml_save
+from utils.signals import SIGNALS, SignalEngine
+
+PREFIX = colorstr("synthetic: ")
+RATES = {"cars": 20.0, "trucks": 7.0, "people": 15.0, "bicycles": 8.0, "motorcycles": 10.0, "buses": 4.0}  # mean/tick
+NAMES = ("person", "bicycle", "car", "motorcycle", "bus", "truck")  # synthetic YOLO dataset classes
+
+
+def rush_hour_profile(hours):
+    """Returns traffic multipliers for fractional hours of day, with morning/evening rush peaks and a night dip."""
+    h = np.asarray(hours, dtype=np.float64) % 24
+    morning = 0.8 * np.exp(-0.5 * ((h - 8.5) / 1.2) ** 2)  # 1.8x peak at 08:30
+    evening = 1.0 * np.exp(-0.5 * ((h - 17.5) / 1.5) ** 2)  # 2.0x peak at 17:30
+    night = 0.7 * np.exp(-0.5 * (((h + 9) % 24 - 12) / 2.0) ** 2)  # 0.3x trough at 03:00
+    return 1.0 + morning + evening - night
+
+
+def traffic_rows(rows=1_000_000, start=None, freq=1.0, intersections=10, lanes=4, chunk=1_000_000, seed=0):
+    """
+    Yields DataFrame chunks of synthetic per-lane traffic rows in the TrafficHistory schema.
+
+    Args:
+        rows (int): Total rows, rounded up to whole ticks of `intersections * lanes` rows.
+        start (datetime, optional): First tick time. Default is today's midnight.
+        freq (float): Seconds between ticks.
+        intersections (int): Number of intersections.
+        lanes (int): Lanes per intersection.
+        chunk (int): Maximum rows per yielded DataFrame, bounds memory use.
+        seed (int): Seed for numpy.random.Generator, equal seeds give equal data.
+
+    Yields:
+        (pd.DataFrame): Timestamp, Intersection, Lane, per-category counts, Total_Vehicles, Traffic_Density and
+            Signal_Status columns.
+    """
+    rng = np.random.default_rng(seed)
+    engine = SignalEngine()
+    start = pd.Timestamp(start or datetime.now().date())
+    rates = np.array([RATES[k] for k in engine.categories])
+    bias = rng.uniform(0.5, 1.5, (intersections, lanes, 1))  # busy and quiet lanes
+    junctions = np.array([f"junction_{i + 1}" for i in range(intersections)])
+    lane_names = np.array([f"Lane_{i + 1}" for i in range(lanes)])
+    columns = [k.capitalize() for k in engine.categories]
+    signals = [x.capitalize() for x in SIGNALS]
+    n, step = math.ceil(rows / (intersections * lanes)), max(chunk // (intersections * lanes), 1)  # ticks
+    for t0 in range(0, n, step):
+        t = np.arange(t0, min(t0 + step, n)) * freq  # seconds since start
+        hours = (start.hour + start.minute / 60 + t / 3600)[:, None, None, None]
+        counts = rng.poisson(rates * bias * rush_hour_profile(hours))  # (ticks, intersections, lanes, categories)
+        density = engine.density(counts) * rng.uniform(0.9, 1.1, counts.shape[:3])
+        codes = engine.assign(density)
+        df = pd.DataFrame(counts.reshape(-1, len(columns)), columns=columns)
+        df.insert(0, "Timestamp", np.repeat(start + pd.to_timedelta(t, unit="s"), intersections * lanes))
+        junction = np.tile(np.repeat(np.arange(intersections), lanes), len(t))
+        df.insert(1, "Intersection", pd.Categorical.from_codes(junction, junctions))
+        df.insert(2, "Lane", pd.Categorical.from_codes(np.tile(np.arange(lanes), len(t) * intersections), lane_names))
+        df["Total_Vehicles"] = df[columns].sum(axis=1) - df["People"]
+        df["Traffic_Density"] = density.ravel()
+        df["Signal_Status"] = pd.Categorical.from_codes(codes.ravel(), signals)
+        yield df
+
+
+def write_traffic(out="traffic_history", **kwargs):
+    """Streams `traffic_rows(**kwargs)` chunks to a TrafficHistory directory or a .csv file, returns rows written."""
+    out, n = Path(out), 0
+    if out.suffix == ".csv":
+        out.unlink(missing_ok=True)
+    else:
+        from utils.history import TrafficHistory
+
+        history = TrafficHistory(out)
+    for df in traffic_rows(**kwargs):
+        if out.suffix == ".csv":
+            df.to_csv(out, mode="a", header=n == 0, index=False)
+        else:
+            history.extend(df)
+        n += len(df)
+        LOGGER.info(f"{PREFIX}{n} rows written to {out}")
+    return n
+
+
+def yolo_images(path="../datasets/synthetic", n=1000, imgsz=(640, 640), val=0.1, chunk=256, seed=0):
+    """
+    Writes `n` synthetic YOLO image/label pairs (filled boxes on noisy backgrounds) and a dataset YAML.
+
+    Images and labels are generated `chunk` at a time and written by a thread pool, so memory stays bounded for any
+    `n`. Layout is `path/images/{train,val}/*.jpg`, `path/labels/{train,val}/*.txt` and `path/synthetic.yaml`.
+    """
+    rng = np.random.default_rng(seed)
+    path, (h, w) = Path(path), imgsz
+    for d in "images/train", "images/val", "labels/train", "labels/val":
+        (path / d).mkdir(parents=True, exist_ok=True)
+    palette = rng.integers(0, 256, (len(NAMES), 3))
+    ramp = np.linspace(60, 180, w, dtype=np.float32)[None, :, None]  # horizontal background gradient
+
+    def save(args):
+        """Draws and writes one image and its label file."""
+        i, labels = args
+        im = np.clip(ramp + np.random.default_rng(seed + i).normal(0, 12, (h, w, 1)), 0, 255).astype(np.uint8)
+        im = np.ascontiguousarray(np.broadcast_to(im, (h, w, 3)))
+        xyxy = np.stack((labels[:, 1] - labels[:, 3] / 2, labels[:, 2] - labels[:, 4] / 2), 1) * (w, h)
+        for (c, *_), (x1, y1), (bw, bh) in zip(labels, xyxy.astype(int), (labels[:, 3:] * (w, h)).astype(int)):
+            cv2.rectangle(im, (x1, y1), (x1 + bw, y1 + bh), palette[int(c)].tolist(), -1)
+        split = "val" if i < n * val else "train"
+        cv2.imwrite(str(path / "images" / split / f"{i:08d}.jpg"), im)
+        np.savetxt(path / "labels" / split / f"{i:08d}.txt", labels, fmt=["%d"] + ["%.6f"] * 4)
+
+    with ThreadPool(NUM_THREADS) as pool:
+        for i0 in range(0, n, chunk):
+            m = min(chunk, n - i0)
+            nb = rng.integers(1, 16, m)  # boxes per image
+            wh = rng.uniform(0.03, 0.3, (nb.sum(), 2))
+            xy = rng.uniform(wh / 2, 1 - wh / 2)  # centers keeping boxes inside the image
+            labels = np.concatenate((rng.integers(0, len(NAMES), (nb.sum(), 1)), xy, wh), 1)
+            pool.map(save, zip(range(i0, i0 + m), np.split(labels, np.cumsum(nb)[:-1])))
+            LOGGER.info(f"{PREFIX}{i0 + m}/{n} images written to {path}")
+    data = {"path": str(path.resolve()), "train": "images/train", "val": "images/val", "names": dict(enumerate(NAMES))}
+    yaml_save(path / "synthetic.yaml", data)
+    return path / "synthetic.yaml"
+
+
+def parse_opt():
+    """Parses command-line arguments for synthetic data generation."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000, help="lane-count rows to generate, 0 to skip")
+    parser.add_argument("--out", type=str, default="traffic_history", help="TrafficHistory dir or *.csv file")
+    parser.add_argument("--start", type=str, default=None, help="first timestamp, i.e. 2024-01-01, default today")
+    parser.add_argument("--freq", type=float, default=1.0, help="seconds between ticks")
+    parser.add_argument("--intersections", type=int, default=10, help="number of intersections")
+    parser.add_argument("--lanes", type=int, default=4, help="lanes per intersection")
+    parser.add_argument("--images", type=int, default=0, help="YOLO image/label pairs to generate")
+    parser.add_argument("--images-dir", type=str, default="../datasets/synthetic", help="YOLO dataset dir")
+    parser.add_argument("--imgsz", "--img", "--img-size", nargs="+", type=int, default=[640], help="image size h,w")
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="rows per written chunk")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    opt = parser.parse_args()
+    opt.imgsz *= 2 if len(opt.imgsz) == 1 else 1  # expand
+    return opt
+
+
+def main(opt):
+    """Generates synthetic traffic rows and/or YOLO images as configured by command-line options."""
+    if opt.rows:
+        write_traffic(
+            opt.out,
+            rows=opt.rows,
+            start=opt.start,
+            freq=opt.freq,
+            intersections=opt.intersections,
+            lanes=opt.lanes,
+            chunk=opt.chunk,
+            seed=opt.seed,
+        )
+    if opt.images:
+        yolo_images(opt.images_dir, n=opt.images, imgsz=opt.imgsz, seed=opt.seed)
+
+
+if __name__ == "__main__":
+    opt = parse_opt()
+    main(opt)
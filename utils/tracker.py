@@ -0,0 +1,142 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""Multi-object tracking of NMS detections with batched Kalman filters and IoU linear assignment (SORT)."""
+
+import numpy as np
+import torch
+from scipy.optimize import linear_sum_assignment
+
+from utils.general import xywh2xyxy, xyxy2xywh
+from utils.metrics import box_iou
+
+
+class KalmanBoxFilter:
+    """Batched constant-velocity Kalman filter over box states [cx, cy, w, h, vx, vy, vw, vh]."""
+
+    std_pos = 1 / 20  # position noise relative to box size
+    std_vel = 1 / 160  # velocity noise relative to box size
+
+    def __init__(self):
+        """Initializes the motion (F) and observation (H) matrices."""
+        self.F = torch.eye(8)
+        self.F[:4, 4:] = torch.eye(4)  # x += v (dt = 1 frame)
+        self.H = torch.eye(4, 8)
+
+    def initiate(self, xywh):
+        """Returns (n, 8) means and (n, 8, 8) covariances for new tracks from (n, 4) xywh measurements."""
+        mean = torch.cat((xywh, torch.zeros_like(xywh)), 1)
+        wh = xywh[:, 2:].repeat(1, 2)  # w, h, w, h
+        std = torch.cat((2 * self.std_pos * wh, 10 * self.std_vel * wh), 1)
+        return mean, torch.diag_embed(std**2)
+
+    def predict(self, mean, cov):
+        """Propagates (n, 8) means and (n, 8, 8) covariances one frame ahead."""
+        wh = mean[:, 2:4].repeat(1, 2)
+        q = torch.diag_embed(torch.cat((self.std_pos * wh, self.std_vel * wh), 1) ** 2)  # process noise
+        return mean @ self.F.T, self.F @ cov @ self.F.T + q
+
+    def update(self, mean, cov, xywh):
+        """Corrects (n, 8) means and (n, 8, 8) covariances with (n, 4) xywh measurements."""
+        r = torch.diag_embed((self.std_pos * mean[:, 2:4].repeat(1, 2)) ** 2)  # measurement noise
+        ph = cov @ self.H.T  # (n, 8, 4)
+        gain = torch.linalg.solve(self.H @ ph + r, ph.transpose(1, 2)).transpose(1, 2)  # P H^T S^-1
+        mean = mean + (gain @ (xywh - mean[:, :4]).unsqueeze(2)).squeeze(2)
+        cov = cov - gain @ self.H @ cov
+        return mean, cov
+
+
+class Tracker:
+    """
+    SORT-style tracker assigning stable IDs to per-frame NMS detections of one video stream.
+
+    Track boxes are predicted with a batched Kalman filter, matched to detections of the same class by maximum IoU
+    (`box_iou` cost matrix solved with linear assignment), and reported once confirmed by `min_hits` matches.
+
+    Usage:
+        tracker = Tracker()
+        for det in detections:  # (n, 6) xyxy, conf, cls per frame in original image pixels
+            tracks = tracker.update(det)  # (m, 7) xyxy, conf, cls, id
+
+    Between keyframes without detections, `predict()` propagates confirmed tracks by their motion model instead.
+    """
+
+    def __init__(self, iou_thres=0.3, max_age=30, min_hits=3):
+        """Initializes tracker with match IoU threshold, frames to keep lost tracks, and hits to confirm a track."""
+        self.iou_thres = iou_thres
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.kf = KalmanBoxFilter()
+        self.mean, self.cov = torch.zeros((0, 8)), torch.zeros((0, 8, 8))  # track states
+        self.ids = torch.zeros(0, dtype=torch.long)
+        self.cls = torch.zeros(0)
+        self.conf = torch.zeros(0)  # last matched detection confidence
+        self.hits = torch.zeros(0, dtype=torch.long)  # total matches
+        self.lost = torch.zeros(0, dtype=torch.long)  # frames since last match
+        self.next_id = 1
+        self.frame = 0
+
+    def update(self, det):
+        """Updates tracks with (n, 6) detections (xyxy, conf, cls) and returns (m, 7) confirmed tracks with IDs."""
+        self.frame += 1
+        device, det = det.device, det.detach().float().cpu()
+        if len(self.ids):
+            self.mean, self.cov = self.kf.predict(self.mean, self.cov)
+
+        # Associate
+        iou = box_iou(det[:, :4], xywh2xyxy(self.mean[:, :4]))  # (n, tracks)
+        iou *= det[:, 5:6] == self.cls  # same class only
+        i, j = linear_sum_assignment(iou.numpy(), maximize=True) if iou.numel() else (np.zeros(0, int),) * 2
+        keep = iou[i, j] >= self.iou_thres
+        i, j = torch.as_tensor(i)[keep], torch.as_tensor(j)[keep]
+
+        # Update matched tracks
+        self.mean[j], self.cov[j] = self.kf.update(self.mean[j], self.cov[j], xyxy2xywh(det[i, :4]))
+        self.hits[j] += 1
+        self.conf[j] = det[i, 4]
+        self.lost += 1
+        self.lost[j] = 0
+        det_ids, det_hits = torch.zeros(len(det), dtype=torch.long), torch.ones(len(det), dtype=torch.long)
+        det_ids[i], det_hits[i] = self.ids[j], self.hits[j]
+
+        # Create tracks for unmatched detections
+        new = torch.ones(len(det), dtype=torch.bool)
+        new[i] = False
+        n = int(new.sum())
+        det_ids[new] = torch.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        mean, cov = self.kf.initiate(xyxy2xywh(det[new, :4]))
+        self.mean, self.cov = torch.cat((self.mean, mean)), torch.cat((self.cov, cov))
+        self.ids, self.cls = torch.cat((self.ids, det_ids[new])), torch.cat((self.cls, det[new, 5]))
+        self.conf = torch.cat((self.conf, det[new, 4]))
+        self.hits = torch.cat((self.hits, torch.ones(n, dtype=torch.long)))
+        self.lost = torch.cat((self.lost, torch.zeros(n, dtype=torch.long)))
+
+        # Remove lost tracks
+        alive = self.lost <= self.max_age
+        self.mean, self.cov, self.ids, self.cls = self.mean[alive], self.cov[alive], self.ids[alive], self.cls[alive]
+        self.conf, self.hits, self.lost = self.conf[alive], self.hits[alive], self.lost[alive]
+
+        # Confirmed tracks, with this frame's detection boxes (all tracks during the first min_hits frames)
+        confirmed = (det_hits >= self.min_hits) | (self.frame <= self.min_hits)
+        return torch.cat((det, det_ids[:, None].float()), 1)[confirmed].to(device)
+
+    def visible(self):
+        """Returns a mask of confirmed tracks matched on the last update()."""
+        return (self.lost == 0) & ((self.hits >= self.min_hits) | (self.frame <= self.min_hits))
+
+    def predict(self):
+        """Advances all tracks one frame without detections, returns (m, 7) predicted visible tracks with IDs."""
+        self.frame += 1
+        if len(self.ids):
+            self.mean, self.cov = self.kf.predict(self.mean, self.cov)
+        k = self.visible()
+        xyxy = xywh2xyxy(self.mean[k, :4])
+        return torch.cat((xyxy, self.conf[k, None], self.cls[k, None], self.ids[k, None].float()), 1)
+
+    def uncertainty(self):
+        """Returns the largest position standard deviation of visible tracks relative to their box size, 0 if none."""
+        k = self.visible()
+        if not k.any():
+            return 0.0
+        var = self.cov[k, 0, 0] + self.cov[k, 1, 1]
+        size = (self.mean[k, 2] * self.mean[k, 3]).clamp(min=1)
+        return float((var / size).sqrt().max())
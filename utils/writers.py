@@ -0,0 +1,163 @@
+# Ultralytics YOLOv5 🚀, AGPL-3.0 license
+"""
+Asynchronous video writers encoding annotated frames on one background thread per output stream.
+
+Usage:
+    pool = VideoWriterPool(maxsize=32, policy="drop")
+    pool.open(0, "runs/detect/exp/vid.mp4", fps=30, size=(1920, 1080))
+    pool.write(0, im0)  # queued, returns immediately unless the queue is full and the policy is 'block'
+    pool.close()  # encode queued frames and finalize all videos
+"""
+
+import collections
+import threading
+import time
+
+import cv2
+
+from utils.general import LOGGER, colorstr
+
+PREFIX = colorstr("writers: ")
+POLICIES = "block", "drop", "downscale"  # what write() does when the frame queue is full
+
+
+class AsyncVideoWriter:
+    """
+    cv2.VideoWriter fed by a bounded frame queue and encoding on its own thread.
+
+    The queue holds at most `maxsize` full-resolution frames. When it is full, `policy` decides what `write()` does:
+    'block' waits for the encoder (no frame lost), 'drop' discards the oldest queued frame, and 'downscale' queues the
+    frame at half width and height (a quarter of the memory, upscaled again by the encoder thread) and only blocks once
+    the queue is full in bytes too.
+    """
+
+    def __init__(self, file, fps, size, maxsize=32, policy="block", fourcc="mp4v"):
+        """Opens `file` for `size` (w, h) frames at `fps` and starts the encoder thread."""
+        assert policy in POLICIES, f"invalid writer policy '{policy}', valid policies are {POLICIES}"
+        self.file = str(file)
+        self.size = tuple(size)
+        self.maxsize = maxsize
+        self.policy = policy
+        self.writer = cv2.VideoWriter(self.file, cv2.VideoWriter_fourcc(*fourcc), fps, self.size)
+        self.frames = collections.deque()
+        self.budget = maxsize * 4  # queue capacity in quarter-resolution frames
+        self.used = 0  # queued quarter-resolution frames, 4 per full-resolution frame
+        self.written, self.dropped, self.downscaled, self.t = 0, 0, 0, 0.0  # metrics, t is encoding time
+        self.closed = False
+        self.error = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def write(self, im):
+        """Queues BGR frame `im` for encoding, applying the overflow policy when the queue is full."""
+        if self.error:
+            raise self.error
+        with self.cond:
+            if self.used + 4 > self.budget:
+                if self.policy == "drop":
+                    while self.used + 4 > self.budget and self.frames:
+                        self.used -= self._cost(self.frames.popleft())
+                        self.dropped += 1
+                elif self.policy == "downscale":
+                    h, w = im.shape[:2]
+                    im = cv2.resize(im, (max(w // 2, 1), max(h // 2, 1)), interpolation=cv2.INTER_AREA)
+                    self.downscaled += 1
+            cost = self._cost(im)
+            while self.used + cost > self.budget and not self.error:
+                self.cond.wait()  # 'block', or 'downscale' with the queue full of downscaled frames
+            self.frames.append(im)
+            self.used += cost
+            self.cond.notify_all()
+
+    def close(self):
+        """Encodes the remaining queued frames, releases the video and stops the encoder thread."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.thread.join()
+        if self.error:
+            raise self.error
+
+    def _cost(self, im):
+        """Returns the queue cost of frame `im`, 4 for full and 1 for downscaled frames."""
+        return 4 if im.shape[1] == self.size[0] and im.shape[0] == self.size[1] else 1
+
+    def _run(self):
+        """Encoder thread loop, takes one frame at a time from the queue and writes it outside of the lock."""
+        try:
+            while True:
+                with self.cond:
+                    while not self.frames and not self.closed:
+                        self.cond.wait()
+                    if not self.frames:
+                        break
+                    im = self.frames.popleft()
+                    self.used -= self._cost(im)
+                    self.cond.notify_all()
+                t = time.time()
+                if im.shape[1] != self.size[0] or im.shape[0] != self.size[1]:
+                    im = cv2.resize(im, self.size, interpolation=cv2.INTER_LINEAR)
+                self.writer.write(im)
+                self.t += time.time() - t
+                self.written += 1
+        except Exception as e:
+            LOGGER.warning(f"{PREFIX}WARNING ⚠️ writing {self.file} failed: {e}")
+            with self.cond:
+                self.error = e
+                self.cond.notify_all()
+        finally:
+            self.writer.release()
+
+
+class VideoWriterPool:
+    """
+    One AsyncVideoWriter per output stream slot, i.e. per camera of a multi-stream source.
+
+    Opening a new video on a slot finalizes the previous one. Metrics of all writers, also closed ones, are summed in
+    `written`, `dropped` and `downscaled`, and `fps` is the encoding rate of one writer thread.
+    """
+
+    def __init__(self, maxsize=32, policy="block"):
+        """Initializes pool with per-writer frame queue size and overflow policy (see POLICIES)."""
+        assert policy in POLICIES, f"invalid writer policy '{policy}', valid policies are {POLICIES}"
+        self.maxsize = maxsize
+        self.policy = policy
+        self.writers = {}
+        self.written, self.dropped, self.downscaled, self.t = 0, 0, 0, 0.0
+
+    def open(self, k, file, fps, size):
+        """Opens video `file` with `fps` and `size` (w, h) on slot `k`, closing the video previously open there."""
+        self.release(k)
+        self.writers[k] = AsyncVideoWriter(file, fps, size, self.maxsize, self.policy)
+
+    def write(self, k, im):
+        """Queues BGR frame `im` on the writer of slot `k`."""
+        self.writers[k].write(im)
+
+    def release(self, k):
+        """Finalizes the video of slot `k`, if any, and adds its metrics to the pool totals."""
+        w = self.writers.pop(k, None)
+        if w:
+            w.close()
+            self.written += w.written
+            self.dropped += w.dropped
+            self.downscaled += w.downscaled
+            self.t += w.t
+
+    def close(self):
+        """Finalizes the videos of all slots."""
+        for k in list(self.writers):
+            self.release(k)
+
+    @property
+    def fps(self):
+        """Returns the frames encoded per second of encoding thread time."""
+        return self.written / self.t if self.t else 0.0
+
+    def summary(self):
+        """Returns a one-line metrics string."""
+        return (
+            f"{self.written} frames encoded at {self.fps:.1f} FPS per writer, "
+            f"{self.dropped} dropped, {self.downscaled} downscaled"
+        )